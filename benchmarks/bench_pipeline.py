@@ -0,0 +1,201 @@
+# file: benchmarks/bench_pipeline.py
+"""
+Offline throughput benchmark for the /enrich loop.
+Why: catch regressions in enrich_batch, the pipeline and update_locations
+before deploy, without a GCP project or an API key.
+
+Drives the real service code (`service.app.enrich`) against
+the SQLiteBigQueryIO and FakeAsyncOpenAI stand-ins from tests/fakes.py. Each (size, concurrency)
+scenario runs in its own subprocess so peak RSS is per scenario.
+Prints one JSON object per scenario (and writes them to --out).
+
+    python benchmarks/bench_pipeline.py --sizes 1000,10000 --concurrency 8,32
+    python benchmarks/bench_pipeline.py --baseline last.jsonl --tolerance 0.2
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def make_rows(n: int, dup_ratio: float, resolvable: float, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic venues: `dup_ratio` repeat an earlier venue, `resolvable` name a known city+country."""
+    from venue_enricher import gazetteer as gz
+
+    rng = random.Random(seed)
+    cities = sorted(gz.CITY_NAME.items())
+    rows: List[Dict[str, Any]] = []
+    for i in range(n):
+        if rows and rng.random() < dup_ratio:
+            base = dict(rng.choice(rows))
+        else:
+            (_, iso), city = rng.choice(cities)
+            street = f"{rng.randint(1, 999)} Main Street"
+            address = (
+                f"{street}, {city}, {gz.COUNTRY_NAME[iso]}"
+                if rng.random() < resolvable
+                else f"{street}, District {rng.randint(1, 40)}"
+            )
+            base = {"name": f"Venue {i}", "address": address, "website_url": f"https://venue{i}.example"}
+        base["id"] = f"{i:09d}"
+        rows.append(base)
+    return rows
+
+
+def run_one(args: argparse.Namespace, size: int, concurrency: int) -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp(prefix="bench_")
+    os.environ.update({
+        "OPENAI_API_KEY": "bench",
+        "CACHE_PATH": os.path.join(tmp, "cache.sqlite"),
+        "JOBS_DB": os.path.join(tmp, "jobs.sqlite"),
+        "PRE_RESOLVER": "1" if args.resolver else "0",
+        "BATCH_SIZE": str(args.batch_size),
+        "PACK_SIZE": str(args.pack_size),
+        "PIPELINE_WORKERS": str(args.workers),
+    })
+    sys.path.insert(0, os.path.join(ROOT, "src"))
+    sys.path.insert(0, os.path.join(ROOT, "tests"))
+    from service import app as A
+    from venue_enricher import enricher
+    from venue_enricher.async_engine import AsyncEngine, TokenBucket
+    from fakes import FakeAsyncOpenAI, SQLiteBigQueryIO
+
+    bq = SQLiteBigQueryIO(os.path.join(tmp, "table.sqlite"), job_seconds=args.bq_job_seconds)
+    bq.load(make_rows(size, args.dup_ratio, args.resolvable))
+    fake = FakeAsyncOpenAI(latency_ms=args.latency_ms, sigma=args.sigma, rate_429=args.rate_429)
+    enricher._ENGINE = AsyncEngine(fake, TokenBucket(rpm=args.rpm, tpm=args.tpm))
+    A.CONCURRENCY = concurrency
+    A._build(io=bq)  # what the lifespan hook does, minus cache sync, job workers and warm-up
+
+    batch_seconds: List[float] = []
+    real_enrich_batch = A.enrich_batch
+
+    def _timed_batch(*a: Any, **kw: Any) -> Any:
+        t0 = time.monotonic()
+        try:
+            return real_enrich_batch(*a, **kw)
+        finally:
+            batch_seconds.append(time.monotonic() - t0)
+
+    A.enrich_batch = _timed_batch
+
+    updated = fetched = 0
+    started = time.monotonic()
+    while True:
+        out = A.enrich(limit=args.limit, overwrite=False, verbose=False, cursor=None, shard=0, num_shards=1)
+        updated += out["updated"]
+        fetched += out["pipeline"]["fetched"]
+        if out["cursor"] is None:
+            break
+    elapsed = time.monotonic() - started
+
+    return {
+        "size": size,
+        "concurrency": concurrency,
+        "pack_size": args.pack_size,
+        "rows": fetched,
+        "updated": updated,
+        "pending_left": bq.count_pending(),
+        "seconds": round(elapsed, 3),
+        "rows_per_sec": round(fetched / elapsed, 1) if elapsed else 0.0,
+        "batch_p50_ms": round(_pct(batch_seconds, 0.5) * 1000, 1),
+        "batch_p99_ms": round(_pct(batch_seconds, 0.99) * 1000, 1),
+        "api_p50_ms": round(_pct(fake.latencies, 0.5) * 1000, 1),
+        "api_p99_ms": round(_pct(fake.latencies, 0.99) * 1000, 1),
+        "api_calls": fake.calls,
+        "api_429": fake.throttled,
+        # ru_maxrss is KiB on Linux.
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+
+def compare(results: List[Dict[str, Any]], baseline_path: str, tolerance: float) -> List[str]:
+    """Scenarios whose rows/sec fell more than `tolerance` below the baseline."""
+    with open(baseline_path, encoding="utf-8") as fh:
+        base = {(b["size"], b["concurrency"], b.get("pack_size", 1)): b for b in map(json.loads, fh)}
+    failures = []
+    for r in results:
+        b = base.get((r["size"], r["concurrency"], r["pack_size"]))
+        if b and r["rows_per_sec"] < b["rows_per_sec"] * (1 - tolerance):
+            failures.append(
+                f"size={r['size']} concurrency={r['concurrency']}: "
+                f"{r['rows_per_sec']} rows/s vs baseline {b['rows_per_sec']}"
+            )
+    return failures
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Offline /enrich benchmark (fake OpenAI + SQLite BigQuery)")
+    ap.add_argument("--sizes", default="1000,5000")
+    ap.add_argument("--concurrency", default="8,32")
+    ap.add_argument("--pack-size", type=int, default=1)
+    ap.add_argument("--batch-size", type=int, default=200)
+    ap.add_argument("--workers", type=int, default=2)
+    ap.add_argument("--limit", type=int, default=5000, help="rows per /enrich call")
+    ap.add_argument("--latency-ms", type=float, default=400.0)
+    ap.add_argument("--sigma", type=float, default=0.5, help="lognormal spread of API latency")
+    ap.add_argument("--rate-429", type=float, default=0.01)
+    ap.add_argument("--rpm", type=int, default=100000)
+    ap.add_argument("--tpm", type=int, default=50000000)
+    ap.add_argument("--bq-job-seconds", type=float, default=0.0)
+    ap.add_argument("--dup-ratio", type=float, default=0.3)
+    ap.add_argument("--resolvable", type=float, default=0.3)
+    ap.add_argument("--no-resolver", dest="resolver", action="store_false")
+    ap.add_argument("--out", default="")
+    ap.add_argument("--baseline", default="")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    ap.add_argument("--one", nargs=2, type=int, metavar=("SIZE", "CONCURRENCY"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.one:
+        print(json.dumps(run_one(args, *args.one)))
+        return
+
+    passthrough: List[str] = []
+    skip = False
+    for a in sys.argv[1:]:
+        if skip:
+            skip = False
+        elif a in ("--out", "--baseline"):
+            skip = True
+        elif not a.startswith(("--out=", "--baseline=")):
+            passthrough.append(a)
+    results = []
+    for size in map(int, args.sizes.split(",")):
+        for conc in map(int, args.concurrency.split(",")):
+            proc = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), *passthrough, "--one", str(size), str(conc)],
+                check=True, capture_output=True, text=True,
+            )
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print(json.dumps(result), flush=True)
+            results.append(result)
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.writelines(json.dumps(r) + "\n" for r in results)
+    if args.baseline:
+        failures = compare(results, args.baseline, args.tolerance)
+        for f in failures:
+            print(f"REGRESSION {f}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+# file: benchmarks/bench_startup.py
+"""
+Cold-start benchmark for the service entry point.
+Why: on Cloud Run, scale-from-zero latency lands on the scheduled /enrich
+call; track import time and time-to-first-response per revision.
+
+Each run is a fresh interpreter (`-X importtime`) that imports
+`service.app`, runs its lifespan startup and serves one GET /health
+through the ASGI app. Prints one
+JSON object: medians, self import time per top-level package, and which
+heavy SDKs were loaded before the first response (they should not be).
+
+    python benchmarks/bench_startup.py --runs 7
+    python benchmarks/bench_startup.py --baseline last.json --tolerance 0.2
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("openai", "google.cloud.bigquery", "google.cloud.bigquery_storage", "numpy")
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+# Runs in the child interpreter; the parent only parses its output.
+_CHILD = """
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+import service.app as A
+imported = time.perf_counter()
+
+async def _get(path):
+    sent = []
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+    async def send(msg):
+        sent.append(msg)
+    scope = {"type": "http", "method": "GET", "path": path, "raw_path": path.encode(),
+             "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+             "server": ("bench", 80), "client": ("bench", 1), "root_path": ""}
+    await A.app(scope, receive, send)
+    return sent[0]["status"]
+
+async def _serve_first():
+    # Why: time what a real server does: run the lifespan startup, then answer.
+    async with A.app.router.lifespan_context(A.app):
+        return await _get("/health"), time.perf_counter()
+
+status, done = asyncio.run(_serve_first())
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - t0) * 1000,
+    "first_response_ms": (done - t0) * 1000,
+    "loaded": [m for m in HEAVY if m in sys.modules],
+}))
+"""
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """(cumulative ms of service.app, self ms per top-level package)."""
+    total = 0.0
+    by_pkg: Dict[str, float] = {}
+    for self_us, cum_us, _, name in _LINE.findall(stderr):
+        top = name.split(".")[0]
+        by_pkg[top] = by_pkg.get(top, 0.0) + int(self_us) / 1000
+        if name == "service.app":
+            total = int(cum_us) / 1000
+    return total, by_pkg
+
+
+def run_once() -> Dict[str, Any]:
+    tmp = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(
+        os.environ,
+        PYTHONPATH=os.path.join(ROOT, "src"),
+        CACHE_PATH=os.path.join(tmp, "cache.sqlite"),
+        JOBS_DB=os.path.join(tmp, "jobs.sqlite"),
+        WARMUP="0",
+    )
+    started = time.monotonic()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"HEAVY = {HEAVY!r}\n{_CHILD}"],
+        env=env, check=True, capture_output=True, text=True,
+    )
+    wall_ms = (time.monotonic() - started) * 1000
+    out = json.loads(proc.stdout.strip().splitlines()[-1])
+    out["importtime_ms"], out["by_package"] = parse_importtime(proc.stderr)
+    out["process_ms"] = wall_ms
+    return out
+
+
+def summarize(runs: List[Dict[str, Any]], top: int) -> Dict[str, Any]:
+    def med(key: str) -> float:
+        return round(statistics.median(r[key] for r in runs), 1)
+
+    packages: Dict[str, float] = {}
+    for r in runs:
+        for pkg, ms in r["by_package"].items():
+            packages[pkg] = packages.get(pkg, 0.0) + ms / len(runs)
+    try:
+        revision = subprocess.run(
+            ["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = ""
+    return {
+        "revision": revision,
+        "runs": len(runs),
+        "import_ms": med("import_ms"),
+        "importtime_ms": med("importtime_ms"),
+        "first_response_ms": med("first_response_ms"),
+        "process_ms": med("process_ms"),
+        "heavy_loaded": sorted({m for r in runs for m in r["loaded"]}),
+        "top_packages_ms": {
+            k: round(v, 1) for k, v in sorted(packages.items(), key=lambda kv: -kv[1])[:top]
+        },
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Cold-start benchmark (import time + first /health)")
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--top", type=int, default=12, help="packages listed in the breakdown")
+    ap.add_argument("--out", default="")
+    ap.add_argument("--baseline", default="")
+    ap.add_argument("--tolerance", type=float, default=0.2)
+    args = ap.parse_args()
+
+    result = summarize([run_once() for _ in range(args.runs)], args.top)
+    print(json.dumps(result))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as fh:
+            fh.write(json.dumps(result) + "\n")
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            base = json.loads(fh.readline())
+        limit = base["first_response_ms"] * (1 + args.tolerance)
+        if result["first_response_ms"] > limit:
+            print(
+                f"REGRESSION first_response_ms {result['first_response_ms']} vs baseline "
+                f"{base['first_response_ms']} ({base.get('revision', '')})",
+                file=sys.stderr,
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
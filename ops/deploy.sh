@@ -15,5 +15,6 @@ gcloud run deploy "${SERVICE}" \
   --cpu "1" \
   --memory "512Mi" \
   --timeout "3600" \
-  --set-env-vars "PROJECT_ID=${PROJECT_ID},DATASET_ID=rfpdata,TABLE_ID=OUTPUT,OPENAI_MODEL=gpt-4o-mini,BATCH_SIZE=200,CONCURRENCY=8" \
+  --no-cpu-throttling \
+  --set-env-vars "PROJECT_ID=${PROJECT_ID},DATASET_ID=rfpdata,TABLE_ID=OUTPUT,OPENAI_MODEL=gpt-4o-mini,BATCH_SIZE=200,CONCURRENCY=64,OPENAI_RPM=500,OPENAI_TPM=200000" \
   --set-secrets "OPENAI_API_KEY=OPENAI_API_KEY:latest"
@@ -1,25 +1,241 @@
 # path: src/service/app.py
 from __future__ import annotations
 
-import math
 import os
-from typing import Dict, Any
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Any, Optional, Set, Tuple
 
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from venue_enricher import metrics
+from venue_enricher.autotune import AutoTuner, Knob
+from venue_enricher.batch import ResultBatch, VenueBatch
+from venue_enricher.batch_backfill import Backfill, BackfillState
 from venue_enricher.bq_io import BigQueryIO
-from venue_enricher.enricher import enrich_batch
+from venue_enricher.cache import EnrichmentCache, RemoteTier, TieredCache, remote_tier
+from venue_enricher.cascade import parse_tiers, tier_report
+from venue_enricher.config import Settings
+from venue_enricher.enricher import _engine, enrich_batch
+from venue_enricher import incremental
+from venue_enricher.incremental import PendingCounter
+from venue_enricher.jobs import JobRunner, JobStore
+from venue_enricher.leases import Lease, LeaseKeeper, LeaseLost, lease_store, new_owner
+from venue_enricher.pipeline import run_pipeline
+from venue_enricher.resolver import PreResolver
 
-app = FastAPI(title="venue-enricher", version="1.0.1")
+if TYPE_CHECKING:  # numpy stays optional unless the index is enabled
+    from venue_enricher.similarity import SimilarityIndex
 
 PROJECT_ID = os.environ.get("PROJECT_ID", "")
 DATASET_ID = os.environ.get("DATASET_ID", "")
 TABLE_ID = os.environ.get("TABLE_ID", "")
 OPENAI_MODEL = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+# Cascade "model:threshold[:budget],..." cheapest first; empty = OPENAI_MODEL only.
+MODEL_TIERS = parse_tiers(os.environ.get("MODEL_TIERS", ""), OPENAI_MODEL)
 BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "200"))
 CONCURRENCY = int(os.environ.get("CONCURRENCY", "8"))
+PACK_SIZE = int(os.environ.get("PACK_SIZE", "1"))  # venues per chat completion
+PIPELINE_WORKERS = int(os.environ.get("PIPELINE_WORKERS", "2"))  # pages enriched at once
+FLUSH_ROWS = int(os.environ.get("FLUSH_ROWS", "1000"))  # write when this many rows are buffered
+FLUSH_SECONDS = float(os.environ.get("FLUSH_SECONDS", "10"))  # ...or this long since last write
+WRITE_MODE = os.environ.get("WRITE_MODE", "merge")  # "stream" = changelog append + periodic MERGE
+MERGE_INTERVAL = float(os.environ.get("MERGE_INTERVAL", "60"))  # seconds between consolidated MERGEs
+PRE_RESOLVER = os.environ.get("PRE_RESOLVER", "1") == "1"  # gazetteer before the model
+RESOLVER_MIN_CONFIDENCE = float(os.environ.get("RESOLVER_MIN_CONFIDENCE", "0.85"))
+BQ_READER = os.environ.get("BQ_READER", "query")  # "storage" = Storage Read API
 BQ_LOCATION = os.environ.get("BQ_LOCATION")  # e.g. "US" if your dataset is pinned
+CACHE_PATH = os.environ.get("CACHE_PATH", "/tmp/enrichment_cache.sqlite")
+LRU_CAPACITY = int(os.environ.get("LRU_CAPACITY", "10000"))
+PROMPT_VERSION = os.environ.get("PROMPT_VERSION", Settings.prompt_version)  # part of every cache key
+PROMPT_STYLE = os.environ.get("PROMPT_STYLE", "full")  # "compact" drops empty fields, URLs -> hosts
+CACHE_TTL_SECONDS = float(os.environ.get("CACHE_TTL_SECONDS", "0")) or None  # 0 = never expire
+CACHE_MAX_ROWS = int(os.environ.get("CACHE_MAX_ROWS", "0")) or None  # 0 = unbounded
+CACHE_EVICT_SECONDS = float(os.environ.get("CACHE_EVICT_SECONDS", "300"))  # TTL/max-rows sweep interval
+SIMILAR_INDEX = os.environ.get("SIMILAR_INDEX", "")  # dir for the near-duplicate index; "" = off
+SIMILAR_THRESHOLD = float(os.environ.get("SIMILAR_THRESHOLD", "0.6"))  # min MinHash similarity
+CACHE_REMOTE = os.environ.get("CACHE_REMOTE", "")  # gs://bucket/cache.sqlite or a shared path
+CACHE_SYNC_TIMEOUT = float(os.environ.get("CACHE_SYNC_TIMEOUT", "60"))  # per pull/push; then run without
+BACKFILL_STATE = os.environ.get("BACKFILL_STATE", "/tmp/backfill_state.sqlite")
+JOBS_DB = os.environ.get("JOBS_DB", "/tmp/jobs.sqlite")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))
+JOB_CHUNK_ROWS = int(os.environ.get("JOB_CHUNK_ROWS", "5000"))  # rows per checkpointed pass
+JOB_WAIT_SECONDS = float(os.environ.get("JOB_WAIT_SECONDS", "5"))  # retry delay while /enrich holds the slice
+LEASE_SHARDS = int(os.environ.get("LEASE_SHARDS", "0"))  # >0 = /enrich leases one of N hash shards
+LEASE_TTL_SECONDS = float(os.environ.get("LEASE_TTL_SECONDS", "300"))  # renewed every ttl/3
+LEASE_BACKEND = os.environ.get("LEASE_BACKEND", "bigquery")  # "sqlite" = single-host stand-in
+LEASE_DB = os.environ.get("LEASE_DB", "/tmp/leases.sqlite")
+INCREMENTAL_COLUMN = os.environ.get("INCREMENTAL_COLUMN", "")  # e.g. "last_updated"; "" = full scans
+TOUCH_COLUMN = os.environ.get("TOUCH_COLUMN", "")  # stamped by every write, e.g. last_updated; "" = none
+STATS_EXACT_SECONDS = float(os.environ.get("STATS_EXACT_SECONDS", "3600"))  # /stats reseed interval
+WARMUP = os.environ.get("WARMUP", "1") == "1"  # build BigQuery/model clients in the background at startup
+AUTOTUNE = os.environ.get("AUTOTUNE", "0") == "1"  # adjust CONCURRENCY/BATCH_SIZE from observed batches
+CONCURRENCY_MIN = int(os.environ.get("CONCURRENCY_MIN", "2"))
+CONCURRENCY_MAX = int(os.environ.get("CONCURRENCY_MAX", str(max(CONCURRENCY, 64))))
+BATCH_SIZE_MIN = int(os.environ.get("BATCH_SIZE_MIN", "50"))
+BATCH_SIZE_MAX = int(os.environ.get("BATCH_SIZE_MAX", str(max(BATCH_SIZE, 1000))))
+AUTOTUNE_ERROR_CEILING = float(os.environ.get("AUTOTUNE_ERROR_CEILING", "0.02"))  # (errors + 429s) / requests
 
-bq = BigQueryIO(PROJECT_ID, DATASET_ID, TABLE_ID, location=BQ_LOCATION)
+# Process state, built by _build() when the app starts (see _lifespan).
+# Why: importing the module opens no files, clients or threads.
+bq: Optional[BigQueryIO] = None
+pending_counter: Optional[PendingCounter] = None
+cache: Optional[TieredCache] = None
+cache_remote: Optional[RemoteTier] = None
+resolver: Optional[PreResolver] = None
+similar: Optional["SimilarityIndex"] = None
+tuner: Optional[AutoTuner] = None
+leases: Optional[Any] = None
+jobs: Optional[JobRunner] = None
+
+
+def _build(io: Optional[Any] = None) -> None:
+    """Construct the process state; `io` replaces BigQueryIO (offline harnesses)."""
+    global bq, pending_counter, cache, cache_remote, resolver, similar, tuner, leases, jobs
+    bq = io if io is not None else BigQueryIO(
+        PROJECT_ID,
+        DATASET_ID,
+        TABLE_ID,
+        location=BQ_LOCATION,
+        change_column=INCREMENTAL_COLUMN or None,
+        touch_column=TOUCH_COLUMN or None,
+    )
+    pending_counter = PendingCounter(bq, max_age=STATS_EXACT_SECONDS)
+    cache = TieredCache(
+        EnrichmentCache(
+            CACHE_PATH,
+            # Why: answers depend on which models can produce them.
+            model=">".join(t.model for t in MODEL_TIERS),
+            prompt_version=PROMPT_VERSION if PROMPT_STYLE == "full" else f"{PROMPT_VERSION}+{PROMPT_STYLE}",
+            ttl_seconds=CACHE_TTL_SECONDS,
+            max_rows=CACHE_MAX_ROWS,
+            evict_interval=CACHE_EVICT_SECONDS,
+        ),
+        capacity=LRU_CAPACITY,
+    )
+    cache_remote = remote_tier(CACHE_REMOTE, CACHE_SYNC_TIMEOUT)
+    resolver = PreResolver(RESOLVER_MIN_CONFIDENCE) if PRE_RESOLVER else None
+    similar = None
+    if SIMILAR_INDEX:
+        from venue_enricher.similarity import SimilarityIndex
+
+        similar = SimilarityIndex(SIMILAR_INDEX, threshold=SIMILAR_THRESHOLD)
+    # Why: process-wide so what one /enrich call learns carries over to the next.
+    tuner = (
+        AutoTuner(
+            Knob(CONCURRENCY, CONCURRENCY_MIN, CONCURRENCY_MAX),
+            Knob(BATCH_SIZE, BATCH_SIZE_MIN, BATCH_SIZE_MAX),
+            error_ceiling=AUTOTUNE_ERROR_CEILING,
+        )
+        if AUTOTUNE
+        else None
+    )
+    leases = (
+        lease_store(LEASE_BACKEND, LEASE_DB, PROJECT_ID, DATASET_ID, TABLE_ID, location=BQ_LOCATION)
+        if LEASE_SHARDS
+        else None
+    )
+    if JOBS_DB.startswith("/tmp/"):
+        # Why: /tmp on Cloud Run is instance memory; jobs there cannot resume elsewhere.
+        print({"event": "jobs_db_ephemeral", "path": JOBS_DB})
+    jobs = JobRunner(JobStore(JOBS_DB), _run_job, workers=JOB_WORKERS)
+
+
+# Keyset resume cursor per (overwrite, shard, num_shards); None = start of table.
+_cursors: Dict[Any, Optional[str]] = {}
+_cursors_busy: Set[Any] = set()  # cursor keys with a run in flight
+_cursors_lock = threading.Lock()
+
+def _claim_cursor(key: Any) -> bool:
+    """Mark a cursor key busy; False if a run (an /enrich call or a job pass) holds it."""
+    with _cursors_lock:
+        if key in _cursors_busy:
+            return False
+        _cursors_busy.add(key)
+        return True
+
+
+def _free_cursor(key: Any) -> None:
+    with _cursors_lock:
+        _cursors_busy.discard(key)
+
+
+# Stream mode: one consolidated MERGE at a time per process.
+_apply_lock = threading.Lock()
+_last_apply = [0.0]
+_staged_complete = [0]  # staged rows with both city and country since the last apply
+_unapplied: Dict[object, Set[str]] = {}  # per run: ids staged since the last apply
+_credited: Dict[object, int] = {}  # per run: its rows a MERGE modified, not yet reported
+
+
+def _complete(updates: ResultBatch) -> int:
+    return sum(1 for _, city, country in updates if city and country)
+
+
+def _stage(run: object, updates: ResultBatch) -> int:
+    staged = bq.append_staged(updates)
+    with _apply_lock:
+        _staged_complete[0] += _complete(updates)
+        _unapplied.setdefault(run, set()).update(rid for rid, _, _ in updates)
+    return staged
+
+
+def _apply_staged(run: object, force: bool = False) -> int:
+    """
+    MERGE the changelog (at most every MERGE_INTERVAL unless forced); returns how many
+    of `run`'s staged rows were modified since its last call, whichever run merged them.
+    Why: the MERGE also applies other writers' rows; those are not this run's updates.
+    """
+    with _apply_lock:
+        if force or time.monotonic() - _last_apply[0] >= MERGE_INTERVAL:
+            affected, modified = bq.merge_staged(set().union(*_unapplied.values()))
+            _last_apply[0] = time.monotonic()
+            # Why: partially answered rows stay pending; only complete answers leave the set.
+            pending_counter.written(min(affected, _staged_complete[0]))
+            _staged_complete[0] = 0
+            for owner, ids in _unapplied.items():
+                _credited[owner] = _credited.get(owner, 0) + len(ids & modified)
+            _unapplied.clear()
+        return _credited.pop(run, 0)
+
+
+_warmed = threading.Event()
+
+
+def _warm() -> None:
+    """Import the SDKs and build the BigQuery client and model engine off the request path."""
+    started = time.monotonic()
+    for step, build in (("bigquery", lambda: bq.client), ("model", _engine)):
+        try:
+            build()
+        except Exception as exc:  # noqa: BLE001 - the first real call retries and reports it
+            print({"event": "warmup_failed", "step": step, "error": str(exc)})
+    _warmed.set()
+    print({"event": "warmup_done", "seconds": round(time.monotonic() - started, 3)})
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Build state, start job workers, the shared-cache pull and warm-up; undo on shutdown."""
+    _build()
+    # Why: readiness must not wait on a snapshot download; until the pull merges, the
+    # local cache answers (or misses) on its own.
+    threading.Thread(target=_load_cache, name="cache-pull", daemon=True).start()
+    jobs.start()
+    # Why: a restarted instance continues checkpointed jobs instead of restarting them.
+    jobs.resume()
+    if WARMUP:
+        # Why: /health answers at once on scale-from-zero; the first /enrich finds clients built.
+        threading.Thread(target=_warm, name="warmup", daemon=True).start()
+    try:
+        yield
+    finally:
+        jobs.stop()
+        _save_cache()
+
+
+app = FastAPI(title="venue-enricher", version="1.0.1", lifespan=_lifespan)
 
 
 @app.get("/health")
@@ -29,14 +245,162 @@ def health() -> Dict[str, Any]:
         "project": PROJECT_ID,
         "dataset": DATASET_ID,
         "table": TABLE_ID,
+        "warm": _warmed.is_set(),
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint() -> str:
+    """Prometheus text format: tokens, cost, model/BigQuery latency, row sources."""
+    return metrics.REGISTRY.render()
+
+
 @app.get("/stats")
-def stats() -> Dict[str, Any]:
-    # Why: Disable result cache to see fresh counts after MERGE
-    pending = bq.count_pending()
-    return {"pending": pending}
+def stats(exact: bool = Query(False, description="run a full COUNT(*) and reseed")) -> Dict[str, Any]:
+    """
+    Approximate pending count, updated incrementally between exact counts.
+    Why: a no-cache COUNT(*) over the whole table on every hit costs table size.
+    """
+    return pending_counter.exact() if exact else pending_counter.get()
+
+
+def _run(
+    limit: int,
+    overwrite: bool,
+    verbose: bool,
+    start: Optional[str],
+    shard: int = 0,
+    num_shards: int = 1,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    changed_since: Optional[Any] = None,
+    guard: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """
+    One pipeline pass over at most `limit` rows after cursor `start`
+    (and changed after `changed_since`, if given). `guard` runs before every
+    write and may raise to stop the run (e.g. LeaseKeeper.check).
+    Returns pipeline counters plus the last id fetched ("last_id").
+    """
+    last_id: Optional[str] = start
+    fetched = 0
+    # Why: the Storage Read API is unordered and unsharded; cursors/shards need SQL.
+    use_storage = BQ_READER == "storage" and num_shards == 1
+    page_size = (lambda: tuner.batch_size) if tuner is not None else BATCH_SIZE
+
+    def _pages():
+        nonlocal last_id, fetched
+        if use_storage:
+            source = bq.stream_pages(
+                limit=limit, overwrite=overwrite, page_size=page_size, changed_since=changed_since
+            )
+        else:
+            source = bq.iter_pages(
+                limit=limit,
+                overwrite=overwrite,
+                page_size=page_size,
+                after_id=start,
+                shard=shard,
+                num_shards=num_shards,
+                changed_since=changed_since,
+            )
+        for page in source:
+            last_id = None if use_storage else str(page[-1].get("id"))
+            fetched += len(page)
+            yield page
+
+    cache_before = cache.stats()
+    metrics_before = metrics.REGISTRY.snapshot()
+    run_stats: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def _enrich(rows: VenueBatch) -> ResultBatch:
+        batch_stats: Dict[str, int] = {}
+        started = time.monotonic()
+        updates = enrich_batch(
+            rows,
+            model=OPENAI_MODEL,
+            concurrency=tuner.concurrency if tuner is not None else CONCURRENCY,
+            verbose=verbose,
+            cache=cache,
+            stats=batch_stats,
+            pack_size=PACK_SIZE,
+            resolver=resolver,
+            tiers=MODEL_TIERS,
+            similar=similar,
+        )
+        metrics.record_batch(batch_stats)
+        if tuner is not None:
+            engine = _engine()
+            decision = tuner.observe(
+                batch_stats,
+                time.monotonic() - started,
+                engine.limiter.throttled if engine is not None else None,
+            )
+            if decision is not None:
+                print({"event": "autotune", **decision})
+        with lock:
+            for k, v in batch_stats.items():
+                run_stats[k] = run_stats.get(k, 0) + v
+        return updates
+
+    staged = [0]
+    run = object()  # this run's key in the stream-mode ledgers
+
+    def _write(updates: ResultBatch) -> int:
+        if guard is not None:
+            guard()
+        if WRITE_MODE == "stream":
+            staged[0] += _stage(run, updates)
+            affected = _apply_staged(run)
+        else:
+            affected = bq.update_locations(updates, overwrite=overwrite)
+            if not overwrite:
+                pending_counter.written(min(affected, _complete(updates)))
+        if verbose:
+            print({"event": "batch_done", "asked": len(updates), "affected": affected})
+        return affected
+
+    try:
+        pipeline = run_pipeline(
+            _pages(),
+            _enrich,
+            _write,
+            workers=PIPELINE_WORKERS,
+            flush_rows=FLUSH_ROWS,
+            flush_seconds=FLUSH_SECONDS,
+            on_progress=on_progress,
+        )
+
+        if WRITE_MODE == "stream":
+            # Why: "updated" must reflect rows this run staged, so apply before returning.
+            if guard is not None:
+                guard()
+            pipeline["written"] += _apply_staged(run, force=True)
+            pipeline["staged"] = staged[0]
+    finally:
+        with _apply_lock:
+            # Why: a failed run's staged rows still merge later; nobody reports them.
+            _unapplied.pop(run, None)
+            _credited.pop(run, None)
+
+    return {
+        "pipeline": pipeline,
+        "dedup": {k: v for k, v in run_stats.items() if not k.startswith("tier")},
+        "tiers": tier_report(MODEL_TIERS, run_stats),
+        # Why: tokens, cost and hit rates come from this run's stats; latency, BigQuery time
+        # and prompt savings are process-wide deltas that concurrent runs share.
+        "usage": {
+            **metrics.summarize(metrics.delta(metrics_before)),
+            **metrics.run_usage(run_stats, [t.model for t in MODEL_TIERS]),
+        },
+        "last_id": last_id,
+        "exhausted": fetched < limit,
+        # Why: per-run deltas; lru_size is the current occupancy.
+        "cache": {
+            k: (v if k == "lru_size" else v - cache_before.get(k, 0))
+            for k, v in cache.stats().items()
+        },
+    }
 
 
 @app.post("/enrich")
@@ -44,37 +408,311 @@ def enrich(
     limit: int = Query(1000, ge=1, le=5000),
     overwrite: bool = Query(False),
     verbose: bool = Query(False),
+    cursor: Optional[str] = Query(None, description="resume after this id"),
+    shard: int = Query(0, ge=0),
+    num_shards: int = Query(1, ge=1),
+    full: bool = Query(False, description="ignore INCREMENTAL_COLUMN and scan every pending row"),
 ) -> Dict[str, Any]:
     """
     Returns the actual number of rows modified in BigQuery.
     Why: Affected rows proves pending will drop.
+    Reading, enrichment and writes run as an overlapped, bounded pipeline.
+    Rows are claimed in id order after the last cursor (or `cursor`), optionally
+    restricted to hash shard `shard` of `num_shards`, so runs never overlap.
+    The stored cursor is per process and one run at a time holds it; a concurrent
+    call on the same shard is skipped. Use LEASE_SHARDS to split work across instances.
+    With LEASE_SHARDS set and no explicit shard, the run leases a free shard
+    instead, so concurrent invocations and instances split the pending set.
+    With INCREMENTAL_COLUMN set, only rows changed since the last completed
+    pass are read.
     """
-    total_affected = 0
-    remaining = limit
-    batches = max(1, math.ceil(limit / max(1, BATCH_SIZE)))
+    use_incremental = bool(INCREMENTAL_COLUMN) and not full
+    if leases is not None and num_shards == 1 and cursor is None:
+        return _enrich_leased(limit, overwrite, verbose, use_incremental)
 
-    for _ in range(batches):
-        n = min(BATCH_SIZE, remaining)
-        if n <= 0:
-            break
+    # Why: the stored cursor is read before the run and written after it, so a second
+    # run on the same key would re-read the same rows; only one may hold it at a time.
+    cursor_key = (overwrite, shard, num_shards, use_incremental)
+    if not _claim_cursor(cursor_key):
+        return {"updated": 0, "cursor": None, "skipped": "run in progress for this shard"}
+    try:
+        with _cursors_lock:
+            start = cursor if cursor is not None else _cursors.get(cursor_key)
+        out = _run_slice(limit, overwrite, verbose, start, shard, num_shards, use_incremental)
+        # Why: an exhausted slice wraps so rows left pending are revisited next run.
+        next_cursor = None if out["exhausted"] else out["last_id"]
+        with _cursors_lock:
+            _cursors[cursor_key] = next_cursor
+    finally:
+        _free_cursor(cursor_key)
+    return _response(out, next_cursor, limit, overwrite)
 
-        rows = bq.fetch_rows(limit=n, overwrite=overwrite)
-        if not rows:
-            break
 
-        updates = enrich_batch(
-            rows, model=OPENAI_MODEL, concurrency=CONCURRENCY, verbose=verbose
+def _run_slice(
+    limit: int,
+    overwrite: bool,
+    verbose: bool,
+    start: Optional[str],
+    shard: int,
+    num_shards: int,
+    use_incremental: bool,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    guard: Optional[Callable[[], None]] = None,
+) -> Dict[str, Any]:
+    """_run, limited to changed rows in incremental mode; an exhausted run closes the pass."""
+    if not use_incremental:
+        return _run(limit, overwrite, verbose, start, shard, num_shards, on_progress, guard=guard)
+    kind = incremental.pass_kind(overwrite, shard, num_shards)
+    since = incremental.begin(bq, kind, start)
+    out = _run(
+        limit, overwrite, verbose, start, shard, num_shards, on_progress, changed_since=since, guard=guard
+    )
+    # Why: failed rows stay pending but fall behind the mark; `full=true` sweeps pick them up.
+    if out["exhausted"] and guard is not None:
+        guard()
+    mark = incremental.finish(bq, kind) if out["exhausted"] else None
+    out["incremental"] = {
+        "changed_since": since.isoformat() if since else None,
+        "pass_done": out["exhausted"],
+        "high_water_mark": mark.isoformat() if mark else None,
+    }
+    return out
+
+
+def _leased_slice(
+    limit: int,
+    overwrite: bool,
+    verbose: bool,
+    use_incremental: bool,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Optional[Tuple[Dict[str, Any], Lease, Optional[str]]]:
+    """
+    Lease a free shard of LEASE_SHARDS, run it from the cursor stored on the
+    lease, and release it with the new cursor. Returns (run output, lease, new
+    cursor), or None when every shard is leased. Raises LeaseLost.
+    Why: the cursor lives in the lease table, not in this process, so any
+    instance can pick the shard up next.
+    """
+    # Why: overwrite and full runs scan different rows, so their cursors are kept apart.
+    scope = "overwrite" if overwrite else "pending"
+    if INCREMENTAL_COLUMN and not use_incremental:
+        scope += ":full"
+    lease = leases.acquire(scope, LEASE_SHARDS, new_owner(), LEASE_TTL_SECONDS)
+    if lease is None:
+        return None
+    with LeaseKeeper(leases, lease, LEASE_TTL_SECONDS) as keeper:
+        # Why: checked before each write and commit, so nothing lands once another
+        # owner may have taken the shard.
+        out = _run_slice(
+            limit, overwrite, verbose, lease.cursor, lease.shard, LEASE_SHARDS, use_incremental,
+            on_progress=on_progress, guard=keeper.check,
         )
-        affected = bq.update_locations(updates, overwrite=overwrite)
-        total_affected += affected
-        remaining -= n
+        next_cursor = None if out["exhausted"] else out["last_id"]
+        keeper.cursor = next_cursor
+    return out, lease, next_cursor
 
-        if verbose:
-            print({"event": "batch_done", "asked": n, "affected": affected})
 
+def _enrich_leased(limit: int, overwrite: bool, verbose: bool, use_incremental: bool) -> Dict[str, Any]:
+    """/enrich on a leased shard (see _leased_slice)."""
+    try:
+        leased = _leased_slice(limit, overwrite, verbose, use_incremental)
+    except LeaseLost as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    if leased is None:
+        return {"updated": 0, "lease": None, "skipped": "all shards leased"}
+    out, lease, next_cursor = leased
+    resp = _response(out, next_cursor, limit, overwrite)
+    resp["lease"] = {"shard": lease.shard, "num_shards": LEASE_SHARDS, "owner": lease.owner}
+    return resp
+
+
+def _response(out: Dict[str, Any], next_cursor: Optional[str], limit: int, overwrite: bool) -> Dict[str, Any]:
     return {
-        "updated": total_affected,
+        "updated": out["pipeline"]["written"],
+        "cursor": next_cursor,
         "limit": limit,
-        "batch_size": BATCH_SIZE,
+        "batch_size": tuner.batch_size if tuner is not None else BATCH_SIZE,
         "overwrite": overwrite,
+        "pipeline": out["pipeline"],
+        "dedup": out["dedup"],
+        "tiers": out["tiers"],
+        "usage": out["usage"],
+        "resilience": _engine().resilience.stats() if _engine() is not None else {},
+        "bq_jobs": bq.pop_timings(),
+        "cache": out["cache"],
+        "incremental": out.get("incremental"),
+        "autotune": tuner.report() if tuner is not None else None,
     }
+
+
+def _run_job(job: Dict[str, Any], checkpoint: Callable[..., None]) -> None:
+    """
+    JobRunner callback: enrich in JOB_CHUNK_ROWS passes from the job's cursor,
+    checkpointing cursor + counters after each pass's writes have landed.
+    Each pass holds what an /enrich call on the same slice would: a free lease shard
+    with LEASE_SHARDS set and no explicit shard, else the cursor busy-mark.
+    Why: a job and /enrich on the same rows would read, ask and write them twice.
+    """
+    params = job["params"]
+    overwrite = params.get("overwrite", False)
+    shard, num_shards = params.get("shard", 0), params.get("num_shards", 1)
+    use_incremental = bool(INCREMENTAL_COLUMN) and not params.get("full", False)
+    cursor = job["cursor"]
+    ended: Set[int] = set()  # lease shards scanned to their end by this job
+    while job["counters"].get("fetched", 0) < params["limit"]:
+        n = min(JOB_CHUNK_ROWS, params["limit"] - job["counters"].get("fetched", 0))
+        base = dict(job["counters"])
+
+        def _progress(p: Dict[str, Any]) -> None:
+            # Why: live counters are display-only; resume uses the pass-start checkpoint.
+            checkpoint(cursor, base, live=_add_counters(base, p))
+
+        if leases is not None and num_shards == 1:
+            # Why: the shard's cursor lives on the lease, so the job keeps none of its own.
+            leased = _leased_slice(n, overwrite, False, use_incremental, on_progress=_progress)
+            if leased is None:
+                time.sleep(JOB_WAIT_SECONDS)
+                continue
+            out, lease, _ = leased
+            job["counters"] = _add_counters(base, out["pipeline"], out["dedup"])
+            checkpoint(None, job["counters"])
+            if out["exhausted"]:
+                ended.add(lease.shard)
+                if len(ended) >= LEASE_SHARDS:
+                    return
+            continue
+
+        key = (overwrite, shard, num_shards, use_incremental)
+        if not _claim_cursor(key):
+            time.sleep(JOB_WAIT_SECONDS)
+            continue
+        try:
+            out = _run_slice(
+                n, overwrite, False, cursor, shard, num_shards, use_incremental, on_progress=_progress
+            )
+        finally:
+            _free_cursor(key)
+        job["counters"] = _add_counters(base, out["pipeline"], out["dedup"])
+        if out["exhausted"]:
+            checkpoint(cursor, job["counters"])
+            return
+        cursor = out["last_id"]
+        checkpoint(cursor, job["counters"])
+
+
+def _add_counters(
+    base: Dict[str, int], pipeline: Dict[str, Any], dedup: Optional[Dict[str, int]] = None
+) -> Dict[str, int]:
+    out = dict(base)
+    for k in ("fetched", "enriched", "written"):
+        out[k] = base.get(k, 0) + int(pipeline.get(k, 0))
+    if dedup is not None:
+        out["failed"] = base.get("failed", 0) + dedup.get("model_errors", 0)
+    return out
+
+
+def _bounded(fn: Callable[[], Any], timeout: float) -> Any:
+    """Run fn on a helper thread; TimeoutError if it outlives `timeout` (it is abandoned)."""
+    # Why: the tier's transport timeout does not cover retries or a hung local copy.
+    box: Dict[str, Any] = {}
+
+    def run() -> None:
+        try:
+            box["value"] = fn()
+        except BaseException as exc:  # noqa: BLE001 - re-raised on the caller's thread
+            box["error"] = exc
+
+    worker = threading.Thread(target=run, name="cache-sync", daemon=True)
+    worker.start()
+    worker.join(timeout)
+    if worker.is_alive():
+        raise TimeoutError(f"cache sync did not finish in {timeout:g}s")
+    if "error" in box:
+        raise box["error"]
+    return box.get("value")
+
+
+def _load_cache() -> None:
+    """Merge the shared snapshot into the live local store (runs on its own thread)."""
+    # Why: a fresh instance starts warm from answers other instances already paid for.
+    if cache_remote is None:
+        return
+    try:
+        merged = _bounded(lambda: cache.store.sync_from(cache_remote), CACHE_SYNC_TIMEOUT)
+        print({"event": "cache_pull", "merged": merged})
+    except Exception as exc:  # noqa: BLE001 - a cold cache is not fatal
+        print({"event": "cache_pull_failed", "error": str(exc)})
+
+
+def _save_cache() -> None:
+    cache.flush()
+    removed = cache.store.evict()
+    if cache_remote is None:
+        return
+
+    def sync() -> None:
+        # Why: merge first so concurrent instances do not overwrite each other's answers.
+        cache.store.sync_from(cache_remote)
+        cache.store.sync_to(cache_remote)
+
+    try:
+        # Why: shutdown has a short grace period; a stalled remote must not eat it.
+        _bounded(sync, 2 * CACHE_SYNC_TIMEOUT)
+        print({"event": "cache_push", "evicted": removed})
+    except Exception as exc:  # noqa: BLE001
+        print({"event": "cache_push_failed", "error": str(exc)})
+
+
+@app.post("/jobs")
+def create_job(
+    limit: int = Query(100000, ge=1),
+    overwrite: bool = Query(False),
+    shard: int = Query(0, ge=0),
+    num_shards: int = Query(1, ge=1),
+    full: bool = Query(False, description="ignore INCREMENTAL_COLUMN and scan every pending row"),
+) -> Dict[str, Any]:
+    """Start a background enrichment job; returns its id immediately."""
+    job_id = jobs.submit(
+        {"limit": limit, "overwrite": overwrite, "shard": shard, "num_shards": num_shards, "full": full}
+    )
+    return {"id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = jobs.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="job not found")
+    return job
+
+
+_backfill: Optional[Backfill] = None
+_backfill_lock = threading.Lock()  # one tick at a time per process
+
+
+@app.post("/backfill/step")
+def backfill_step(
+    limit: Optional[int] = Query(None, ge=1),
+    overwrite: bool = Query(False),
+) -> Dict[str, Any]:
+    """
+    One Batch API backfill tick: poll jobs, merge finished ones, submit more.
+    Why: bulk runs are not bound by the request timeout or limit<=5000.
+    An overlapping tick is skipped: two would build two ledgers and submit the same rows.
+    """
+    global _backfill
+    if not _backfill_lock.acquire(blocking=False):
+        return {"updated": 0, "submitted": 0, "skipped": "backfill step in progress"}
+    try:
+        if _backfill is None:
+            from openai import OpenAI
+
+            _backfill = Backfill(
+                bq,
+                OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "")),
+                BackfillState(BACKFILL_STATE),
+                model=OPENAI_MODEL,
+            )
+        return _backfill.step(limit=limit, overwrite=overwrite)
+    finally:
+        _backfill_lock.release()
@@ -0,0 +1,301 @@
+# file: src/venue_enricher/async_engine.py
+from __future__ import annotations
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+from .prompts import (
+    JSON_SCHEMA,
+    PACKED_JSON_SCHEMA,
+    PACKED_SYSTEM_PROMPT,
+    SYSTEM_PROMPT,
+    build_compact_user_prompt,
+    build_packed_user_prompt,
+    build_user_prompt,
+    parse_packed,
+    validate_item,
+)
+from . import metrics
+from .resilience import Resilience
+
+
+@dataclass
+class Answer:
+    city: str = ""
+    country: str = ""
+    confidence: float = 0.0
+    evidence: str = ""
+    tokens: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class TokenBucket:
+    """
+    Paired request/token buckets sized from RPM/TPM budgets.
+    Why: pace requests to the account quota instead of bursting into 429s.
+    Burst capacity is ten seconds of budget; the rate adapts to server signals.
+    """
+
+    BURST_SECONDS = 10.0
+
+    def __init__(self, rpm: int, tpm: int) -> None:
+        self.max_rpm = float(max(1, rpm))
+        self.max_tpm = float(max(1, tpm))
+        self.rpm = self.max_rpm
+        self.tpm = self.max_tpm
+        self._req = self._cap(self.rpm)
+        self._tok = self._cap(self.tpm)
+        self._stamp = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _cap(self, per_minute: float) -> float:
+        return max(1.0, per_minute * self.BURST_SECONDS / 60.0)
+
+    def _refill(self, now: float) -> None:
+        dt = now - self._stamp
+        self._stamp = now
+        self._req = min(self._cap(self.rpm), self._req + dt * self.rpm / 60.0)
+        self._tok = min(self._cap(self.tpm), self._tok + dt * self.tpm / 60.0)
+
+    def try_acquire(self, tokens: int) -> float:
+        """Take one request + `tokens`, or return seconds to wait before retrying."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            self._refill(now)
+            # Why: a single request larger than the burst must still pass eventually.
+            need = min(float(tokens), self._cap(self.tpm))
+            if self._req >= 1.0 and self._tok >= need:
+                self._req -= 1.0
+                self._tok -= need
+                return 0.0
+            wait_r = (1.0 - self._req) * 60.0 / self.rpm if self._req < 1.0 else 0.0
+            wait_t = (need - self._tok) * 60.0 / self.tpm if self._tok < need else 0.0
+            return max(wait_r, wait_t, 0.005)
+
+    async def acquire(self, tokens: int) -> None:
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """Charge the difference between the estimate and reported usage."""
+        with self._lock:
+            self._tok -= actual - estimated
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Adopt server-reported limits/remaining when tighter than ours."""
+        def _num(name: str) -> Optional[float]:
+            try:
+                return float(headers.get(name))  # type: ignore[arg-type]
+            except (TypeError, ValueError):
+                return None
+
+        with self._lock:
+            lim_r = _num("x-ratelimit-limit-requests")
+            lim_t = _num("x-ratelimit-limit-tokens")
+            if lim_r:
+                self.max_rpm = min(self.max_rpm, lim_r)
+            if lim_t:
+                self.max_tpm = min(self.max_tpm, lim_t)
+            rem_r = _num("x-ratelimit-remaining-requests")
+            rem_t = _num("x-ratelimit-remaining-tokens")
+            if rem_r is not None:
+                self._req = min(self._req, rem_r)
+            if rem_t is not None:
+                self._tok = min(self._tok, rem_t)
+            # Additive recovery after earlier throttling.
+            self.rpm = min(self.max_rpm, self.rpm + self.max_rpm * 0.02)
+            self.tpm = min(self.max_tpm, self.tpm + self.max_tpm * 0.02)
+
+    def throttle(self, retry_after: Optional[float]) -> None:
+        """On 429: pause everyone and cut the rate multiplicatively."""
+        with self._lock:
+            self.throttled += 1
+            pause = retry_after if retry_after is not None else 1.0
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self.rpm = max(self.max_rpm * 0.1, self.rpm * 0.75)
+            self.tpm = max(self.max_tpm * 0.1, self.tpm * 0.75)
+
+
+def _parse_content(content: str) -> Optional[Answer]:
+    try:
+        clean = validate_item(json.loads(content or "{}"))
+    except ValueError:
+        return None
+    return Answer(**clean) if clean else None
+
+
+Outcome = Union[Answer, BaseException]
+
+
+class AsyncEngine:
+    """
+    Runs model calls on one background event loop shared by all batches.
+    Why: hundreds of in-flight requests cost one thread, and one limiter
+    sees every request the process makes.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        limiter: TokenBucket,
+        max_tokens: int = 160,
+        resilience: Optional[Resilience] = None,
+        deadline: float = 30.0,
+        compact: bool = False,
+    ) -> None:
+        self.client = client
+        self.limiter = limiter
+        self.max_tokens = max_tokens
+        self.resilience = resilience or Resilience()
+        self.deadline = deadline  # per request, including retries and limiter waits
+        self.compact = compact  # build_compact_user_prompt instead of the full builder
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self.loop.run_forever, name="async-engine", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, coro: Any) -> Future:
+        """Schedule a coroutine on the engine loop; returns a concurrent Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def resolve(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]],
+        model: str,
+        sem: asyncio.Semaphore,
+        pack_size: int = 1,
+    ) -> List[Future]:
+        """
+        Schedule (key, row) items, `pack_size` venues per request.
+        Each future resolves to {key: Answer | exception} for its pack.
+        """
+        k = max(1, pack_size)
+        return [
+            self.submit(self._resolve_pack(items[i : i + k], model, sem))
+            for i in range(0, len(items), k)
+        ]
+
+    async def _resolve_pack(
+        self, pack: List[Tuple[str, Dict[str, Any]]], model: str, sem: asyncio.Semaphore
+    ) -> Dict[str, Outcome]:
+        out: Dict[str, Outcome] = {}
+        # Why: the packed call and the singles re-ask share one budget, so no row waits
+        # longer than `deadline` in total.
+        give_up = self.loop.time() + self.deadline
+        if len(pack) > 1:
+            async with sem:
+                try:
+                    out.update(await asyncio.wait_for(self._ask_packed(pack, model), self.deadline))
+                except Exception:
+                    pass  # whole pack is re-queued below
+        # Why: missing/invalid items are re-asked one by one, never dropped.
+        retry = [(key, row) for key, row in pack if key not in out]
+        singles = await asyncio.gather(
+            *(self._ask_bounded(row, model, sem, give_up) for _, row in retry),
+            return_exceptions=True,
+        )
+        out.update({key: res for (key, _), res in zip(retry, singles)})
+        return out
+
+    async def _ask_bounded(
+        self, row: Dict[str, Any], model: str, sem: asyncio.Semaphore, give_up: Optional[float] = None
+    ) -> Answer:
+        async with sem:
+            # Why: one slow call must not stall the batch; the row is re-queued instead.
+            budget = self.deadline if give_up is None else max(0.0, give_up - self.loop.time())
+            return await asyncio.wait_for(self._ask(row, model), budget)
+
+    async def _complete(
+        self, model: str, system: str, user: str, schema: Dict[str, Any], max_tokens: int
+    ) -> Tuple[str, int, int]:
+        """One limiter-paced, resilient chat completion; returns (content, prompt, completion tokens)."""
+        estimate = (len(system) + len(user)) // 4 + max_tokens
+
+        async def _attempt() -> Any:
+            await self.limiter.acquire(estimate)
+            return await self.client.chat.completions.with_raw_response.create(
+                model=model,
+                temperature=0,
+                max_tokens=max_tokens,
+                response_format={"type": "json_schema", "json_schema": schema},
+                messages=[
+                    {"role": "system", "content": system},
+                    {"role": "user", "content": user},
+                ],
+            )
+
+        started = time.monotonic()
+        try:
+            raw = await self.resilience.call_async(_attempt, on_throttle=self.limiter.throttle)
+        except Exception:
+            metrics.MODEL_REQUESTS.inc(model=model, outcome="error")
+            raise
+        self.limiter.observe(raw.headers)
+        resp = raw.parse()
+        usage = getattr(resp, "usage", None)
+        tokens = int(getattr(usage, "total_tokens", 0) or 0)
+        if tokens:
+            self.limiter.settle(estimate, tokens)
+        prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+        completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+        metrics.record_usage(model, prompt_tokens, completion_tokens, time.monotonic() - started)
+        return (resp.choices[0].message.content or "").strip(), prompt_tokens, completion_tokens
+
+    def _prompt(self, full: str, compact: str) -> str:
+        # Why: both sizes are recorded so the saving is measured even while sending full.
+        metrics.PROMPT_CHARS.inc(len(full), builder="full")
+        metrics.PROMPT_CHARS.inc(len(compact), builder="compact")
+        return compact if self.compact else full
+
+    async def _ask(self, row: Dict[str, Any], model: str) -> Answer:
+        user = self._prompt(build_user_prompt(row), build_compact_user_prompt(row))
+        content, prompt, completion = await self._complete(
+            model, SYSTEM_PROMPT, user, JSON_SCHEMA, self.max_tokens
+        )
+        ans = _parse_content(content)
+        if ans is None:
+            raise ValueError(f"invalid model output: {content[:200]!r}")
+        ans.tokens, ans.prompt_tokens, ans.completion_tokens = prompt + completion, prompt, completion
+        return ans
+
+    async def _ask_packed(
+        self, pack: List[Tuple[str, Dict[str, Any]]], model: str
+    ) -> Dict[str, Answer]:
+        ids = [str(i) for i in range(len(pack))]
+        rows = [row for _, row in pack]
+        user = self._prompt(
+            build_packed_user_prompt(zip(ids, rows)),
+            build_packed_user_prompt(zip(ids, rows), compact=True),
+        )
+        content, prompt, completion = await self._complete(
+            model,
+            PACKED_SYSTEM_PROMPT,
+            user,
+            PACKED_JSON_SCHEMA,
+            self.max_tokens * len(pack),
+        )
+        parsed = parse_packed(content, ids)
+        n = max(1, len(parsed))
+        return {
+            key: Answer(
+                **parsed[item_id],
+                tokens=prompt // n + completion // n,
+                prompt_tokens=prompt // n,
+                completion_tokens=completion // n,
+            )
+            for item_id, (key, _) in zip(ids, pack)
+            if item_id in parsed
+        }
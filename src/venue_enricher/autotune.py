@@ -0,0 +1,158 @@
+# file: src/venue_enricher/autotune.py
+"""
+Feedback controller for per-batch model concurrency and rows per fetched page.
+Why: the best CONCURRENCY / BATCH_SIZE moves with OpenAI latency, 429 rates
+and BigQuery job times; a run should settle near the throughput optimum
+without redeploying new env values.
+
+AIMD with a hill-climbing guard, evaluated once per window of finished batches:
+- error rate (failed keys + 429s per request) above the ceiling: cut both knobs
+  multiplicatively;
+- throughput fell after the last increase: step concurrency back;
+- otherwise: add one step of concurrency.
+Batch size grows while batches carry fewer model keys than there are slots
+(the semaphore idles), and shrinks when a batch takes longer than `target_seconds`.
+"""
+from __future__ import annotations
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+
+class Knob:
+    """One tuned integer between bounds."""
+
+    def __init__(self, start: int, lo: int, hi: int) -> None:
+        self.lo = max(1, lo)
+        self.hi = max(self.lo, hi)
+        self.value = min(self.hi, max(self.lo, start))
+
+    def set(self, value: float) -> int:
+        self.value = int(min(self.hi, max(self.lo, round(value))))
+        return self.value
+
+
+class AutoTuner:
+    def __init__(
+        self,
+        concurrency: Knob,
+        batch_size: Knob,
+        error_ceiling: float = 0.02,
+        concurrency_step: int = 4,
+        decrease: float = 0.7,
+        target_seconds: float = 10.0,
+        min_window_seconds: float = 2.0,
+        min_window_requests: int = 20,
+        history: int = 50,
+    ) -> None:
+        self._concurrency = concurrency
+        self._batch = batch_size
+        self.error_ceiling = error_ceiling
+        self.step = max(1, concurrency_step)
+        self.decrease = decrease
+        self.target_seconds = target_seconds
+        self.min_window_seconds = min_window_seconds
+        self.min_window_requests = min_window_requests
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._throttled_seen: Optional[int] = None
+        self._last_rate = 0.0
+        self._last_action = ""
+        self._reset(time.monotonic())
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency.value
+
+    @property
+    def batch_size(self) -> int:
+        return self._batch.value
+
+    def _reset(self, now: float) -> None:
+        self._window_start = now
+        self._rows = self._requests = self._errors = self._batches = self._keys = 0
+        self._slowest = 0.0
+
+    def observe(
+        self, stats: Dict[str, int], seconds: float, throttled_total: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Feed one finished enrich_batch (its stats dict and wall time).
+        `throttled_total` is the limiter's running 429 count. Returns the
+        decision when this batch closed a window, else None.
+        """
+        with self._lock:
+            throttled = 0
+            if throttled_total is not None:
+                if self._throttled_seen is not None:
+                    throttled = max(0, throttled_total - self._throttled_seen)
+                self._throttled_seen = throttled_total
+            self._rows += stats.get("rows", 0)
+            self._requests += stats.get("model_requests", 0)
+            self._errors += stats.get("model_errors", 0) + throttled
+            self._keys += stats.get("model_keys", 0)
+            self._batches += 1
+            self._slowest = max(self._slowest, seconds)
+
+            now = time.monotonic()
+            elapsed = now - self._window_start
+            if elapsed < self.min_window_seconds or (
+                self._requests and self._requests < self.min_window_requests
+            ):
+                return None
+            return self._decide(now, elapsed)
+
+    def _decide(self, now: float, elapsed: float) -> Dict[str, Any]:
+        rate = self._rows / elapsed if elapsed > 0 else 0.0
+        error_rate = self._errors / self._requests if self._requests else 0.0
+        conc = self._concurrency.value
+
+        if error_rate > self.error_ceiling:
+            action = "backoff"
+            self._concurrency.set(conc * self.decrease)
+            self._batch.set(self._batch.value * self.decrease)
+        elif self._last_action == "increase" and rate < self._last_rate * 0.9:
+            # Why: past the knee, more in-flight calls only add queueing and 429 risk.
+            action = "revert"
+            self._concurrency.set(conc - self.step)
+        elif self._requests == 0:
+            action = "hold"  # nothing reached the model: concurrency is not the limit
+        else:
+            action = "increase"
+            self._concurrency.set(conc + self.step)
+
+        if action != "backoff":
+            keys_per_batch = self._keys / self._batches if self._batches else 0.0
+            if self._slowest > self.target_seconds:
+                self._batch.set(self._batch.value * self.decrease)
+            elif self._requests and keys_per_batch < self._concurrency.value:
+                # Why: fewer unique misses per batch than slots leaves the semaphore idle.
+                self._batch.set(self._batch.value * 1.25)
+
+        decision = {
+            "action": action,
+            "rows_per_sec": round(rate, 1),
+            "error_rate": round(error_rate, 4),
+            "slowest_batch_seconds": round(self._slowest, 3),
+            "concurrency": self._concurrency.value,
+            "batch_size": self._batch.value,
+        }
+        self.decisions.append(decision)
+        self._last_rate = rate
+        self._last_action = action
+        self._reset(now)
+        return decision
+
+    def report(self, last: int = 10) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "concurrency": self._concurrency.value,
+                "batch_size": self._batch.value,
+                "bounds": {
+                    "concurrency": [self._concurrency.lo, self._concurrency.hi],
+                    "batch_size": [self._batch.lo, self._batch.hi],
+                },
+                "error_ceiling": self.error_ceiling,
+                "decisions": list(self.decisions)[-last:],
+            }
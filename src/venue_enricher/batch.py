@@ -0,0 +1,186 @@
+# file: src/venue_enricher/batch.py
+"""
+Column-oriented batches carried from the reader to the writer.
+Why: one dict per row at every stage (fetch, results, write payload) costs
+more memory and GC time than the data itself; on 512Mi instances that caps
+the batch size. A VenueBatch keeps one list per column and hands out slotted
+row views; a ResultBatch keeps ids/cities/countries (with interned place
+names) and serializes straight to the UNNEST, load-job and streaming payloads.
+"""
+from __future__ import annotations
+import io
+import json
+import sys
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+# Same order as bq_io.FETCH_COLUMNS (the SELECT list), so query rows append positionally.
+VENUE_COLUMNS: Tuple[str, ...] = (
+    "id", "name", "address", "alt_name", "website_url", "domain", "linkedin_url", "phone", "city", "country",
+)
+_INTERNED = frozenset({"city", "country"})
+
+# Rows per page: fixed, or read again for every page (the autotuner's current value).
+PageSize = Union[int, Callable[[], int]]
+
+
+def page_limit(page_size: PageSize) -> int:
+    return max(1, page_size() if callable(page_size) else page_size)
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+class VenueRow:
+    """Read-only view of one row; `.get` / `[]` keep it a drop-in for the row dicts."""
+
+    __slots__ = ("_batch", "_i")
+
+    def __init__(self, batch: "VenueBatch", i: int) -> None:
+        self._batch = batch
+        self._i = i
+
+    def get(self, key: str, default: Any = None) -> Any:
+        col = self._batch.index.get(key)
+        return default if col is None else self._batch.data[col][self._i]
+
+    def __getitem__(self, key: str) -> Any:
+        return self._batch.data[self._batch.index[key]][self._i]
+
+    def keys(self) -> Tuple[str, ...]:
+        return self._batch.columns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {c: self._batch.data[j][self._i] for j, c in enumerate(self._batch.columns)}
+
+    def __repr__(self) -> str:
+        return f"VenueRow({self.to_dict()!r})"
+
+
+class VenueBatch:
+    """One page of pending rows, stored as a list per column."""
+
+    __slots__ = ("columns", "index", "data", "_interned")
+
+    def __init__(self, columns: Sequence[str] = VENUE_COLUMNS) -> None:
+        self.columns = tuple(columns)
+        self.index = {c: j for j, c in enumerate(self.columns)}
+        self.data: List[List[Any]] = [[] for _ in self.columns]
+        self._interned = [c in _INTERNED for c in self.columns]
+
+    def append_values(self, values: Sequence[Any]) -> None:
+        """Append one row given positionally in `columns` order (a BigQuery Row, tuple, PendingRow)."""
+        for col, value, intern in zip(self.data, values, self._interned):
+            col.append(_intern(value) if intern else value)
+
+    def append(self, row: Mapping[str, Any]) -> None:
+        self.append_values([row.get(c) for c in self.columns])
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Any], columns: Sequence[str] = VENUE_COLUMNS) -> "VenueBatch":
+        """From row dicts / anything with `.get`."""
+        batch = cls(columns)
+        for r in rows:
+            batch.append(r)
+        return batch
+
+    @classmethod
+    def from_columns(cls, data: Mapping[str, List[Any]], columns: Sequence[str] = VENUE_COLUMNS) -> "VenueBatch":
+        """From equal-length lists per column (e.g. Arrow `to_pylist()`); absent columns are None."""
+        batch = cls(columns)
+        n = len(next(iter(data.values()))) if data else 0
+        for j, c in enumerate(batch.columns):
+            values = data.get(c)
+            if values is None:
+                batch.data[j] = [None] * n
+            elif batch._interned[j]:
+                batch.data[j] = [_intern(v) for v in values]
+            else:
+                batch.data[j] = list(values)
+        return batch
+
+    def extend(self, other: "VenueBatch") -> None:
+        """Append all rows of a batch with the same columns."""
+        for col, more in zip(self.data, other.data):
+            col.extend(more)
+
+    def slice(self, start: int, stop: int) -> "VenueBatch":
+        out = VenueBatch(self.columns)
+        out.data = [col[start:stop] for col in self.data]
+        return out
+
+    def column(self, name: str) -> List[Any]:
+        return self.data[self.index[name]]
+
+    def __len__(self) -> int:
+        return len(self.data[0]) if self.data else 0
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, i: int) -> VenueRow:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return VenueRow(self, i)
+
+    def __iter__(self) -> Iterator[VenueRow]:
+        for i in range(len(self)):
+            yield VenueRow(self, i)
+
+
+class ResultBatch:
+    """{id, city, country} results as three parallel lists; empties are "" so MERGE guards skip them."""
+
+    __slots__ = ("ids", "cities", "countries")
+
+    def __init__(self) -> None:
+        self.ids: List[str] = []
+        self.cities: List[str] = []
+        self.countries: List[str] = []
+
+    def append(self, rid: Any, city: Optional[str], country: Optional[str]) -> None:
+        self.ids.append(str(rid))
+        self.cities.append(sys.intern((city or "").strip()))
+        self.countries.append(sys.intern((country or "").strip()))
+
+    def extend(self, other: "ResultBatch") -> None:
+        self.ids.extend(other.ids)
+        self.cities.extend(other.cities)
+        self.countries.extend(other.countries)
+
+    @classmethod
+    def from_updates(cls, updates: Iterable[Any]) -> "ResultBatch":
+        """Normalize writer input: a ResultBatch passes through; dicts without an id are dropped."""
+        if isinstance(updates, ResultBatch):
+            return updates
+        out = cls()
+        for u in updates:
+            rid = u.get("id")
+            if rid:
+                out.append(rid, u.get("city"), u.get("country"))
+        return out
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return bool(self.ids)
+
+    def __iter__(self) -> Iterator[Tuple[str, str, str]]:
+        return zip(self.ids, self.cities, self.countries)
+
+    def rows(self, **extra: Any) -> Iterator[Dict[str, Any]]:
+        """Dicts built on demand (streaming inserts, logging); `extra` is added to each."""
+        for rid, city, country in self:
+            yield {"id": rid, "city": city, "country": country, **extra}
+
+    def to_ndjson(self) -> io.BytesIO:
+        """Newline-delimited JSON for a load job, encoded without intermediate dicts."""
+        dumps = json.dumps
+        body = "".join(
+            f'{{"id":{dumps(rid)},"city":{dumps(city)},"country":{dumps(country)}}}\n'
+            for rid, city, country in self
+        )
+        return io.BytesIO(body.encode("utf-8"))
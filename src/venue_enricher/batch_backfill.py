@@ -0,0 +1,393 @@
+# file: src/venue_enricher/batch_backfill.py
+from __future__ import annotations
+import itertools
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .prompts import JSON_SCHEMA, SYSTEM_PROMPT, build_user_prompt, validate_item
+
+ENDPOINT = "/v1/chat/completions"
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+ACTIVE = ("validating", "in_progress", "finalizing", "cancelling")
+LOOKUP_PAGE = 1000  # ids checked against the ledger per query
+
+
+def build_request(row: Dict[str, Any], model: str, max_tokens: int) -> Dict[str, Any]:
+    """One Batch API request line; custom_id carries the BigQuery row id."""
+    return {
+        "custom_id": str(row["id"]),
+        "method": "POST",
+        "url": ENDPOINT,
+        "body": {
+            "model": model,
+            "temperature": 0,
+            "max_tokens": max_tokens,
+            "response_format": {"type": "json_schema", "json_schema": JSON_SCHEMA},
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": build_user_prompt(row)},
+            ],
+        },
+    }
+
+
+def parse_output_lines(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Yield {id, city, country} for every successful, schema-valid result line."""
+    for line in lines:
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+            body = (rec.get("response") or {}).get("body") or {}
+            content = body["choices"][0]["message"]["content"]
+            clean = validate_item(json.loads(content or "{}"))
+        except (ValueError, KeyError, IndexError, TypeError, AttributeError):
+            continue
+        if clean is None:
+            continue
+        yield {"id": rec["custom_id"], "city": clean["city"], "country": clean["country"]}
+
+
+class BackfillState:
+    """
+    SQLite ledger of uploaded files, batch jobs and the row ids they cover.
+    Why: a restart resumes polling/applying instead of resubmitting rows.
+    """
+
+    def __init__(self, path: str = "/tmp/backfill_state.sqlite") -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    input_file_id TEXT PRIMARY KEY,
+                    batch_id TEXT,
+                    status TEXT NOT NULL,
+                    output_file_id TEXT,
+                    n_rows INTEGER NOT NULL,
+                    affected INTEGER,
+                    created_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS submitted (
+                    id TEXT PRIMARY KEY,
+                    input_file_id TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS submitted_file ON submitted(input_file_id);
+                CREATE TABLE IF NOT EXISTS cursors (
+                    scope TEXT PRIMARY KEY,
+                    after_id TEXT
+                );
+            """)
+
+    def record_file(self, input_file_id: str, ids: List[str]) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs(input_file_id,status,n_rows,created_at) VALUES (?,?,?,?)",
+                (input_file_id, "uploaded", len(ids), time.time()),
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO submitted(id,input_file_id) VALUES (?,?)",
+                [(i, input_file_id) for i in ids],
+            )
+
+    def set_batch(self, input_file_id: str, batch_id: str, status: str) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET batch_id=?, status=? WHERE input_file_id=?",
+                (batch_id, status, input_file_id),
+            )
+
+    def set_status(self, batch_id: str, status: str, output_file_id: Optional[str]) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status=?, output_file_id=? WHERE batch_id=?",
+                (status, output_file_id, batch_id),
+            )
+            if status in TERMINAL - {"completed"} and not output_file_id:
+                # Why: rows of dead jobs become eligible for a later submission; jobs
+                # with partial output are released row by row when applied.
+                self.conn.execute(
+                    "DELETE FROM submitted WHERE input_file_id="
+                    "(SELECT input_file_id FROM jobs WHERE batch_id=?)",
+                    (batch_id,),
+                )
+
+    def set_applied(self, batch_id: str, affected: int) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status='applied', affected=? WHERE batch_id=?",
+                (affected, batch_id),
+            )
+
+    def jobs(self, *statuses: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT input_file_id,batch_id,status,output_file_id,n_rows,affected "
+                f"FROM jobs WHERE status IN ({','.join('?' * len(statuses))})",
+                statuses,
+            )
+            cols = [c[0] for c in cur.description]
+            return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def is_submitted(self, rid: str) -> bool:
+        return bool(self.submitted_among([rid]))
+
+    def submitted_among(self, ids: List[str]) -> Set[str]:
+        """The ids already covered by a live batch, looked up LOOKUP_PAGE at a time."""
+        out: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(ids), LOOKUP_PAGE):
+                page = ids[i : i + LOOKUP_PAGE]
+                cur = self.conn.execute(
+                    f"SELECT id FROM submitted WHERE id IN ({','.join('?' * len(page))})", page
+                )
+                out.update(r[0] for r in cur.fetchall())
+        return out
+
+    def release_unanswered(self, input_file_id: str, answered: Set[str]) -> int:
+        """
+        Drop the submitted marks of a file's rows that got no usable answer.
+        Why: per-row errors, partial answers and rows cut off by expiry stay
+        pending in BigQuery and must be eligible for a later submission.
+        """
+        with self._lock, self.conn:
+            cur = self.conn.execute("SELECT id FROM submitted WHERE input_file_id=?", (input_file_id,))
+            dropped = [(r[0],) for r in cur.fetchall() if r[0] not in answered]
+            self.conn.executemany("DELETE FROM submitted WHERE id=?", dropped)
+        return len(dropped)
+
+    def cursor(self, scope: str) -> Optional[str]:
+        with self._lock:
+            row = self.conn.execute("SELECT after_id FROM cursors WHERE scope=?", (scope,)).fetchone()
+            return row[0] if row else None
+
+    def set_cursor(self, scope: str, after_id: Optional[str]) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cursors(scope, after_id) VALUES (?,?)", (scope, after_id)
+            )
+
+    def summary(self) -> Dict[str, int]:
+        with self._lock:
+            cur = self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+            return {status: n for status, n in cur.fetchall()}
+
+
+class Backfill:
+    """
+    Stream pending rows into Batch API input files, submit, poll and merge results.
+    `client` is an OpenAI client (or tests/fakes.py FakeBatchClient); `bq` a BigQueryIO.
+    """
+
+    def __init__(
+        self,
+        bq: Any,
+        client: Any,
+        state: BackfillState,
+        model: str,
+        max_tokens: int = 160,
+        rows_per_file: int = 5000,
+        max_open_jobs: int = 10,
+        write_chunk: int = 5000,
+    ) -> None:
+        self.bq = bq
+        self.client = client
+        self.state = state
+        self.model = model
+        self.max_tokens = max_tokens
+        self.rows_per_file = rows_per_file
+        self.max_open_jobs = max_open_jobs
+        self.write_chunk = write_chunk
+
+    def _open_jobs(self) -> List[Dict[str, Any]]:
+        return self.state.jobs("uploaded", *ACTIVE, "completed")
+
+    def _upload(self, path: str, ids: List[str]) -> None:
+        """Upload one input file and start its batch; the temp file is removed either way."""
+        try:
+            with open(path, "rb") as fh:
+                uploaded = self.client.files.create(file=fh, purpose="batch")
+        finally:
+            os.unlink(path)
+        self.state.record_file(uploaded.id, ids)
+        self._create_batch(uploaded.id)
+
+    def _create_batch(self, input_file_id: str) -> None:
+        batch = self.client.batches.create(
+            input_file_id=input_file_id, endpoint=ENDPOINT, completion_window="24h"
+        )
+        self.state.set_batch(input_file_id, batch.id, batch.status)
+
+    def submit(self, limit: Optional[int] = None, overwrite: bool = False) -> int:
+        """
+        Write and submit new input files until the open-job cap; returns rows submitted.
+        Why: the scan resumes from a keyset cursor kept in the ledger, so a tick reads
+        only rows past the previous one instead of re-streaming the pending set.
+        An exhausted scan wraps once to pick up rows released by failed jobs.
+        """
+        # Resume: files uploaded before a crash but never turned into a batch.
+        for job in self.state.jobs("uploaded"):
+            if not job["batch_id"]:
+                self._create_batch(job["input_file_id"])
+
+        room = self.max_open_jobs - len(self._open_jobs())
+        if room <= 0:
+            return 0
+        scope = "overwrite" if overwrite else "pending"
+        start = self.state.cursor(scope)
+        submitted, room, cursor = self._submit_from(start, limit, overwrite, room)
+        if cursor is None and start is not None and room > 0:
+            more, room, cursor = self._submit_from(None, limit, overwrite, room)
+            submitted += more
+        self.state.set_cursor(scope, cursor)
+        return submitted
+
+    def _submit_from(
+        self, after_id: Optional[str], limit: Optional[int], overwrite: bool, room: int
+    ) -> Tuple[int, int, Optional[str]]:
+        """
+        Pack rows after `after_id` that no live batch covers into input files.
+        Returns (rows submitted, room left, resume cursor); the cursor is None once
+        the scan is exhausted.
+        """
+        rows = iter(self.bq.iter_rows(limit=limit, overwrite=overwrite, after_id=after_id))
+        submitted = seen = 0
+        last = after_id
+        exhausted = False
+        ids: List[str] = []
+        fh = None
+        path = ""
+        try:
+            while room > 0:
+                page = list(itertools.islice(rows, LOOKUP_PAGE))
+                if not page:
+                    exhausted = True
+                    break
+                seen += len(page)
+                page_ids = [str(row.get("id") or "") for row in page]
+                taken = self.state.submitted_among([rid for rid in page_ids if rid])
+                for row, rid in zip(page, page_ids):
+                    last = rid or last
+                    if not rid or rid in taken:
+                        continue
+                    if fh is None:
+                        fd, path = tempfile.mkstemp(prefix="backfill_", suffix=".jsonl")
+                        fh = os.fdopen(fd, "w", encoding="utf-8")
+                    fh.write(json.dumps(build_request(row, self.model, self.max_tokens)) + "\n")
+                    ids.append(rid)
+                    if len(ids) >= self.rows_per_file:
+                        fh.close()
+                        fh = None
+                        self._upload(path, ids)
+                        submitted += len(ids)
+                        ids = []
+                        room -= 1
+                        if room <= 0:
+                            break
+            if fh is not None:
+                fh.close()
+                fh = None
+                self._upload(path, ids)
+                submitted += len(ids)
+                room -= 1
+        finally:
+            if fh is not None:
+                fh.close()
+                os.unlink(path)
+        # Why: a scan cut short by `limit` has more rows behind it; only a real end wraps.
+        if exhausted and not (limit and seen >= limit):
+            return submitted, room, None
+        return submitted, room, last
+
+    def poll(self) -> None:
+        # Why: cancelling batches still settle (cancelled, possibly with partial output).
+        for job in self.state.jobs(*ACTIVE):
+            batch = self.client.batches.retrieve(job["batch_id"])
+            self.state.set_status(batch.id, batch.status, getattr(batch, "output_file_id", None))
+
+    def apply(self, overwrite: bool = False) -> int:
+        """
+        Merge every finished, not yet applied job; returns affected rows.
+        Expired and cancelled jobs are merged too when they left partial output.
+        Rows without a valid answer, or with only a city or only a country (they
+        stay pending), are released for a later submission.
+        """
+        total = 0
+        for job in self.state.jobs("completed", "expired", "cancelled"):
+            if job["status"] != "completed" and not job["output_file_id"]:
+                continue
+            affected = 0
+            answered: Set[str] = set()
+            if job["output_file_id"]:
+                text = self.client.files.content(job["output_file_id"]).text
+                chunk: List[Dict[str, Any]] = []
+                for upd in parse_output_lines(text.splitlines()):
+                    if upd["city"] and upd["country"]:
+                        answered.add(upd["id"])
+                    chunk.append(upd)
+                    if len(chunk) >= self.write_chunk:
+                        affected += self.bq.update_locations(chunk, overwrite=overwrite)
+                        chunk = []
+                if chunk:
+                    affected += self.bq.update_locations(chunk, overwrite=overwrite)
+            self.state.release_unanswered(job["input_file_id"], answered)
+            self.state.set_applied(job["batch_id"], affected)
+            total += affected
+        return total
+
+    def step(self, limit: Optional[int] = None, overwrite: bool = False) -> Dict[str, Any]:
+        """One scheduler tick: poll, apply finished jobs, top up submissions."""
+        self.poll()
+        affected = self.apply(overwrite=overwrite)
+        submitted = self.submit(limit=limit, overwrite=overwrite)
+        return {"updated": affected, "submitted": submitted, "jobs": self.state.summary()}
+
+
+def main() -> None:  # pragma: no cover - operator entry point
+    import argparse
+
+    from openai import OpenAI
+
+    from .bq_io import BigQueryIO
+
+    ap = argparse.ArgumentParser(description="OpenAI Batch API backfill")
+    ap.add_argument("--limit", type=int, default=None)
+    ap.add_argument("--overwrite", action="store_true")
+    ap.add_argument("--state", default=os.getenv("BACKFILL_STATE", "/tmp/backfill_state.sqlite"))
+    ap.add_argument("--rows-per-file", type=int, default=5000)
+    ap.add_argument("--poll-seconds", type=float, default=60.0)
+    args = ap.parse_args()
+
+    bq = BigQueryIO(
+        os.environ.get("PROJECT_ID", ""),
+        os.environ.get("DATASET_ID", ""),
+        os.environ.get("TABLE_ID", ""),
+        location=os.environ.get("BQ_LOCATION"),
+    )
+    backfill = Backfill(
+        bq,
+        OpenAI(api_key=os.environ["OPENAI_API_KEY"]),
+        BackfillState(args.state),
+        model=os.environ.get("OPENAI_MODEL", "gpt-4o-mini"),
+        max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "160")),
+        rows_per_file=args.rows_per_file,
+    )
+    while True:
+        out = backfill.step(limit=args.limit, overwrite=args.overwrite)
+        print({"event": "backfill_step", **out})
+        open_jobs = sum(
+            n for status, n in out["jobs"].items() if status not in TERMINAL | {"applied"}
+        )
+        if not out["submitted"] and not open_jobs:
+            break
+        time.sleep(args.poll_seconds)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -1,9 +1,142 @@
 # path: src/venue_enricher/bq_io.py
 from __future__ import annotations
 
+import importlib
+import threading
+import time
 import uuid
-from typing import Iterable, Dict, Any, List, Optional
-from google.cloud import bigquery
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import TYPE_CHECKING, Iterable, Iterator, Dict, Any, List, NamedTuple, Optional, Set, Tuple
+
+from . import metrics
+from .batch import PageSize, ResultBatch, VenueBatch, page_limit
+
+if TYPE_CHECKING:
+    from google.cloud import bigquery
+
+
+class _LazyModule:
+    """
+    Imports `name` on first attribute access.
+    Why: google-cloud-bigquery takes ~0.5s to import; deferring it keeps that
+    off process start (and so off /health and Cloud Run scale-from-zero).
+    """
+
+    def __init__(self, name: str) -> None:
+        self._name = name
+        self._module: Optional[ModuleType] = None
+
+    def __getattr__(self, attr: str) -> Any:
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+# Runtime handle; the TYPE_CHECKING import above only serves annotations.
+_bigquery: Any = _LazyModule("google.cloud.bigquery")
+
+PENDING_FILTER = "enrichment_status = 'OK' AND (city IS NULL OR country IS NULL)"
+
+# Batches up to this size use UPDATE ... FROM UNNEST(@rows) (one job);
+# larger ones use temp table + load + MERGE to stay under query-parameter limits.
+UNNEST_MAX_ROWS = 500
+HTTP_POOL_SIZE = 32
+
+
+class PendingRow(NamedTuple):
+    """Compact pending row; `.get` keeps it a drop-in for the row dicts."""
+
+    id: str
+    name: Optional[str]
+    address: Optional[str]
+    alt_name: Optional[str]
+    website_url: Optional[str]
+    domain: Optional[str]
+    linkedin_url: Optional[str]
+    phone: Optional[str]
+    city: Optional[str]
+    country: Optional[str]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key) if key in self._fields else default
+
+
+# Single source of truth for what the enricher reads (prompt fields + key).
+FETCH_COLUMNS = PendingRow._fields
+_SELECT = ", ".join(FETCH_COLUMNS)
+
+STAGING_RETENTION_DAYS = 7
+STAGING_OVERLAP_SECONDS = 600
+
+
+def _clean_updates(updates: Iterable[Any]) -> ResultBatch:
+    """Writer input as a ResultBatch; dict lists (backfill, io_bigquery) are converted once."""
+    return ResultBatch.from_updates(updates)
+
+
+def _affected_rows(job: Any) -> int:
+    affected = getattr(job, "num_dml_affected_rows", None)
+    if affected is None:
+        # Older client fallback
+        stats = getattr(job, "dml_statistics", None)
+        affected = int(getattr(stats, "modified_row_count", 0)) if stats else 0
+    return int(affected or 0)
+
+
+def _sql_str(value: str) -> str:
+    return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+_SESSION: Any = None
+_CLIENTS: Dict[str, "bigquery.Client"] = {}
+_IOS: Dict[Tuple[str, str, str, Optional[str]], "BigQueryIO"] = {}
+_POOL_LOCK = threading.Lock()
+
+
+def _http_session() -> Any:
+    """One authorized, connection-pooled HTTP session for every client."""
+    global _SESSION
+    if _SESSION is None:
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from requests.adapters import HTTPAdapter
+
+        creds, _ = google.auth.default(
+            scopes=["https://www.googleapis.com/auth/cloud-platform"]
+        )
+        session = AuthorizedSession(creds)
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        _SESSION = session
+    return _SESSION
+
+
+def get_client(project_id: str) -> "bigquery.Client":
+    """
+    Process-wide client per project, built on first use.
+    Why: client construction + auth discovery is a visible share of small-batch latency.
+    """
+    with _POOL_LOCK:
+        client = _CLIENTS.get(project_id)
+        if client is None:
+            client = _bigquery.Client(project=project_id, _http=_http_session())
+            _CLIENTS[project_id] = client
+        return client
+
+
+def get_io(
+    project_id: str, dataset_id: str, table_id: str, location: Optional[str] = None
+) -> "BigQueryIO":
+    """Shared BigQueryIO per table (see io_bigquery for the functional API)."""
+    key = (project_id, dataset_id, table_id, location)
+    with _POOL_LOCK:
+        io = _IOS.get(key)
+        if io is None:
+            io = BigQueryIO(project_id, dataset_id, table_id, location=location)
+            _IOS[key] = io
+        return io
 
 
 class BigQueryIO:
@@ -15,90 +148,335 @@ class BigQueryIO:
         dataset_id: str,
         table_id: str,
         location: Optional[str] = None,
+        client: Optional["bigquery.Client"] = None,
+        change_column: Optional[str] = None,
+        touch_column: Optional[str] = None,
     ) -> None:
         self.project_id = project_id
         self.dataset_id = dataset_id
         self.table_id = table_id
-        self.client = bigquery.Client(project=project_id)
+        self._client = client
         self.location = location
+        # TIMESTAMP column bumped when a row is inserted/changed (e.g. last_updated);
+        # enables `changed_since` on reads and counts.
+        self.change_column = change_column
+        # TIMESTAMP column every write sets to CURRENT_TIMESTAMP(); None = leave untouched.
+        # Why: DML naming a missing column fails the whole job, so it is opt-in.
+        self.touch_column = touch_column
+        self._staging_ready = False
+        self._changelog_mark: Optional[datetime] = None
+        self._timings: List[Tuple[str, float]] = []
+        self._timings_lock = threading.Lock()
+
+    @property
+    def client(self) -> "bigquery.Client":
+        if self._client is None:
+            self._client = get_client(self.project_id)
+        return self._client
+
+    @contextmanager
+    def _timed(self, op: str) -> Iterator[None]:
+        t0 = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - t0
+            metrics.BQ_SECONDS.observe(elapsed, op=op)
+            with self._timings_lock:
+                self._timings.append((op, elapsed))
+
+    def pop_timings(self) -> Dict[str, Dict[str, float]]:
+        """Drain recorded job timings as {op: {count, seconds}}."""
+        with self._timings_lock:
+            timings, self._timings = self._timings, []
+        out: Dict[str, Dict[str, float]] = {}
+        for op, secs in timings:
+            agg = out.setdefault(op, {"count": 0, "seconds": 0.0})
+            agg["count"] += 1
+            agg["seconds"] = round(agg["seconds"] + secs, 3)
+        return out
 
     @property
     def fq_table(self) -> str:
         return f"`{self.project_id}.{self.dataset_id}.{self.table_id}`"
 
-    def fetch_rows(self, limit: int, overwrite: bool = False) -> List[Dict[str, Any]]:
+    def _pending_where(
+        self,
+        overwrite: bool,
+        after_id: Optional[str] = None,
+        shard: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> Tuple[str, List[Any]]:
+        """
+        WHERE clause + params for the work slice.
+        Why: a keyset cursor on id and FARM_FINGERPRINT shards give disjoint
+        slices, so batches/workers never claim the same rows. `changed_since`
+        limits the slice to rows whose change_column moved after it.
+        """
+        clauses = ["TRUE" if overwrite else f"({PENDING_FILTER})"]
+        params: List[Any] = []
+        if after_id:
+            clauses.append("id > @after_id")
+            params.append(_bigquery.ScalarQueryParameter("after_id", "STRING", after_id))
+        if num_shards and num_shards > 1:
+            clauses.append("MOD(ABS(FARM_FINGERPRINT(id)), @num_shards) = @shard")
+            params += [
+                _bigquery.ScalarQueryParameter("num_shards", "INT64", num_shards),
+                _bigquery.ScalarQueryParameter("shard", "INT64", shard or 0),
+            ]
+        if changed_since is not None and self.change_column:
+            clauses.append(f"{self.change_column} > @changed_since")
+            params.append(_bigquery.ScalarQueryParameter("changed_since", "TIMESTAMP", changed_since))
+        return " AND ".join(clauses), params
+
+    def fetch_rows(
+        self,
+        limit: int,
+        overwrite: bool = False,
+        after_id: Optional[str] = None,
+        shard: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
         """
-        Returns rows to enrich: id, name, address, city, country.
+        Returns rows to enrich (FETCH_COLUMNS), ordered by id.
         Why: Ensure we only fetch rows that still need enrichment unless overwrite is set.
+        Pass the last returned id as `after_id` to get the next disjoint page.
         """
-        where = (
-            "TRUE"
-            if overwrite
-            else "(enrichment_status = 'OK' AND (city IS NULL OR country IS NULL))"
-        )
+        where, params = self._pending_where(overwrite, after_id, shard, num_shards, changed_since)
         sql = f"""
-        SELECT id, name, address, city, country
+        SELECT {_SELECT}
         FROM {self.fq_table}
         WHERE {where}
-        ORDER BY RAND()
+        ORDER BY id
         LIMIT @limit
         """
-        job = self.client.query(
-            sql,
-            job_config=bigquery.QueryJobConfig(
-                query_parameters=[bigquery.ScalarQueryParameter("limit", "INT64", limit)],
-                use_query_cache=False,
-            ),
-            location=self.location,
-        )
-        rows = [dict(r) for r in job.result()]
+        with self._timed("fetch"):
+            job = self.client.query(
+                sql,
+                job_config=_bigquery.QueryJobConfig(
+                    query_parameters=[_bigquery.ScalarQueryParameter("limit", "INT64", limit), *params],
+                    use_query_cache=False,
+                ),
+                location=self.location,
+            )
+            rows = [dict(r) for r in job.result()]
         return rows
 
-    def update_locations(self, updates: Iterable[Dict[str, Any]], overwrite: bool) -> int:
+    def iter_rows(
+        self,
+        limit: Optional[int] = None,
+        overwrite: bool = False,
+        page_size: int = 1000,
+        after_id: Optional[str] = None,
+        shard: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> Iterator[Dict[str, Any]]:
         """
-        Writes {id, city, country} via temp table + MERGE.
-        Returns the number of truly modified rows (BigQuery DML affected rows).
-        Why: We want the API to report real table mutations so 'pending' visibly drops.
+        Streams rows to enrich in id order from one query, page by page.
+        Why: one scan per run instead of one per batch; BigQuery has no row
+        index, so the keyset cursor bounds a single streamed query rather than
+        issuing a query per page.
         """
-        rows: List[Dict[str, Any]] = []
-        for u in updates:
-            rid = u.get("id")
-            if not rid:
-                continue
-            city = (u.get("city") or "").strip()
-            country = (u.get("country") or "").strip()
-            rows.append({"id": str(rid), "city": city, "country": country})
+        for r in self._open_rows(limit, overwrite, page_size, after_id, shard, num_shards, changed_since):
+            yield dict(r)
 
-        if not rows:
-            return 0
+    def _open_rows(
+        self,
+        limit: Optional[int],
+        overwrite: bool,
+        page_size: int,
+        after_id: Optional[str],
+        shard: Optional[int],
+        num_shards: Optional[int],
+        changed_since: Optional[datetime],
+    ) -> Iterable[Any]:
+        """The streamed query behind iter_rows / iter_pages; yields BigQuery Rows in FETCH_COLUMNS order."""
+        where, params = self._pending_where(overwrite, after_id, shard, num_shards, changed_since)
+        sql = f"""
+        SELECT {_SELECT}
+        FROM {self.fq_table}
+        WHERE {where}
+        ORDER BY id
+        {"LIMIT @limit" if limit else ""}
+        """
+        if limit:
+            params.append(_bigquery.ScalarQueryParameter("limit", "INT64", limit))
+        with self._timed("fetch_open"):
+            job = self.client.query(
+                sql,
+                job_config=_bigquery.QueryJobConfig(query_parameters=params, use_query_cache=False),
+                location=self.location,
+            )
+            return job.result(page_size=page_size)
 
-        tmp_name = f"_tmp_enrich_{uuid.uuid4().hex[:8]}"
-        tmp_fq = f"`{self.project_id}.{self.dataset_id}.{tmp_name}`"
+    def iter_pages(
+        self,
+        limit: Optional[int] = None,
+        overwrite: bool = False,
+        page_size: PageSize = 200,
+        after_id: Optional[str] = None,
+        shard: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        changed_since: Optional[datetime] = None,
+    ) -> Iterator[VenueBatch]:
+        """
+        Pending rows in VenueBatches of `page_size` from a single streamed query.
+        The last id of each page is the resume cursor for the next run.
+        Why: query rows are appended column-wise, never copied into dicts.
+        A callable `page_size` is re-read per page, so a tuner can resize pages mid-run.
+        """
+        page, size = VenueBatch(FETCH_COLUMNS), page_limit(page_size)
+        rows = self._open_rows(limit, overwrite, size, after_id, shard, num_shards, changed_since)
+        for row in rows:
+            page.append_values(row.values())
+            if len(page) >= size:
+                yield page
+                page, size = VenueBatch(FETCH_COLUMNS), page_limit(page_size)
+        if page:
+            yield page
 
-        # 1) Create temp table
-        schema = [
-            bigquery.SchemaField("id", "STRING", mode="REQUIRED"),
-            bigquery.SchemaField("city", "STRING"),
-            bigquery.SchemaField("country", "STRING"),
-        ]
-        self.client.create_table(
-            bigquery.Table(f"{self.project_id}.{self.dataset_id}.{tmp_name}", schema=schema),
-            exists_ok=True,
+    def stream_pending(
+        self,
+        limit: Optional[int] = None,
+        overwrite: bool = False,
+        after_id: Optional[str] = None,
+        read_client: Any = None,
+        max_streams: int = 1,
+        changed_since: Optional[datetime] = None,
+    ) -> Iterator[PendingRow]:
+        """
+        Pending rows via the BigQuery Storage Read API (Arrow record batches).
+        Why: column projection and the row filter are pushed down to storage and
+        rows are decoded one record batch at a time, so memory stays flat
+        regardless of `limit`. No ordering: use iter_rows for cursor/shard runs.
+        `read_client` defaults to a BigQueryReadClient (tests/fakes.py FakeReadClient in tests).
+        """
+        if read_client is None:
+            try:
+                from google.cloud import bigquery_storage  # optional: Storage Read API
+            except ImportError as exc:  # pragma: no cover
+                raise RuntimeError("google-cloud-bigquery-storage is not installed") from exc
+            read_client = bigquery_storage.BigQueryReadClient()
+        restriction = "" if overwrite else PENDING_FILTER
+        if after_id:
+            cond = f"id > {_sql_str(after_id)}"
+            restriction = f"({restriction}) AND {cond}" if restriction else cond
+        if changed_since is not None and self.change_column:
+            cond = f"{self.change_column} > TIMESTAMP {_sql_str(changed_since.isoformat())}"
+            restriction = f"({restriction}) AND {cond}" if restriction else cond
+        columns = list(PendingRow._fields)
+        session = read_client.create_read_session(
+            parent=f"projects/{self.project_id}",
+            read_session={
+                "table": f"projects/{self.project_id}/datasets/{self.dataset_id}/tables/{self.table_id}",
+                "data_format": "ARROW",
+                "read_options": {"selected_fields": columns, "row_restriction": restriction},
+            },
+            max_stream_count=max(1, max_streams),
         )
+        remaining = limit
+        for stream in session.streams:
+            for page in read_client.read_rows(stream.name).rows(session).pages:
+                data = page.to_arrow().to_pydict()
+                for values in zip(*(data[c] for c in columns)):
+                    yield PendingRow(*values)
+                    if remaining is not None:
+                        remaining -= 1
+                        if remaining <= 0:
+                            return
 
-        # 2) Load rows
-        load_job = self.client.load_table_from_json(
-            rows,
-            destination=f"{self.project_id}.{self.dataset_id}.{tmp_name}",
-            job_config=bigquery.LoadJobConfig(write_disposition="WRITE_TRUNCATE"),
-            location=self.location,
-        )
-        load_job.result()
+    def stream_pages(
+        self,
+        limit: Optional[int] = None,
+        overwrite: bool = False,
+        page_size: PageSize = 200,
+        after_id: Optional[str] = None,
+        read_client: Any = None,
+        changed_since: Optional[datetime] = None,
+    ) -> Iterator[VenueBatch]:
+        """stream_pending in VenueBatches of `page_size` (int or callable, as in iter_pages)."""
+        page, size = VenueBatch(FETCH_COLUMNS), page_limit(page_size)
+        for row in self.stream_pending(
+            limit=limit,
+            overwrite=overwrite,
+            after_id=after_id,
+            read_client=read_client,
+            changed_since=changed_since,
+        ):
+            page.append_values(row)
+            if len(page) >= size:
+                yield page
+                page, size = VenueBatch(FETCH_COLUMNS), page_limit(page_size)
+        if page:
+            yield page
+
+    def update_locations(
+        self,
+        updates: Iterable[Any],
+        overwrite: bool,
+        strategy: str = "auto",
+    ) -> int:
+        """
+        Writes {id, city, country} (a ResultBatch or row dicts); returns the number
+        of truly modified rows (BigQuery DML affected rows).
+        Why: We want the API to report real table mutations so 'pending' visibly drops.
+        strategy: "unnest" (one UPDATE job), "merge" (temp table + load + MERGE),
+        or "auto" (unnest up to UNNEST_MAX_ROWS rows).
+        """
+        rows = _clean_updates(updates)
+        if not rows:
+            return 0
+        if strategy == "auto":
+            strategy = "unnest" if len(rows) <= UNNEST_MAX_ROWS else "merge"
+        if strategy == "unnest":
+            return self._update_unnest(rows, overwrite)
+        return self._merge_via_temp(rows, overwrite)
 
-        # 3) MERGE
+    def assign_locations(self, updates: Iterable[Dict[str, Any]]) -> int:
+        """
+        Sets city/country exactly as given (NULLs and blanks included) and stamps
+        last_updated, in one UNNEST UPDATE; returns affected rows.
+        Why: the unguarded semantics io_bigquery.update_locations has always had;
+        the service writes through update_locations' guards instead.
+        """
+        values = [
+            _bigquery.StructQueryParameter(
+                None,
+                _bigquery.ScalarQueryParameter("id", "STRING", str(u["id"])),
+                _bigquery.ScalarQueryParameter("city", "STRING", u.get("city")),
+                _bigquery.ScalarQueryParameter("country", "STRING", u.get("country")),
+            )
+            for u in updates
+        ]
+        if not values:
+            return 0
+        sql = f"""
+        UPDATE {self.fq_table} T
+        SET
+          T.city = R.city,
+          T.country = R.country,
+          T.last_updated = CURRENT_TIMESTAMP()
+        FROM UNNEST(@rows) AS R
+        WHERE T.id = R.id
+        """
+        param = _bigquery.ArrayQueryParameter("rows", "STRUCT", values)
+        with self._timed("assign"):
+            job = self.client.query(
+                sql,
+                job_config=_bigquery.QueryJobConfig(query_parameters=[param], use_query_cache=False),
+                location=self.location,
+            )
+            job.result()
+        return _affected_rows(job)
+
+    @staticmethod
+    def _matched_condition(overwrite: bool) -> str:
         # Only update when new non-empty values differ from current values,
         # unless overwrite=True then we allow updates even if target not NULL (still ignore empty strings).
-        when_matched_condition = (
+        return (
             "TRUE"
             if overwrite
             else """
@@ -109,44 +487,276 @@ class BigQueryIO:
             """
         )
 
-        merge_sql = f"""
-        MERGE {self.fq_table} T
-        USING {tmp_fq} S
-        ON T.id = S.id
-        WHEN MATCHED AND {when_matched_condition}
-        THEN UPDATE SET
+    def _touch_sql(self) -> str:
+        return f", {self.touch_column} = CURRENT_TIMESTAMP()" if self.touch_column else ""
+
+    def _merge_sql(self, source: str, overwrite: bool) -> str:
+        return f"""
+            MERGE {self.fq_table} T
+            USING {source} S
+            ON T.id = S.id
+            WHEN MATCHED AND {self._matched_condition(overwrite)}
+            THEN UPDATE SET
+              city    = IFNULL(NULLIF(S.city, ''), T.city),
+              country = IFNULL(NULLIF(S.country, ''), T.country){self._touch_sql()}
+            """
+
+    def merge_parquet(self, uri: str, overwrite: bool = False) -> int:
+        """
+        Applies a Parquet file of {id, city, country} at `uri` (gs://...) in one
+        scripted query job: LOAD DATA into a temp table, then the usual MERGE.
+        Why: an offline run over a whole export lands as a single job, not one per flush.
+        """
+        if not uri.startswith("gs://") or "'" in uri:
+            raise ValueError(f"expected a gs:// URI, got {uri!r}")
+        script = f"""
+            LOAD DATA INTO TEMP TABLE _enrich_results (id STRING, city STRING, country STRING)
+            FROM FILES (format = 'PARQUET', uris = ['{uri}']);
+            {self._merge_sql("_enrich_results", overwrite)};
+            SELECT @@row_count AS affected;
+        """
+        with self._timed("merge_parquet"):
+            job = self.client.query(
+                script,
+                job_config=_bigquery.QueryJobConfig(use_query_cache=False),
+                location=self.location,
+            )
+            rows = list(job.result())
+        return int(rows[0]["affected"] or 0) if rows else 0
+
+    def _update_unnest(self, rows: ResultBatch, overwrite: bool) -> int:
+        """Single DML job with an array-of-struct param; same semantics as the MERGE."""
+        sql = f"""
+        UPDATE {self.fq_table} T
+        SET
           city    = IFNULL(NULLIF(S.city, ''), T.city),
-          country = IFNULL(NULLIF(S.country, ''), T.country)
+          country = IFNULL(NULLIF(S.country, ''), T.country){self._touch_sql()}
+        FROM UNNEST(@rows) AS S
+        WHERE T.id = S.id AND {self._matched_condition(overwrite)}
         """
-        qjob = self.client.query(
-            merge_sql,
-            job_config=bigquery.QueryJobConfig(use_query_cache=False),
-            location=self.location,
+        param = _bigquery.ArrayQueryParameter(
+            "rows",
+            "STRUCT",
+            [
+                _bigquery.StructQueryParameter(
+                    None,
+                    _bigquery.ScalarQueryParameter("id", "STRING", rid),
+                    _bigquery.ScalarQueryParameter("city", "STRING", city),
+                    _bigquery.ScalarQueryParameter("country", "STRING", country),
+                )
+                for rid, city, country in rows
+            ],
         )
-        qres = qjob.result()  # noqa: F841
+        with self._timed("update_unnest"):
+            job = self.client.query(
+                sql,
+                job_config=_bigquery.QueryJobConfig(query_parameters=[param], use_query_cache=False),
+                location=self.location,
+            )
+            job.result()
+        return _affected_rows(job)
+
+    def _merge_via_temp(self, rows: ResultBatch, overwrite: bool) -> int:
+        tmp_name = f"_tmp_enrich_{uuid.uuid4().hex[:8]}"
+        tmp_fq = f"`{self.project_id}.{self.dataset_id}.{tmp_name}`"
+
+        # 1) Create temp table
+        schema = [
+            _bigquery.SchemaField("id", "STRING", mode="REQUIRED"),
+            _bigquery.SchemaField("city", "STRING"),
+            _bigquery.SchemaField("country", "STRING"),
+        ]
+        with self._timed("create_temp"):
+            self.client.create_table(
+                _bigquery.Table(f"{self.project_id}.{self.dataset_id}.{tmp_name}", schema=schema),
+                exists_ok=True,
+            )
+
+        try:
+            # 2) Load rows (NDJSON encoded straight from the batch columns)
+            with self._timed("load"):
+                load_job = self.client.load_table_from_file(
+                    rows.to_ndjson(),
+                    destination=f"{self.project_id}.{self.dataset_id}.{tmp_name}",
+                    job_config=_bigquery.LoadJobConfig(
+                        source_format=_bigquery.SourceFormat.NEWLINE_DELIMITED_JSON,
+                        schema=schema,
+                        write_disposition="WRITE_TRUNCATE",
+                    ),
+                    location=self.location,
+                )
+                load_job.result()
 
-        affected = getattr(qjob, "num_dml_affected_rows", None)
-        if affected is None:
-            # Older client fallback
-            stats = getattr(qjob, "dml_statistics", None)
-            affected = int(getattr(stats, "modified_row_count", 0)) if stats else 0
+            # 3) MERGE
+            merge_sql = self._merge_sql(tmp_fq, overwrite)
+            with self._timed("merge"):
+                qjob = self.client.query(
+                    merge_sql,
+                    job_config=_bigquery.QueryJobConfig(use_query_cache=False),
+                    location=self.location,
+                )
+                qjob.result()
+            return _affected_rows(qjob)
+        finally:
+            # 4) Cleanup
+            with self._timed("delete_temp"):
+                self.client.delete_table(
+                    f"{self.project_id}.{self.dataset_id}.{tmp_name}", not_found_ok=True
+                )
 
-        # 4) Cleanup
-        self.client.delete_table(
-            f"{self.project_id}.{self.dataset_id}.{tmp_name}", not_found_ok=True
+    # --- Streaming write path: append to a changelog, MERGE periodically ---
+
+    @property
+    def changelog_ref(self) -> str:
+        return f"{self.project_id}.{self.dataset_id}.{self.table_id}_enrich_changelog"
+
+    @property
+    def watermark_ref(self) -> str:
+        return f"{self.project_id}.{self.dataset_id}.{self.table_id}_enrich_watermark"
+
+    def ensure_staging(self) -> None:
+        """Create changelog + watermark tables once per process."""
+        if self._staging_ready:
+            return
+        changelog = _bigquery.Table(
+            self.changelog_ref,
+            schema=[
+                _bigquery.SchemaField("id", "STRING", mode="REQUIRED"),
+                _bigquery.SchemaField("city", "STRING"),
+                _bigquery.SchemaField("country", "STRING"),
+                _bigquery.SchemaField("staged_at", "TIMESTAMP", mode="REQUIRED"),
+            ],
+        )
+        # Why: old changelog rows age out on their own; no DML on the streaming buffer.
+        changelog.time_partitioning = _bigquery.TimePartitioning(
+            field="staged_at", expiration_ms=STAGING_RETENTION_DAYS * 86400 * 1000
+        )
+        self.client.create_table(changelog, exists_ok=True)
+        self.client.create_table(
+            _bigquery.Table(
+                self.watermark_ref,
+                schema=[
+                    _bigquery.SchemaField("kind", "STRING", mode="REQUIRED"),
+                    _bigquery.SchemaField("value", "TIMESTAMP", mode="REQUIRED"),
+                    _bigquery.SchemaField("recorded_at", "TIMESTAMP", mode="REQUIRED"),
+                ],
+            ),
+            exists_ok=True,
         )
-        return int(affected or 0)
+        self._staging_ready = True
 
-    def count_pending(self) -> int:
-        """No-cache count of pending rows."""
-        sql = f"""
-        SELECT COUNT(*) AS pending
-        FROM {self.fq_table}
-        WHERE enrichment_status='OK' AND (city IS NULL OR country IS NULL)
+    def append_staged(self, updates: Iterable[Any]) -> int:
         """
+        One streaming insert of {id, city, country} into the changelog.
+        Why: a single append per batch instead of create/load/MERGE/delete jobs.
+        """
+        rows = _clean_updates(updates)
+        if not rows:
+            return 0
+        self.ensure_staging()
+        staged_at = datetime.now(timezone.utc).isoformat()
+        with self._timed("append"):
+            errors = self.client.insert_rows_json(self.changelog_ref, list(rows.rows(staged_at=staged_at)))
+        if errors:
+            raise RuntimeError(f"changelog insert failed: {errors[:3]}")
+        return len(rows)
+
+    def read_watermark(self, kind: str) -> Optional[datetime]:
+        self.ensure_staging()
+        sql = f"SELECT MAX(value) FROM `{self.watermark_ref}` WHERE kind = @kind"
         job = self.client.query(
             sql,
-            job_config=bigquery.QueryJobConfig(use_query_cache=False),
+            job_config=_bigquery.QueryJobConfig(
+                query_parameters=[_bigquery.ScalarQueryParameter("kind", "STRING", kind)],
+                use_query_cache=False,
+            ),
             location=self.location,
         )
-        return int(list(job.result())[0][0])
+        return list(job.result())[0][0]
+
+    def write_watermark(self, kind: str, value: datetime) -> None:
+        self.ensure_staging()
+        errors = self.client.insert_rows_json(
+            self.watermark_ref,
+            [{
+                "kind": kind,
+                "value": value.isoformat(),
+                "recorded_at": datetime.now(timezone.utc).isoformat(),
+            }],
+        )
+        if errors:
+            raise RuntimeError(f"watermark insert failed: {errors[:3]}")
+
+    def apply_staged(self) -> int:
+        """One consolidated MERGE of everything staged since the last watermark; modified rows."""
+        return self.merge_staged()[0]
+
+    def merge_staged(self, watch: Iterable[str] = ()) -> Tuple[int, Set[str]]:
+        """
+        One consolidated MERGE of everything staged since the last watermark.
+        Returns (truly modified rows, the ids among `watch` it modified).
+        The window reaches back STAGING_OVERLAP before the watermark so late-arriving
+        appends from other writers are not skipped. The window has no upper bound and
+        each id takes its newest staged value, so re-applying the overlap never writes
+        an older value over one another writer has already merged.
+        Why: a caller reporting its own writes counts only its ids, not other writers'.
+        """
+        self.ensure_staging()
+        since = self._changelog_mark
+        if since is None:
+            since = self.read_watermark("changelog") or datetime(1970, 1, 1, tzinfo=timezone.utc)
+        # Why: taken before the job, so anything staged while it runs is re-read next time.
+        until = datetime.now(timezone.utc)
+
+        script = f"""
+        CREATE TEMP TABLE _enrich_staged AS
+        SELECT id, city, country
+        FROM `{self.changelog_ref}`
+        WHERE staged_at > TIMESTAMP_SUB(@since, INTERVAL {STAGING_OVERLAP_SECONDS} SECOND)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY id ORDER BY staged_at DESC) = 1;
+        CREATE TEMP TABLE _enrich_watched AS
+        SELECT S.id
+        FROM _enrich_staged S JOIN {self.fq_table} T ON T.id = S.id
+        WHERE S.id IN UNNEST(@watch) AND {self._matched_condition(False)};
+        {self._merge_sql("_enrich_staged", False)};
+        SELECT @@row_count AS affected, ARRAY(SELECT id FROM _enrich_watched) AS watched;
+        """
+        with self._timed("apply_staged"):
+            job = self.client.query(
+                script,
+                job_config=_bigquery.QueryJobConfig(
+                    query_parameters=[
+                        _bigquery.ScalarQueryParameter("since", "TIMESTAMP", since),
+                        _bigquery.ArrayQueryParameter("watch", "STRING", sorted(set(watch))),
+                    ],
+                    use_query_cache=False,
+                ),
+                location=self.location,
+            )
+            rows = list(job.result())
+        self.write_watermark("changelog", until)
+        self._changelog_mark = until
+        if not rows:
+            return 0, set()
+        return int(rows[0]["affected"] or 0), set(rows[0]["watched"] or ())
+
+    def count_pending(self, changed_since: Optional[datetime] = None, empty_only: bool = False) -> int:
+        """
+        No-cache count of pending rows (only those changed after `changed_since` if given;
+        with `empty_only`, only rows with neither city nor country).
+        """
+        where, params = self._pending_where(False, changed_since=changed_since)
+        if empty_only:
+            where += " AND city IS NULL AND country IS NULL"
+        sql = f"""
+        SELECT COUNT(*) AS pending
+        FROM {self.fq_table}
+        WHERE {where}
+        """
+        with self._timed("count_pending"):
+            job = self.client.query(
+                sql,
+                job_config=_bigquery.QueryJobConfig(query_parameters=params, use_query_cache=False),
+                location=self.location,
+            )
+            return int(list(job.result())[0][0])
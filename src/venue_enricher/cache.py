@@ -3,30 +3,86 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+import re
+import shutil
 import sqlite3
-from typing import Any, Dict, Optional, Tuple
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .prompts import PROMPT_FIELDS
+
+CacheValue = Tuple[str, str, float, str]  # city, country, confidence, evidence
+
+_NON_WORD = re.compile(r"[\W_]+")
+
 
 class EnrichmentCache:
+    """
+    SQLite result store. Keys are namespaced by model + prompt version so a
+    prompt or model change never serves stale answers; entries older than
+    `ttl_seconds` are ignored and evicted. WAL + group commits keep writes
+    cheap; sync_from/sync_to share the file through a RemoteTier.
+    """
+
     # Writes to /tmp (writable in Cloud Run)
-    def __init__(self, path: str = "/tmp/enrichment_cache.sqlite") -> None:
+    def __init__(
+        self,
+        path: str = "/tmp/enrichment_cache.sqlite",
+        model: str = "",
+        prompt_version: str = "",
+        ttl_seconds: Optional[float] = None,
+        max_rows: Optional[int] = None,
+        commit_every: int = 256,
+        commit_interval: float = 5.0,
+        evict_interval: float = 300.0,
+    ) -> None:
         self.path = path
+        self.namespace = f"{model}|{prompt_version}"
+        self.model = model
+        self.prompt_version = prompt_version
+        self.ttl_seconds = ttl_seconds
+        self.max_rows = max_rows
+        self.commit_every = max(1, commit_every)
+        self.commit_interval = commit_interval
+        self.evict_interval = evict_interval
         os.makedirs(os.path.dirname(path), exist_ok=True)
-        self.conn = sqlite3.connect(path)
+        # Why: FastAPI runs sync handlers on pool threads; the lock serializes access.
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+        self._last_evict = time.monotonic()
         self._init()
 
     def _init(self) -> None:
         cur = self.conn.cursor()
+        cur.execute("PRAGMA journal_mode=WAL")
+        cur.execute("PRAGMA synchronous=NORMAL")
         cur.execute("""
-            CREATE TABLE IF NOT EXISTS cache (
+            CREATE TABLE IF NOT EXISTS cache_v2 (
                 key TEXT PRIMARY KEY,
                 city TEXT,
                 country TEXT,
                 confidence REAL,
-                evidence TEXT
+                evidence TEXT,
+                model TEXT,
+                prompt_version TEXT,
+                created_at REAL NOT NULL
             )
         """)
+        cur.execute("CREATE INDEX IF NOT EXISTS cache_v2_created ON cache_v2(created_at)")
         self.conn.commit()
 
+    def _ns(self, key: str) -> str:
+        return hashlib.sha256(f"{self.namespace}|{key}".encode("utf-8")).hexdigest()
+
+    def _min_created(self) -> float:
+        return time.time() - self.ttl_seconds if self.ttl_seconds else 0.0
+
     @staticmethod
     def make_key(row: Dict[str, Any]) -> str:
         payload = {
@@ -36,16 +92,306 @@ class EnrichmentCache:
         blob = json.dumps(payload, sort_keys=True, ensure_ascii=False)
         return hashlib.sha256(blob.encode("utf-8")).hexdigest()
 
+    @staticmethod
+    def fingerprint(row: Dict[str, Any]) -> Optional[str]:
+        """
+        Normalized key over every field the prompt sends; None when all are empty.
+        Why: case/punctuation variants of the same venue should share one answer, but
+        rows that differ in any signal the model sees must not. Normalization is
+        Unicode-aware (NFKC + casefold), so non-Latin names keep their letters.
+        """
+        norm = [
+            _NON_WORD.sub(" ", unicodedata.normalize("NFKC", str(row.get(f) or "")).casefold()).strip()
+            for f in PROMPT_FIELDS
+        ]
+        if not any(norm):
+            return None
+        return hashlib.sha256(json.dumps(norm, ensure_ascii=False).encode("utf-8")).hexdigest()
+
     def get(self, key: str) -> Optional[Tuple[str, str, float, str]]:
-        cur = self.conn.cursor()
-        cur.execute("SELECT city,country,confidence,evidence FROM cache WHERE key=?", (key,))
-        r = cur.fetchone()
-        return tuple(r) if r else None
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        """One query per chunk of keys; expired entries count as misses."""
+        return {k: value for k, (value, _) in self.get_many_stamped(keys).items()}
+
+    def get_many_stamped(self, keys: List[str]) -> Dict[str, Tuple[CacheValue, float]]:
+        """get_many, with each entry's created_at (so upper tiers expire it on time)."""
+        by_ns = {self._ns(k): k for k in keys}
+        ns_keys = list(by_ns)
+        out: Dict[str, Tuple[CacheValue, float]] = {}
+        with self._lock:
+            for i in range(0, len(ns_keys), 500):
+                chunk = ns_keys[i : i + 500]
+                cur = self.conn.execute(
+                    "SELECT key,city,country,confidence,evidence,created_at FROM cache_v2 "
+                    f"WHERE key IN ({','.join('?' * len(chunk))}) AND created_at >= ?",
+                    (*chunk, self._min_created()),
+                )
+                for k, city, country, conf, ev, created in cur.fetchall():
+                    out[by_ns[k]] = ((city, country, conf, ev), created)
+        return out
 
     def put(self, key: str, city: str, country: str, confidence: float, evidence: str) -> None:
-        cur = self.conn.cursor()
-        cur.execute(
-            "REPLACE INTO cache(key,city,country,confidence,evidence) VALUES (?,?,?,?,?)",
-            (key, city, country, confidence, evidence),
-        )
+        self.put_many([(key, (city, country, confidence, evidence))])
+
+    def put_many(self, items: List[Tuple[str, CacheValue]]) -> None:
+        """Buffered write; committed every `commit_every` rows or `commit_interval` s."""
+        now = time.time()
+        with self._lock:
+            self.conn.executemany(
+                "REPLACE INTO cache_v2"
+                "(key,city,country,confidence,evidence,model,prompt_version,created_at) "
+                "VALUES (?,?,?,?,?,?,?,?)",
+                [
+                    (self._ns(k), *v, self.model, self.prompt_version, now)
+                    for k, v in items
+                ],
+            )
+            self._dirty += len(items)
+            if (
+                self._dirty >= self.commit_every
+                or time.monotonic() - self._last_commit >= self.commit_interval
+            ):
+                self._commit()
+
+    def _commit(self) -> None:
+        # Why: bound the file while the process runs (Cloud Run's /tmp is memory),
+        # not only at shutdown; checked on group commits, so idle instances pay nothing.
+        if (self.ttl_seconds or self.max_rows) and time.monotonic() - self._last_evict >= self.evict_interval:
+            self._evict()
         self.conn.commit()
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def evict(self) -> int:
+        """Drop expired rows, then the oldest beyond `max_rows`. Returns rows removed."""
+        with self._lock:
+            removed = self._evict()
+            self._commit()
+        return removed
+
+    def _evict(self) -> int:
+        removed = self.conn.execute(
+            "DELETE FROM cache_v2 WHERE created_at < ?", (self._min_created(),)
+        ).rowcount
+        if self.max_rows:
+            removed += self.conn.execute(
+                "DELETE FROM cache_v2 WHERE key IN (SELECT key FROM cache_v2 "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            ).rowcount
+        self._last_evict = time.monotonic()
+        return removed
+
+    def sync_from(self, remote: "RemoteTier") -> int:
+        """Merge a remote snapshot; newer entries win. Returns rows merged."""
+        fd, tmp = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        try:
+            if not remote.pull(tmp):
+                return 0
+            with self._lock:
+                self._commit()
+                self.conn.execute("ATTACH DATABASE ? AS remote", (tmp,))
+                try:
+                    cur = self.conn.execute(
+                        "INSERT INTO cache_v2 SELECT * FROM remote.cache_v2 R WHERE R.created_at >= ? "
+                        "ON CONFLICT(key) DO UPDATE SET "
+                        "city=excluded.city, country=excluded.country, "
+                        "confidence=excluded.confidence, evidence=excluded.evidence, "
+                        "model=excluded.model, prompt_version=excluded.prompt_version, "
+                        "created_at=excluded.created_at "
+                        "WHERE excluded.created_at > cache_v2.created_at",
+                        (self._min_created(),),
+                    )
+                    merged = cur.rowcount
+                    self._commit()
+                finally:
+                    self.conn.execute("DETACH DATABASE remote")
+            return merged
+        finally:
+            os.unlink(tmp)
+
+    def sync_to(self, remote: "RemoteTier") -> None:
+        """Push a consistent snapshot (VACUUM INTO) of the local store."""
+        fd, tmp = tempfile.mkstemp(suffix=".sqlite")
+        os.close(fd)
+        os.unlink(tmp)  # VACUUM INTO needs a fresh path
+        try:
+            with self._lock:
+                self._commit()
+                self.conn.execute("VACUUM INTO ?", (tmp,))
+            remote.push(tmp)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+
+class RemoteTier:
+    """Shared copy of the cache file; pull/push whole snapshots."""
+
+    def pull(self, dest: str) -> bool:  # pragma: no cover - interface
+        raise NotImplementedError
+
+    def push(self, src: str) -> None:  # pragma: no cover - interface
+        raise NotImplementedError
+
+
+class LocalFileTier(RemoteTier):
+    """Plain file stand-in for object storage (tests, shared volumes)."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def pull(self, dest: str) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        shutil.copyfile(self.path, dest)
+        return True
+
+    def push(self, src: str) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, self.path)
+
+
+class GCSTier(RemoteTier):
+    """gs://bucket/object snapshot; needs google-cloud-storage."""
+
+    def __init__(self, uri: str, timeout: Optional[float] = 60.0) -> None:
+        bucket, _, blob = uri[len("gs://"):].partition("/")
+        self.bucket_name, self.blob_name = bucket, blob
+        # Why: a stalled transfer must fail (and be logged) rather than hang startup or shutdown.
+        self.timeout = timeout
+
+    def _blob(self) -> Any:
+        from google.cloud import storage
+
+        return storage.Client().bucket(self.bucket_name).blob(self.blob_name)
+
+    def pull(self, dest: str) -> bool:
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self._blob().download_to_filename(dest, timeout=self.timeout)
+        except NotFound:
+            return False
+        return True
+
+    def push(self, src: str) -> None:
+        self._blob().upload_from_filename(src, timeout=self.timeout)
+
+
+def remote_tier(uri: str, timeout: Optional[float] = 60.0) -> Optional[RemoteTier]:
+    """'gs://bucket/key' -> GCSTier, any other non-empty value -> LocalFileTier."""
+    if not uri:
+        return None
+    if uri.startswith("gs://"):
+        return GCSTier(uri, timeout)
+    return LocalFileTier(uri[len("file://"):] if uri.startswith("file://") else uri)
+
+
+class LRUCache:
+    """
+    Bounded in-process tier. Why: repeat chain venues never leave the process.
+    Entries carry their created_at and expire after `ttl_seconds`, like the store.
+    """
+
+    def __init__(self, capacity: int = 10000, ttl_seconds: Optional[float] = None) -> None:
+        self.capacity = max(1, capacity)
+        self.ttl_seconds = ttl_seconds
+        self._data: "OrderedDict[str, Tuple[CacheValue, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str) -> Optional[CacheValue]:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[1] >= self.ttl_seconds:
+                del self._data[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, value: CacheValue, created_at: Optional[float] = None) -> None:
+        with self._lock:
+            self._data[key] = (value, time.time() if created_at is None else created_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.capacity:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+
+class TieredCache:
+    """LRU in front of SQLite; SQLite hits are promoted into the LRU."""
+
+    def __init__(self, store: EnrichmentCache, capacity: int = 10000) -> None:
+        self.lru = LRUCache(capacity, ttl_seconds=store.ttl_seconds)
+        self.store = store
+        self.store_hits = 0
+        self.store_misses = 0
+
+    def get(self, key: str) -> Optional[CacheValue]:
+        value = self.lru.get(key)
+        if value is not None:
+            return value
+        found = self.store.get_many_stamped([key]).get(key)
+        if found is None:
+            self.store_misses += 1
+            return None
+        self.store_hits += 1
+        self.lru.put(key, *found)
+        return found[0]
+
+    def get_many(self, keys: List[str]) -> Dict[str, CacheValue]:
+        out: Dict[str, CacheValue] = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self.lru.get(key)
+            if value is None:
+                missing.append(key)
+            else:
+                out[key] = value
+        if missing:
+            found = self.store.get_many_stamped(missing)
+            self.store_hits += len(found)
+            self.store_misses += len(missing) - len(found)
+            for key, (value, created_at) in found.items():
+                self.lru.put(key, value, created_at)
+                out[key] = value
+        return out
+
+    def put(self, key: str, value: CacheValue) -> None:
+        self.lru.put(key, value)
+        self.store.put(key, *value)
+
+    def flush(self) -> None:
+        self.store.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "lru_hits": self.lru.hits,
+            "lru_misses": self.lru.misses,
+            "lru_evictions": self.lru.evictions,
+            "lru_expired": self.lru.expired,
+            "lru_size": len(self.lru),
+            "sqlite_hits": self.store_hits,
+            "sqlite_misses": self.store_misses,
+        }
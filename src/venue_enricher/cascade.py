@@ -0,0 +1,54 @@
+# file: src/venue_enricher/cascade.py
+"""
+Model cascade: every miss goes to the first (cheapest) tier; answers below that
+tier's confidence threshold, or missing city/country, escalate to the next one.
+Why: stronger-model quality on hard rows at close to cheap-model cost overall.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+
+@dataclass(frozen=True)
+class Tier:
+    model: str
+    threshold: float = 0.0  # accept answers at or above this confidence
+    budget: int = 0  # max keys escalated into this tier per batch; 0 = unlimited
+
+    def accepts(self, answer: Any) -> bool:
+        return bool(answer.city and answer.country) and answer.confidence >= self.threshold
+
+    def has_room(self, used: int) -> bool:
+        return not self.budget or used < self.budget
+
+
+def parse_tiers(spec: str, default_model: str) -> List[Tier]:
+    """
+    "gpt-4o-mini:0.8,gpt-4o:0:2000" -> [Tier(gpt-4o-mini, 0.8), Tier(gpt-4o, 0.0, 2000)].
+    An empty spec is the single `default_model` tier. The last tier's threshold is
+    irrelevant: there is nothing left to escalate to.
+    """
+    tiers: List[Tier] = []
+    for part in filter(None, (p.strip() for p in (spec or "").split(","))):
+        model, _, rest = part.partition(":")
+        threshold, _, budget = rest.partition(":")
+        tiers.append(Tier(model.strip(), float(threshold or 0), int(budget or 0)))
+    return tiers or [Tier(default_model)]
+
+
+def tier_report(tiers: List[Tier], stats: Optional[Dict[str, int]]) -> List[Dict[str, Any]]:
+    """Per-tier counters from enrich_batch stats (`tier<i>_*` keys)."""
+    stats = stats or {}
+    out = []
+    for i, tier in enumerate(tiers):
+        requests = stats.get(f"tier{i}_requests", 0)
+        out.append({
+            "model": tier.model,
+            "keys": stats.get(f"tier{i}_keys", 0),
+            "accepted": stats.get(f"tier{i}_accepted", 0),
+            "errors": stats.get(f"tier{i}_errors", 0),
+            "requests": requests,
+            "tokens": stats.get(f"tier{i}_tokens", 0),
+            "avg_latency_ms": round(stats.get(f"tier{i}_ms", 0) / requests, 1) if requests else 0.0,
+        })
+    return out
@@ -13,4 +13,8 @@ class Settings:
     max_tokens: int = int(os.getenv("OPENAI_MAX_TOKENS", "160"))
     batch_size: int = int(os.getenv("BATCH_SIZE", "200"))
     concurrency: int = int(os.getenv("CONCURRENCY", "8"))
-    prompt_version: str = "v1.0-city-country"
+    pack_size: int = int(os.getenv("PACK_SIZE", "1"))
+    # Why: part of every cache key; bump when prompts change so old answers are not replayed.
+    prompt_version: str = os.getenv("PROMPT_VERSION", "v1.1-city-country")
+    openai_rpm: int = int(os.getenv("OPENAI_RPM", "500"))
+    openai_tpm: int = int(os.getenv("OPENAI_TPM", "200000"))
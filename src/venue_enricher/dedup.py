@@ -0,0 +1,65 @@
+# file: src/venue_enricher/dedup.py
+from __future__ import annotations
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+SOLO = "solo:"  # prefix of the private keys given to rows with nothing to key on
+
+
+def group_by_key(
+    rows: Iterable[Dict[str, Any]],
+    key_fn: Callable[[Dict[str, Any]], Optional[str]],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Group rows by canonical input key, preserving first-seen order.
+    Why: ticketing duplicates collapse to one model call per unique venue.
+    A row whose key_fn returns None gets a private SOLO key of its own, so it is
+    never merged with another row; see is_solo.
+    """
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for i, r in enumerate(rows):
+        key = key_fn(r)
+        groups.setdefault(f"{SOLO}{i}" if key is None else key, []).append(r)
+    return groups
+
+
+def is_solo(key: str) -> bool:
+    """True for a private key: never cache, share or join it across batches."""
+    return key.startswith(SOLO)
+
+
+class InFlight:
+    """
+    Process-wide registry of keys currently being resolved.
+    Why: concurrent batches wait on the same pending future instead of calling twice.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._pending: Dict[str, Future] = {}
+        self.joined = 0
+
+    def claim(self, key: str) -> Tuple[Future, bool]:
+        """Returns (future, owner). Only the owner must resolve the future."""
+        with self._lock:
+            fut = self._pending.get(key)
+            if fut is not None:
+                self.joined += 1
+                return fut, False
+            fut = Future()
+            self._pending[key] = fut
+            return fut, True
+
+    def resolve(self, key: str, value: Any) -> None:
+        with self._lock:
+            fut = self._pending.pop(key, None)
+        if fut is not None:
+            fut.set_result(value)
+
+    def fail(self, key: str, exc: BaseException) -> None:
+        with self._lock:
+            fut = self._pending.pop(key, None)
+        if fut is not None:
+            fut.set_exception(exc)
@@ -1,15 +1,24 @@
 # path: src/venue_enricher/enricher.py
 from __future__ import annotations
 
+import asyncio
 import os
 import re
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import Dict, Any, Iterable, List, Tuple, Optional
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, TimeoutError as FutureTimeout, wait
+from typing import TYPE_CHECKING, Dict, Any, Iterable, List, Set, Tuple, Optional
 
-try:
-    from openai import OpenAI  # lazy import handling below
-except Exception:  # pragma: no cover
-    OpenAI = None  # type: ignore
+from .async_engine import Answer, AsyncEngine, TokenBucket
+from .batch import ResultBatch
+from .cache import EnrichmentCache, TieredCache
+from .cascade import Tier
+from .dedup import InFlight, group_by_key, is_solo
+from .resilience import CircuitBreaker, LatencyTracker, Resilience
+from .resolver import PreResolver
+
+if TYPE_CHECKING:  # numpy stays optional unless the index is enabled
+    from .similarity import SimilarityIndex
 
 
 CITY_HINTS = re.compile(
@@ -26,11 +35,13 @@ COUNTRY_WORDS = {
     "u.a.e.": "United Arab Emirates",
 }
 
+IN_FLIGHT = InFlight()
+
 
 def _fallback_extract(name: str, address: str) -> Tuple[Optional[str], Optional[str]]:
     """
-    Heuristic extractor used when no OpenAI key is present or model fails.
-    Why: Keeps pipeline productive even under rate/availability issues.
+    Heuristic extractor used when no OpenAI key is present.
+    Why: Keeps the pipeline usable offline; model failures are retried, not guessed.
     """
     text = f"{name or ''} | {address or ''}".strip()
     if not text:
@@ -55,37 +66,56 @@ def _fallback_extract(name: str, address: str) -> Tuple[Optional[str], Optional[
     return city, country
 
 
-def _openai_client() -> Optional["OpenAI"]:
+_ENGINE: Optional[AsyncEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def _engine() -> Optional[AsyncEngine]:
+    """Process-wide async engine; None when no key is configured."""
+    global _ENGINE
     api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key or OpenAI is None:
+    if not api_key:
         return None
-    return OpenAI(api_key=api_key)
-
-
-def _ask_model(client: "OpenAI", model: str, name: str, address: str) -> Tuple[Optional[str], Optional[str]]:
-    prompt = (
-        "Extract city and country from the venue data. "
-        "Return strictly JSON with keys city and country. "
-        f"Name: {name!r}\nAddress: {address!r}"
-    )
-    resp = client.chat.completions.create(
-        model=model,
-        messages=[
-            {"role": "system", "content": "You return only strict JSON."},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.0,
-    )
-    content = resp.choices[0].message.content.strip()
-    # Minimal parse without extra deps
-    city, country = None, None
-    m_city = re.search(r'"city"\s*:\s*"([^"]*)"', content)
-    m_country = re.search(r'"country"\s*:\s*"([^"]*)"', content)
-    if m_city:
-        city = m_city.group(1).strip() or None
-    if m_country:
-        country = m_country.group(1).strip() or None
-    return city, country
+    with _ENGINE_LOCK:
+        if _ENGINE is None:
+            try:
+                # Why: the SDK takes ~0.35s to import; pay it on first model call or warm-up.
+                from openai import AsyncOpenAI
+            except Exception:  # pragma: no cover
+                return None
+            limiter = TokenBucket(
+                rpm=int(os.getenv("OPENAI_RPM", "500")),
+                tpm=int(os.getenv("OPENAI_TPM", "200000")),
+            )
+            resilience = Resilience(
+                attempts=int(os.getenv("MODEL_ATTEMPTS", "4")),
+                breaker=CircuitBreaker(
+                    failure_threshold=int(os.getenv("BREAKER_FAILURES", "5")),
+                    reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+                ),
+                latency=LatencyTracker(min_delay=float(os.getenv("HEDGE_MIN_SECONDS", "1.0"))),
+                hedge=os.getenv("HEDGE", "1") == "1",
+            )
+            # Why: retries are paced by our limiter and resilience layer, not the SDK's backoff.
+            client = AsyncOpenAI(api_key=api_key, max_retries=0)
+            _ENGINE = AsyncEngine(
+                client,
+                limiter,
+                max_tokens=int(os.getenv("OPENAI_MAX_TOKENS", "160")),
+                resilience=resilience,
+                deadline=float(os.getenv("MODEL_DEADLINE_SECONDS", "30")),
+                compact=os.getenv("PROMPT_STYLE", "full") == "compact",
+            )
+        return _ENGINE
+
+
+def _row_key(row: Dict[str, Any]) -> Optional[str]:
+    return EnrichmentCache.fingerprint(row)
+
+
+def _bump(stats: Optional[Dict[str, int]], key: str, n: int = 1) -> None:
+    if stats is not None:
+        stats[key] = stats.get(key, 0) + n
 
 
 def enrich_batch(
@@ -93,41 +123,215 @@ def enrich_batch(
     model: str,
     concurrency: int = 8,
     verbose: bool = False,
-) -> List[Dict[str, Any]]:
+    cache: Optional[TieredCache] = None,
+    in_flight: Optional[InFlight] = IN_FLIGHT,
+    stats: Optional[Dict[str, int]] = None,
+    pack_size: int = 1,
+    resolver: Optional[PreResolver] = None,
+    tiers: Optional[List[Tier]] = None,
+    similar: Optional["SimilarityIndex"] = None,
+    join_timeout: Optional[float] = None,
+) -> ResultBatch:
     """
-    Returns [{id, city, country}, ...].
+    Returns a ResultBatch of {id, city, country}.
     Why: Keep API payload small and let BigQuery do the merge.
+    `rows` is a VenueBatch (or any row dicts); rows are read through views, never copied.
+    Rows are grouped by canonical key so each unique venue costs one call;
+    cache hits, rows the local `resolver` answers confidently and near-duplicates of
+    venues already answered (`similar`) never reach it;
+    keys already in flight in another batch are awaited, not re-asked, for at most
+    `join_timeout` seconds (default: the engine deadline per tier).
+    Owned keys are always released (failed if this batch raises), so joiners never hang.
+    Misses run on the shared async engine, `pack_size` venues per request;
+    with `tiers`, weak answers escalate up the model cascade (default: `model` only).
+    Rows whose calls still fail after retries are left out, so they stay pending.
+    Cache and fan-out stay on this thread.
     """
-    client = _openai_client()
-    results: List[Dict[str, Any]] = []
+    engine = _engine()
+    results = ResultBatch()
 
-    def _enrich_row(row: Dict[str, Any]) -> Dict[str, Any]:
-        rid = row.get("id")
-        name = row.get("name") or ""
-        address = row.get("address") or ""
-        city, country = None, None
+    def _fan_out(group: List[Dict[str, Any]], city: Optional[str], country: Optional[str]) -> None:
+        # Trim empties to "" to let MERGE guards ignore them
+        city, country = (city or "").strip(), (country or "").strip()
+        for row in group:
+            rid = row.get("id")
+            results.append(rid, city, country)
+            if verbose:
+                print({"event": "enrich_row", "id": rid, "city": city, "country": country})
 
-        if client:
-            try:
-                city, country = _ask_model(client, model, name, address)
-            except Exception:
-                city, country = _fallback_extract(name, address)
+    def _heuristic(row: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+        return _fallback_extract(row.get("name") or "", row.get("address") or "")
+
+    groups = group_by_key(rows, _row_key)
+    _bump(stats, "rows", sum(len(g) for g in groups.values()))
+    _bump(stats, "unique", len(groups))
+
+    # Why: one indexed lookup per batch instead of one query per key.
+    # Why: rows with no identifying fields have private keys; no answer is shared with them.
+    hits = cache.get_many([k for k in groups if not is_solo(k)]) if cache is not None else {}
+    _bump(stats, "cache_hits", len(hits))
+    misses: List[str] = []
+    for key, group in groups.items():
+        hit = hits.get(key)
+        if hit is not None:
+            _fan_out(group, hit[0], hit[1])
         else:
-            city, country = _fallback_extract(name, address)
+            misses.append(key)
 
-        # Trim empties to "" to let MERGE guards ignore them
-        out = {
-            "id": rid,
-            "city": (city or "").strip(),
-            "country": (country or "").strip(),
-        }
-        if verbose:
-            print({"event": "enrich_row", "id": rid, "city": out["city"], "country": out["country"]})
-        return out
-
-    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as ex:
-        futs = [ex.submit(_enrich_row, r) for r in rows]
-        for f in as_completed(futs):
-            results.append(f.result())
+    if resolver is not None and misses:
+        resolved = resolver.resolve_batch([groups[key][0] for key in misses])
+        _bump(stats, "resolver_hits", sum(1 for r in resolved if r is not None))
+        unresolved: List[str] = []
+        for key, res in zip(misses, resolved):
+            if res is None:
+                unresolved.append(key)
+            else:
+                _fan_out(groups[key], res.city, res.country)
+        misses = unresolved
+
+    if similar is not None and misses:
+        matches = similar.lookup_many([groups[key][0] for key in misses])
+        _bump(stats, "similar_hits", sum(1 for m in matches if m is not None))
+        unmatched: List[str] = []
+        for key, match in zip(misses, matches):
+            if match is None:
+                unmatched.append(key)
+            else:
+                _fan_out(groups[key], match.city, match.country)
+        misses = unmatched
+
+    owned: List[str] = []
+    joined: Dict[str, Future] = {}
+    for key in misses:
+        # Why: a private key means nothing to join on; claiming it would let another
+        # batch's keyless row pick up this row's answer.
+        if in_flight is None or is_solo(key):
+            owned.append(key)
+            continue
+        fut, owner = in_flight.claim(key)
+        if owner:
+            owned.append(key)
+        else:
+            joined[key] = fut
+    _bump(stats, "joined_in_flight", len(joined))
+    _bump(stats, "model_keys", len(owned) if engine is not None else 0)
+    learned: List[Tuple[Dict[str, Any], str, str]] = []
+    released: Set[str] = set()
+
+    def _release(exc: BaseException) -> None:
+        # Why: an owned key left unresolved would block every batch that joined it.
+        if in_flight is None:
+            return
+        for key in owned:
+            if key not in released and not is_solo(key):
+                released.add(key)
+                in_flight.fail(key, exc)
+
+    def _settle(
+        key: str,
+        city: Optional[str],
+        country: Optional[str],
+        from_model: bool,
+        confidence: float = 0.0,
+        evidence: str = "",
+    ) -> None:
+        # Why: heuristic guesses must not be replayed as if the model said so.
+        if cache is not None and from_model and not is_solo(key):
+            cache.put(key, ((city or "").strip(), (country or "").strip(), confidence, evidence))
+        if similar is not None and from_model and not is_solo(key):
+            learned.append((groups[key][0], (city or "").strip(), (country or "").strip()))
+        if in_flight is not None and not is_solo(key):
+            released.add(key)
+            in_flight.resolve(key, (city, country, from_model))
+        _fan_out(groups[key], city, country)
+
+    try:
+        if engine is None:
+            for key in owned:
+                _settle(key, *_heuristic(groups[key][0]), from_model=False)
+        elif owned:
+            # Why: bounds this batch's share of the engine; the limiter paces the process.
+            sem = asyncio.Semaphore(max(1, concurrency))
+            ladder = tiers or [Tier(model)]
+            escalated = [0] * len(ladder)
+            best: Dict[str, Answer] = {}
+            pending: Dict[Future, Tuple[int, float]] = {}
+
+            def _submit(level: int, keys: List[str]) -> None:
+                items = [(key, groups[key][0]) for key in keys]
+                futs = engine.resolve(items, ladder[level].model, sem, pack_size=pack_size)
+                _bump(stats, f"tier{level}_keys", len(keys))
+                _bump(stats, f"tier{level}_requests", len(futs))
+                _bump(stats, "model_requests", len(futs))
+                started = time.monotonic()
+                for f in futs:
+                    pending[f] = (level, started)
+
+            def _final(key: str, exc: Optional[BaseException] = None) -> None:
+                ans = best.get(key)
+                if ans is None:
+                    # Why: no guess is written; the row stays pending and is retried next run.
+                    _bump(stats, "model_errors")
+                    if in_flight is not None and not is_solo(key):
+                        released.add(key)
+                        in_flight.fail(key, exc or RuntimeError("model call failed"))
+                else:
+                    _settle(key, ans.city, ans.country, True, ans.confidence, ans.evidence)
+
+            _submit(0, owned)
+            while pending:
+                done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                escalate: Dict[int, List[str]] = {}
+                for f in done:
+                    level, started = pending.pop(f)
+                    _bump(stats, f"tier{level}_ms", int((time.monotonic() - started) * 1000))
+                    for key, res in f.result().items():
+                        error = res if isinstance(res, BaseException) else None
+                        if error is not None:
+                            _bump(stats, f"tier{level}_errors")
+                        else:
+                            _bump(stats, "tokens", res.tokens)
+                            _bump(stats, f"tier{level}_tokens", res.tokens)
+                            _bump(stats, f"tier{level}_prompt_tokens", res.prompt_tokens)
+                            _bump(stats, f"tier{level}_completion_tokens", res.completion_tokens)
+                            prev = best.get(key)
+                            if prev is None or res.confidence >= prev.confidence:
+                                best[key] = res
+                            if ladder[level].accepts(res):
+                                _bump(stats, f"tier{level}_accepted")
+                                _final(key)
+                                continue
+                        nxt = level + 1
+                        if nxt < len(ladder) and ladder[nxt].has_room(escalated[nxt]):
+                            escalated[nxt] += 1
+                            escalate.setdefault(nxt, []).append(key)
+                        else:
+                            _final(key, error)
+                for level, keys in escalate.items():
+                    _submit(level, keys)
+    except BaseException as exc:
+        _release(exc)
+        raise
+    finally:
+        _release(RuntimeError("batch ended before the key was settled"))
+
+    if joined:
+        if join_timeout is None:
+            join_timeout = engine.deadline * max(1, len(tiers or ())) if engine is not None else 30.0
+        give_up = time.monotonic() + join_timeout
+    for key, fut in joined.items():
+        try:
+            city, country, _ = fut.result(timeout=max(0.0, give_up - time.monotonic()))
+        except FutureTimeout:
+            # Why: never block a batch on another batch's stuck call; the rows stay pending.
+            _bump(stats, "join_timeouts")
+            continue
+        except Exception:
+            _bump(stats, "model_errors")
+            continue  # the owner's call failed; leave these rows pending too
+        _fan_out(groups[key], city, country)
+
+    if learned:
+        similar.add_many(learned)
 
     return results
@@ -0,0 +1,322 @@
+# file: src/venue_enricher/gazetteer.py
+"""
+Offline gazetteer: countries (aliases, ccTLD, dialing code) and major cities.
+Why: lets the pre-resolver answer rows with strong local signals without a model call.
+Tables are plain text so they are easy to extend; indexes are built once at import.
+"""
+from __future__ import annotations
+import re
+from typing import Dict, FrozenSet, List, Set, Tuple
+
+# iso2 | canonical name | aliases (;) | ccTLD | dialing code
+_COUNTRIES = """
+US|United States|usa;u.s.a.;us;u.s.;united states of america;america|us|1
+CA|Canada||ca|1
+MX|Mexico|méxico|mx|52
+BR|Brazil|brasil|br|55
+AR|Argentina||ar|54
+CL|Chile||cl|56
+CO|Colombia||co|57
+PE|Peru|perú|pe|51
+UY|Uruguay||uy|598
+GB|United Kingdom|uk;u.k.;england;scotland;wales;northern ireland;great britain;britain|uk|44
+IE|Ireland|republic of ireland;éire|ie|353
+FR|France||fr|33
+DE|Germany|deutschland|de|49
+ES|Spain|españa|es|34
+PT|Portugal||pt|351
+IT|Italy|italia|it|39
+NL|Netherlands|the netherlands;holland;nederland|nl|31
+BE|Belgium|belgique;belgië|be|32
+LU|Luxembourg||lu|352
+CH|Switzerland|schweiz;suisse;svizzera|ch|41
+AT|Austria|österreich|at|43
+DK|Denmark|danmark|dk|45
+SE|Sweden|sverige|se|46
+NO|Norway|norge|no|47
+FI|Finland|suomi|fi|358
+IS|Iceland||is|354
+PL|Poland|polska|pl|48
+CZ|Czechia|czech republic|cz|420
+SK|Slovakia||sk|421
+HU|Hungary|magyarország|hu|36
+RO|Romania|românia|ro|40
+BG|Bulgaria||bg|359
+GR|Greece|hellas|gr|30
+HR|Croatia|hrvatska|hr|385
+SI|Slovenia||si|386
+RS|Serbia||rs|381
+EE|Estonia||ee|372
+LV|Latvia||lv|371
+LT|Lithuania||lt|370
+UA|Ukraine||ua|380
+TR|Turkey|türkiye;turkiye|tr|90
+RU|Russia|russian federation|ru|7
+IL|Israel||il|972
+AE|United Arab Emirates|uae;u.a.e.|ae|971
+SA|Saudi Arabia|ksa|sa|966
+QA|Qatar||qa|974
+EG|Egypt||eg|20
+MA|Morocco|maroc|ma|212
+ZA|South Africa||za|27
+NG|Nigeria||ng|234
+KE|Kenya||ke|254
+IN|India||in|91
+PK|Pakistan||pk|92
+SG|Singapore||sg|65
+MY|Malaysia||my|60
+TH|Thailand||th|66
+ID|Indonesia||id|62
+PH|Philippines||ph|63
+VN|Vietnam|viet nam|vn|84
+CN|China|prc;people's republic of china|cn|86
+HK|Hong Kong||hk|852
+TW|Taiwan||tw|886
+JP|Japan||jp|81
+KR|South Korea|korea;republic of korea|kr|82
+AU|Australia||au|61
+NZ|New Zealand||nz|64
+"""
+
+# city | iso2 | aliases (;)
+_CITIES = """
+New York|US|nyc;new york city;manhattan;brooklyn
+Los Angeles|US|
+Chicago|US|
+Houston|US|
+Phoenix|US|
+Philadelphia|US|
+San Antonio|US|
+San Diego|US|
+Dallas|US|
+Austin|US|
+San Francisco|US|
+Seattle|US|
+Boston|US|
+Washington|US|washington dc;washington d.c.
+Miami|US|
+Atlanta|US|
+Denver|US|
+Las Vegas|US|
+Nashville|US|
+New Orleans|US|
+Detroit|US|
+Minneapolis|US|
+Portland|US|
+Orlando|US|
+Toronto|CA|
+Montreal|CA|montréal
+Vancouver|CA|
+Calgary|CA|
+Ottawa|CA|
+Mexico City|MX|ciudad de méxico;cdmx
+Guadalajara|MX|
+Monterrey|MX|
+São Paulo|BR|sao paulo
+Rio de Janeiro|BR|
+Buenos Aires|AR|
+Santiago|CL|
+Bogotá|CO|bogota
+Lima|PE|
+Montevideo|UY|
+London|GB|
+Manchester|GB|
+Birmingham|GB|
+Liverpool|GB|
+Leeds|GB|
+Glasgow|GB|
+Edinburgh|GB|
+Bristol|GB|
+Cardiff|GB|
+Belfast|GB|
+Newcastle upon Tyne|GB|newcastle
+Nottingham|GB|
+Sheffield|GB|
+Brighton|GB|
+Dublin|IE|
+Cork|IE|
+Paris|FR|
+Lyon|FR|
+Marseille|FR|
+Toulouse|FR|
+Nice|FR|
+Bordeaux|FR|
+Lille|FR|
+Nantes|FR|
+Strasbourg|FR|
+Berlin|DE|
+Hamburg|DE|
+Munich|DE|münchen;muenchen
+Cologne|DE|köln;koeln
+Frankfurt|DE|frankfurt am main
+Stuttgart|DE|
+Düsseldorf|DE|dusseldorf;duesseldorf
+Leipzig|DE|
+Dresden|DE|
+Hanover|DE|hannover
+Madrid|ES|
+Barcelona|ES|
+Valencia|ES|
+Seville|ES|sevilla
+Bilbao|ES|
+Málaga|ES|malaga
+Lisbon|PT|lisboa
+Porto|PT|oporto
+Rome|IT|roma
+Milan|IT|milano
+Naples|IT|napoli
+Turin|IT|torino
+Florence|IT|firenze
+Bologna|IT|
+Venice|IT|venezia
+Verona|IT|
+Amsterdam|NL|
+Rotterdam|NL|
+The Hague|NL|den haag
+Utrecht|NL|
+Eindhoven|NL|
+Brussels|BE|bruxelles;brussel
+Antwerp|BE|antwerpen;anvers
+Ghent|BE|gent
+Zurich|CH|zürich
+Geneva|CH|genève;geneve
+Basel|CH|
+Bern|CH|berne
+Vienna|AT|wien
+Salzburg|AT|
+Copenhagen|DK|københavn;kobenhavn
+Aarhus|DK|
+Stockholm|SE|
+Gothenburg|SE|göteborg;goteborg
+Malmö|SE|malmo
+Oslo|NO|
+Bergen|NO|
+Helsinki|FI|
+Reykjavik|IS|reykjavík
+Warsaw|PL|warszawa
+Kraków|PL|krakow;cracow
+Wrocław|PL|wroclaw
+Gdańsk|PL|gdansk
+Prague|CZ|praha
+Brno|CZ|
+Bratislava|SK|
+Budapest|HU|
+Bucharest|RO|bucurești;bucuresti
+Sofia|BG|
+Athens|GR|athina
+Thessaloniki|GR|
+Zagreb|HR|
+Ljubljana|SI|
+Belgrade|RS|beograd
+Tallinn|EE|
+Riga|LV|
+Vilnius|LT|
+Kyiv|UA|kiev
+Istanbul|TR|i̇stanbul
+Ankara|TR|
+Moscow|RU|moskva
+Saint Petersburg|RU|st petersburg;st. petersburg
+Tel Aviv|IL|tel aviv-yafo
+Jerusalem|IL|
+Dubai|AE|
+Abu Dhabi|AE|
+Riyadh|SA|
+Jeddah|SA|
+Doha|QA|
+Cairo|EG|
+Casablanca|MA|
+Marrakesh|MA|marrakech
+Johannesburg|ZA|
+Cape Town|ZA|
+Durban|ZA|
+Lagos|NG|
+Nairobi|KE|
+Mumbai|IN|bombay
+Delhi|IN|new delhi
+Bangalore|IN|bengaluru
+Chennai|IN|madras
+Kolkata|IN|calcutta
+Hyderabad|IN|
+Karachi|PK|
+Lahore|PK|
+Singapore|SG|
+Kuala Lumpur|MY|
+Bangkok|TH|
+Jakarta|ID|
+Manila|PH|
+Ho Chi Minh City|VN|saigon
+Hanoi|VN|
+Beijing|CN|peking
+Shanghai|CN|
+Guangzhou|CN|
+Shenzhen|CN|
+Hong Kong|HK|
+Taipei|TW|
+Tokyo|JP|
+Osaka|JP|
+Kyoto|JP|
+Yokohama|JP|
+Seoul|KR|
+Busan|KR|
+Sydney|AU|
+Melbourne|AU|
+Brisbane|AU|
+Perth|AU|
+Adelaide|AU|
+Auckland|NZ|
+Wellington|NZ|
+"""
+
+_SPACE = re.compile(r"\s+")
+
+
+def norm(text: str) -> str:
+    """Lowercase, trim punctuation at the ends, collapse whitespace."""
+    return _SPACE.sub(" ", (text or "").lower()).strip(" .,;:-()[]'\"")
+
+
+COUNTRY_NAME: Dict[str, str] = {}  # iso2 -> canonical name
+COUNTRY_BY_ALIAS: Dict[str, str] = {}  # normalized name/alias -> iso2
+COUNTRY_BY_TLD: Dict[str, str] = {}  # ccTLD -> iso2
+COUNTRIES_BY_DIAL: Dict[str, FrozenSet[str]] = {}  # dialing code -> iso2s sharing it
+CITY_NAME: Dict[Tuple[str, str], str] = {}  # (normalized alias, iso2) -> canonical city
+CITIES_BY_ALIAS: Dict[str, FrozenSet[str]] = {}  # normalized alias -> iso2s with that city
+MAX_DIAL_LEN = 3
+
+
+def _build() -> None:
+    dial: Dict[str, Set[str]] = {}
+    for line in _COUNTRIES.strip().splitlines():
+        iso, name, aliases, tld, code = line.split("|")
+        COUNTRY_NAME[iso] = name
+        # Why: bare ISO codes are not aliases; 'CA'/'IN' in US addresses are states.
+        for alias in [name, *filter(None, aliases.split(";"))]:
+            COUNTRY_BY_ALIAS.setdefault(norm(alias), iso)
+        COUNTRY_BY_TLD[tld] = iso
+        dial.setdefault(code, set()).add(iso)
+    COUNTRIES_BY_DIAL.update({k: frozenset(v) for k, v in dial.items()})
+
+    cities: Dict[str, Set[str]] = {}
+    for line in _CITIES.strip().splitlines():
+        name, iso, aliases = line.split("|")
+        for alias in [name, *filter(None, aliases.split(";"))]:
+            key = norm(alias)
+            CITY_NAME[(key, iso)] = name
+            cities.setdefault(key, set()).add(iso)
+    CITIES_BY_ALIAS.update({k: frozenset(v) for k, v in cities.items()})
+
+
+_build()
+
+
+def countries_for_dial(digits: str) -> FrozenSet[str]:
+    """Longest-prefix match of an international number (digits only, no '+')."""
+    for n in range(MAX_DIAL_LEN, 0, -1):
+        hit = COUNTRIES_BY_DIAL.get(digits[:n])
+        if hit:
+            return hit
+    return frozenset()
+
+
+def country_names() -> List[str]:
+    return sorted(COUNTRY_NAME.values())
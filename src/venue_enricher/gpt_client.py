@@ -1,10 +1,19 @@
 # file: src/venue_enricher/gpt_client.py
 from __future__ import annotations
-from typing import Dict, Any
+import json
+from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
-from tenacity import retry, stop_after_attempt, wait_exponential
-from openai import OpenAI
-from .prompts import SYSTEM_PROMPT, build_user_prompt, JSON_SCHEMA
+from .prompts import (
+    SYSTEM_PROMPT,
+    build_user_prompt,
+    JSON_SCHEMA,
+    PACKED_SYSTEM_PROMPT,
+    PACKED_JSON_SCHEMA,
+    build_packed_user_prompt,
+    parse_packed,
+    validate_item,
+)
+from .resilience import Resilience
 
 class LocationResult(BaseModel):
     city: str = ""
@@ -33,37 +42,104 @@ def normalize_country(country: str) -> str:
 
 class GPTClient:
     # Why JSON schema: minimizes parsing errors, reduces tokens, predictable.
-    def __init__(self, api_key: str, model: str, max_tokens: int, prompt_version: str) -> None:
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        max_tokens: int,
+        prompt_version: str,
+        deadline: float = 30.0,
+        resilience: Optional[Resilience] = None,
+    ) -> None:
         if not api_key:
             raise ValueError("OPENAI_API_KEY is required")
-        self.client = OpenAI(api_key=api_key)
+        from openai import OpenAI  # deferred: heavy SDK import, only needed once a client is built
+
+        # Why: per-request deadline; retries come from the shared resilience layer.
+        self.client = OpenAI(api_key=api_key, max_retries=0, timeout=deadline)
         self.model = model
         self.max_tokens = max_tokens
         self.prompt_version = prompt_version
+        self.resilience = resilience or Resilience()
 
-    @retry(wait=wait_exponential(multiplier=1, min=1, max=30), stop=stop_after_attempt(5))
     def extract(self, row: Dict[str, Any]) -> LocationResult:
+        """
+        Raises after retries (or CircuitOpen), or ValueError on a malformed answer;
+        callers re-queue the row.
+        Why: an unparseable answer is not "unknown" and must not be written as blanks.
+        """
         user_prompt = build_user_prompt(row)
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            temperature=0,
-            max_tokens=self.max_tokens,
-            response_format={"type": "json_schema", "json_schema": JSON_SCHEMA},
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
+        resp = self.resilience.call(
+            lambda: self.client.chat.completions.create(
+                model=self.model,
+                temperature=0,
+                max_tokens=self.max_tokens,
+                response_format={"type": "json_schema", "json_schema": JSON_SCHEMA},
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_prompt},
+                ],
+            )
         )
-        content = resp.choices[0].message.content or "{}"
+        content = resp.choices[0].message.content or ""
         try:
-            import json
-            data = json.loads(content)
-        except Exception:
-            data = {"city": "", "country": "", "confidence": 0.0, "evidence": ""}
+            data = validate_item(json.loads(content))
+        except ValueError:
+            data = None
+        if data is None:
+            raise ValueError(f"malformed model answer: {content[:200]!r}")
 
         return LocationResult(
-            city=(data.get("city") or "").strip(),
-            country=normalize_country(data.get("country") or ""),
-            confidence=float(data.get("confidence") or 0.0),
-            evidence=(data.get("evidence") or "").strip(),
+            city=data["city"],
+            country=normalize_country(data["country"]),
+            confidence=data["confidence"],
+            evidence=data["evidence"],
         )
+
+    def extract_many(self, rows: List[Dict[str, Any]]) -> List[Optional[LocationResult]]:
+        """
+        Packed variant: all rows in one request, results in input order.
+        Why: one system prompt per K venues; missing/invalid items fall back to extract().
+        A row whose fallback also fails is None (re-queue it); the rest of the pack stands.
+        """
+        if len(rows) <= 1:
+            return [self._extract_or_none(r) for r in rows]
+        ids = [str(i) for i in range(len(rows))]
+        try:
+            resp = self.resilience.call(
+                lambda: self.client.chat.completions.create(
+                    model=self.model,
+                    temperature=0,
+                    max_tokens=self.max_tokens * len(rows),
+                    response_format={"type": "json_schema", "json_schema": PACKED_JSON_SCHEMA},
+                    messages=[
+                        {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                        {"role": "user", "content": build_packed_user_prompt(zip(ids, rows))},
+                    ],
+                )
+            )
+            parsed = parse_packed(resp.choices[0].message.content or "", ids)
+        except Exception:
+            parsed = {}
+
+        out: List[Optional[LocationResult]] = []
+        for item_id, row in zip(ids, rows):
+            data = parsed.get(item_id)
+            if data is None:
+                out.append(self._extract_or_none(row))
+                continue
+            out.append(
+                LocationResult(
+                    city=data["city"],
+                    country=normalize_country(data["country"]),
+                    confidence=data["confidence"],
+                    evidence=data["evidence"],
+                )
+            )
+        return out
+
+    def _extract_or_none(self, row: Dict[str, Any]) -> Optional[LocationResult]:
+        try:
+            return self.extract(row)
+        except Exception:  # noqa: BLE001 - CircuitOpen, retries exhausted, malformed answer
+            return None
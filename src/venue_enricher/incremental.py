@@ -0,0 +1,104 @@
+# file: src/venue_enricher/incremental.py
+"""
+Change-driven enrichment passes and an approximate pending counter.
+Why: re-evaluating the pending predicate over the whole table (and COUNT(*)
+on every /stats hit) costs table size per run; with a change column,
+scans track new data instead.
+
+A pass is the sequence of runs from cursor None until a run exhausts its
+slice. It reads only rows whose change column moved after the previous
+pass started. The start of the current pass is recorded in the watermark
+table at `<kind>:started`, and it is promoted to `<kind>` when the pass
+ends. Because both values live in BigQuery, any instance can continue or
+finish the pass.
+"""
+from __future__ import annotations
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+# Rows committed just before a pass started may carry slightly older change
+# timestamps (streaming buffer, clock skew); re-reading them is harmless.
+CHANGE_OVERLAP = timedelta(minutes=5)
+
+
+def pass_kind(overwrite: bool, shard: int, num_shards: int) -> str:
+    return f"incremental:{'overwrite' if overwrite else 'pending'}:{shard}/{num_shards}"
+
+
+def begin(io: Any, kind: str, start: Optional[str]) -> Optional[datetime]:
+    """
+    `changed_since` for one run of a pass; None = no previous pass (full scan).
+    A run starting from cursor None opens a new pass.
+    """
+    if start is None:
+        io.write_watermark(f"{kind}:started", datetime.now(timezone.utc))
+    since = io.read_watermark(kind)
+    return since - CHANGE_OVERLAP if since is not None else None
+
+
+def finish(io: Any, kind: str) -> Optional[datetime]:
+    """Promote the pass start to the high-water mark; later passes read only newer changes."""
+    started = io.read_watermark(f"{kind}:started")
+    if started is not None:
+        io.write_watermark(kind, started)
+    return started
+
+
+class PendingCounter:
+    """
+    Approximate pending count for /stats.
+    It is seeded by one exact COUNT(*). After that it is kept current cheaply:
+    - this process subtracts the rows its own writes completed (city and country
+      both set, so they left the pending set);
+    - it adds pending rows with neither city nor country whose change column moved
+      since the last refresh (needs `io.change_column`; cheap when the table is
+      partitioned or clustered on it).
+    Invariant: a row is added at most once per appearance. Every write that touches
+    a row sets city or country, so a row that a write leaves partially filled is
+    neither subtracted nor re-added, even though the write bumps its change column.
+    Windows never overlap, since each refresh starts where the last ended.
+    What it misses: writes by other instances, and rows re-stamped externally while
+    still completely empty. Both are corrected when it reseeds after `max_age` seconds.
+    """
+
+    def __init__(self, io: Any, max_age: float = 3600.0) -> None:
+        self.io = io
+        self.max_age = max_age
+        self.value: Optional[int] = None
+        self.as_of: Optional[datetime] = None
+        self._seeded = 0.0
+        self._lock = threading.Lock()
+
+    def written(self, n: int) -> None:
+        with self._lock:
+            if self.value is not None:
+                self.value = max(0, self.value - n)
+
+    def exact(self) -> Dict[str, Any]:
+        as_of = datetime.now(timezone.utc)
+        value = self.io.count_pending()
+        with self._lock:
+            self.value, self.as_of, self._seeded = value, as_of, time.monotonic()
+        return self._view(approximate=False)
+
+    def get(self) -> Dict[str, Any]:
+        if self.value is None or time.monotonic() - self._seeded > self.max_age:
+            return self.exact()
+        if getattr(self.io, "change_column", None):
+            as_of = datetime.now(timezone.utc)
+            new = self.io.count_pending(changed_since=self.as_of, empty_only=True)
+            with self._lock:
+                self.value = (self.value or 0) + new
+                self.as_of = as_of
+        return self._view(approximate=True)
+
+    def _view(self, approximate: bool) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": self.value,
+                "approximate": approximate,
+                "as_of": self.as_of.isoformat() if self.as_of else None,
+                "exact_age_seconds": round(time.monotonic() - self._seeded, 1),
+            }
@@ -1,7 +1,12 @@
 # file: src/venue_enricher/io_bigquery.py
+"""
+Functional API kept for existing callers; delegates to the shared bq_io layer.
+Why: one pooled client and one set of fetch/write semantics for every caller.
+"""
 from __future__ import annotations
 from typing import Any, Dict, List
-from google.cloud import bigquery as bq
+
+from .bq_io import get_io
 
 
 def _table(project_id: str, dataset_id: str, table_id: str) -> str:
@@ -10,24 +15,7 @@ def _table(project_id: str, dataset_id: str, table_id: str) -> str:
 
 def fetch_rows(project_id: str, dataset_id: str, table_id: str, limit: int) -> List[Dict[str, Any]]:
     """Return rows needing enrichment. Why: pull only fields useful for GPT + key."""
-    client = bq.Client(project=project_id)
-    sql = f"""
-    SELECT
-      id, name, alt_name, website_url, domain, linkedin_url, phone
-    FROM `{_table(project_id, dataset_id, table_id)}`
-    WHERE enrichment_status = 'OK' AND (city IS NULL OR country IS NULL)
-    LIMIT @limit
-    """
-    job = client.query(
-        sql,
-        job_config=bq.QueryJobConfig(
-            query_parameters=[bq.ScalarQueryParameter("limit", "INT64", limit)]
-        ),
-    )
-    rows: List[Dict[str, Any]] = []
-    for row in job.result():
-        rows.append({k: row[k] for k in row.keys()})
-    return rows
+    return get_io(project_id, dataset_id, table_id).fetch_rows(limit=limit)
 
 
 def update_locations(
@@ -37,36 +25,8 @@ def update_locations(
     updates: List[Dict[str, Any]],
 ) -> int:
     """
-    Update city/country using a single DML statement with an array-of-struct param.
-    Why: ensures `id` (STRING) matches correctly and returns *actual* affected rows.
+    Set city/country (as given, blanks included) and last_updated in one UNNEST
+    UPDATE; returns *actual* affected rows.
+    Why: existing callers rely on these unconditional writes; only the client is shared.
     """
-    if not updates:
-        return 0
-
-    # Build (id, city, country) tuples; force id to STRING
-    values = [(str(u["id"]), u.get("city"), u.get("country")) for u in updates]
-
-    client = bq.Client(project=project_id)
-    job_config = bq.QueryJobConfig(
-        query_parameters=[
-            bq.ArrayQueryParameter(
-                "rows",
-                "STRUCT<id STRING, city STRING, country STRING>",
-                values,
-            )
-        ]
-    )
-
-    sql = f"""
-    UPDATE `{_table(project_id, dataset_id, table_id)}` T
-    SET
-      T.city = R.city,
-      T.country = R.country,
-      T.last_updated = CURRENT_TIMESTAMP()
-    FROM UNNEST(@rows) AS R
-    WHERE T.id = R.id
-    """
-
-    job = client.query(sql, job_config=job_config)
-    job.result()  # wait for completion
-    return int(job.num_dml_affected_rows or 0)
+    return get_io(project_id, dataset_id, table_id).assign_locations(updates)
@@ -0,0 +1,193 @@
+# file: src/venue_enricher/jobs.py
+from __future__ import annotations
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+RunFn = Callable[[Dict[str, Any], Callable[..., None]], None]
+
+
+class JobStore:
+    """
+    SQLite-backed job state: params, resume cursor, committed and live counters.
+    Why: a restarted instance resumes a job from its last checkpoint.
+    """
+
+    def __init__(self, path: str = "/tmp/jobs.sqlite") -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    cursor TEXT,
+                    counters TEXT NOT NULL,
+                    live TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+            """)
+
+    def create(self, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO jobs(id,status,params,counters,created_at,updated_at) "
+                "VALUES (?,?,?,?,?,?)",
+                (job_id, "queued", json.dumps(params), "{}", now, now),
+            )
+        return job_id
+
+    def mark_running(self, job_id: str) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status='running', started_at=COALESCE(started_at, ?), "
+                "updated_at=? WHERE id=?",
+                (now, now, job_id),
+            )
+
+    def checkpoint(
+        self,
+        job_id: str,
+        cursor: Optional[str],
+        counters: Dict[str, int],
+        live: Optional[Dict[str, int]] = None,
+    ) -> None:
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET cursor=?, counters=?, live=?, updated_at=? WHERE id=?",
+                (cursor, json.dumps(counters), json.dumps(live or counters), time.time(), job_id),
+            )
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "UPDATE jobs SET status=?, error=?, updated_at=?, finished_at=? WHERE id=?",
+                (status, error, now, now, job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            cur = self.conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,))
+            r = cur.fetchone()
+            cols = [c[0] for c in cur.description]
+        if r is None:
+            return None
+        job = dict(zip(cols, r))
+        job["params"] = json.loads(job["params"])
+        job["counters"] = json.loads(job["counters"])
+        job["live"] = json.loads(job["live"]) if job["live"] else dict(job["counters"])
+        if job["started_at"]:
+            end = job["finished_at"] or time.time()
+            elapsed = max(1e-6, end - job["started_at"])
+            job["rows_per_sec"] = round(job["live"].get("enriched", 0) / elapsed, 2)
+        return job
+
+    def unfinished(self) -> List[str]:
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued','running') ORDER BY created_at"
+            )
+            return [r[0] for r in cur.fetchall()]
+
+
+class JobRunner:
+    """
+    Background worker threads executing jobs from a queue.
+    `run_fn(job, checkpoint)` does the work; `checkpoint(cursor, counters, live=None)`
+    persists progress. A job that raises is marked failed with the error text.
+    Threads run between `start()` and `stop()`; jobs submitted before start wait in the queue.
+    """
+
+    def __init__(self, store: JobStore, run_fn: RunFn, workers: int = 1) -> None:
+        self.store = store
+        self.run_fn = run_fn
+        self.workers = max(1, workers)
+        self._q: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._queued: set = set()
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            self._threads = [
+                threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for t in self._threads:
+            t.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Workers exit after their current job; unfinished jobs resume on the next start."""
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._q.put(None)
+        for t in threads:
+            t.join(timeout)
+
+    def _enqueue(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._queued:
+                return
+            self._queued.add(job_id)
+        self._q.put(job_id)
+
+    def submit(self, params: Dict[str, Any]) -> str:
+        job_id = self.store.create(params)
+        self._enqueue(job_id)
+        return job_id
+
+    def resume(self) -> List[str]:
+        """Re-enqueue queued/running jobs left by a previous process."""
+        ids = self.store.unfinished()
+        for job_id in ids:
+            self._enqueue(job_id)
+        return ids
+
+    def _worker(self) -> None:
+        while True:
+            job_id = self._q.get()
+            if job_id is None:
+                return
+            try:
+                self._execute(job_id)
+            finally:
+                with self._lock:
+                    self._queued.discard(job_id)
+
+    def _execute(self, job_id: str) -> None:
+        job = self.store.get(job_id)
+        if job is None:
+            return
+        self.store.mark_running(job_id)
+
+        def _checkpoint(
+            cursor: Optional[str],
+            counters: Dict[str, int],
+            live: Optional[Dict[str, int]] = None,
+        ) -> None:
+            self.store.checkpoint(job_id, cursor, counters, live)
+
+        try:
+            self.run_fn(job, _checkpoint)
+        except Exception as exc:  # noqa: BLE001
+            self.store.finish(job_id, "failed", f"{type(exc).__name__}: {exc}")
+            return
+        self.store.finish(job_id, "done")
@@ -0,0 +1,315 @@
+# file: src/venue_enricher/leases.py
+"""
+Time-limited leases on hash shards of the pending set.
+Why: every scheduler tick / Cloud Run instance claims a shard nobody else
+holds, so instances scale out without reading or MERGE-ing the same rows.
+A lease also carries the shard's keyset cursor, so whichever instance takes
+the shard next resumes where the last one stopped.
+
+Stores: SQLiteLeaseStore (single host, tests) and BigQueryLeaseStore (shared
+by all instances). Both expose acquire / renew / release.
+"""
+from __future__ import annotations
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, List, NamedTuple, Optional, Set, Tuple
+
+
+class Lease(NamedTuple):
+    scope: str
+    shard: int
+    num_shards: int
+    owner: str
+    cursor: Optional[str]
+
+
+class LeaseLost(RuntimeError):
+    """Renewal failed: another owner may now hold the shard."""
+
+
+def new_owner() -> str:
+    """Unique per invocation, so overlapping runs in one instance do not share a lease."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+
+class SQLiteLeaseStore:
+    """Lease table in SQLite; BEGIN IMMEDIATE makes acquire atomic across processes."""
+
+    def __init__(self, path: str = "/tmp/leases.sqlite") -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS leases (
+                    scope TEXT NOT NULL,
+                    num_shards INTEGER NOT NULL,
+                    shard INTEGER NOT NULL,
+                    owner TEXT,
+                    expires_at REAL NOT NULL DEFAULT 0,
+                    cursor TEXT,
+                    released_at REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (scope, num_shards, shard)
+                )
+            """)
+
+    def acquire(self, scope: str, num_shards: int, owner: str, ttl: float) -> Optional[Lease]:
+        """Claim the free (or expired) shard that was released longest ago."""
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO leases(scope, num_shards, shard) VALUES (?, ?, ?)",
+                    [(scope, num_shards, s) for s in range(num_shards)],
+                )
+                row = self.conn.execute(
+                    "SELECT shard, cursor FROM leases WHERE scope=? AND num_shards=? AND expires_at < ? "
+                    "ORDER BY released_at, shard LIMIT 1",
+                    (scope, num_shards, now),
+                ).fetchone()
+                if row is None:
+                    self.conn.execute("COMMIT")
+                    return None
+                self.conn.execute(
+                    "UPDATE leases SET owner=?, expires_at=? WHERE scope=? AND num_shards=? AND shard=?",
+                    (owner, now + ttl, scope, num_shards, row[0]),
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return Lease(scope, row[0], num_shards, owner, row[1])
+
+    def renew(self, lease: Lease, ttl: float) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self.conn.execute(
+                "UPDATE leases SET expires_at=? "
+                "WHERE scope=? AND num_shards=? AND shard=? AND owner=? AND expires_at >= ?",
+                (now + ttl, lease.scope, lease.num_shards, lease.shard, lease.owner, now),
+            )
+        return cur.rowcount == 1
+
+    def release(self, lease: Lease, cursor: Optional[str]) -> None:
+        with self._lock:
+            self.conn.execute(
+                "UPDATE leases SET owner=NULL, expires_at=0, cursor=?, released_at=? "
+                "WHERE scope=? AND num_shards=? AND shard=? AND owner=?",
+                (cursor, time.time(), lease.scope, lease.num_shards, lease.shard, lease.owner),
+            )
+
+
+def _concurrent_update(exc: BaseException) -> bool:
+    """BigQuery's "Could not serialize access ... due to concurrent update" DML conflict."""
+    return "concurrent update" in str(exc).lower()
+
+
+class BigQueryLeaseStore:
+    """
+    Lease table in BigQuery (`<table>_enrich_leases`), shared by all instances.
+    A claim is a conditional UPDATE: exactly one affected row means we won;
+    a concurrent-DML conflict counts as losing that shard and we try the next.
+    Shard rows are seeded once per (scope, num_shards) per process, and only
+    when a SELECT finds some missing.
+    """
+
+    def __init__(self, project_id: str, dataset_id: str, table_id: str, location: Optional[str] = None,
+                 client: Any = None) -> None:
+        self.project_id = project_id
+        self.ref = f"{project_id}.{dataset_id}.{table_id}_enrich_leases"
+        self.location = location
+        self._client = client
+        self._ready = False
+        self._seeded: Set[Tuple[str, int]] = set()
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            from .bq_io import get_client
+
+            self._client = get_client(self.project_id)
+        return self._client
+
+    def _query(self, sql: str, **params: Any) -> Any:
+        from google.cloud import bigquery
+
+        types = {int: "INT64", float: "FLOAT64", str: "STRING"}
+        job = self.client.query(
+            sql,
+            job_config=bigquery.QueryJobConfig(
+                query_parameters=[
+                    bigquery.ScalarQueryParameter(k, types[type(v)] if v is not None else "STRING", v)
+                    for k, v in params.items()
+                ],
+                use_query_cache=False,
+            ),
+            location=self.location,
+        )
+        job.result()
+        return job
+
+    def _ensure(self, scope: str, num_shards: int) -> bool:
+        """
+        Make sure the table and this scope's shard rows exist; False when another
+        instance's seeding MERGE conflicted with ours (retried on the next acquire).
+        Why: DML on one table is serialized, so a MERGE per acquire both costs a job
+        and collides when instances start together.
+        """
+        if (scope, num_shards) in self._seeded:
+            return True
+        if not self._ready:
+            self._query(f"""
+                CREATE TABLE IF NOT EXISTS `{self.ref}` (
+                  scope STRING, num_shards INT64, shard INT64, owner STRING,
+                  expires_at TIMESTAMP, cursor STRING, released_at TIMESTAMP
+                )
+            """)
+            self._ready = True
+        have = list(self._query(f"""
+            SELECT COUNT(*) FROM `{self.ref}` WHERE scope = @scope AND num_shards = @n
+        """, scope=scope, n=num_shards).result())
+        if have and have[0][0] >= num_shards:
+            self._seeded.add((scope, num_shards))
+            return True
+        try:
+            self._query(f"""
+                MERGE `{self.ref}` T
+                USING (
+                  SELECT @scope AS scope, @n AS num_shards, s AS shard
+                  FROM UNNEST(GENERATE_ARRAY(0, @n - 1)) AS s
+                ) S
+                ON T.scope = S.scope AND T.num_shards = S.num_shards AND T.shard = S.shard
+                WHEN NOT MATCHED THEN INSERT (scope, num_shards, shard, expires_at, released_at)
+                VALUES (S.scope, S.num_shards, S.shard, TIMESTAMP_SECONDS(0), TIMESTAMP_SECONDS(0))
+                """, scope=scope, n=num_shards)
+        except Exception as exc:  # noqa: BLE001
+            if not _concurrent_update(exc):
+                raise
+            return False
+        self._seeded.add((scope, num_shards))
+        return True
+
+    def acquire(self, scope: str, num_shards: int, owner: str, ttl: float) -> Optional[Lease]:
+        from .bq_io import _affected_rows
+
+        if not self._ensure(scope, num_shards):
+            return None
+        free = list(self._query(f"""
+            SELECT shard, cursor FROM `{self.ref}`
+            WHERE scope = @scope AND num_shards = @n AND expires_at < CURRENT_TIMESTAMP()
+            ORDER BY released_at, shard
+        """, scope=scope, n=num_shards).result())
+        for row in free:
+            try:
+                job = self._query(f"""
+                    UPDATE `{self.ref}`
+                    SET owner = @owner,
+                        expires_at = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL @ttl SECOND)
+                    WHERE scope = @scope AND num_shards = @n AND shard = @shard
+                      AND expires_at < CURRENT_TIMESTAMP()
+                """, owner=owner, ttl=int(ttl), scope=scope, n=num_shards, shard=int(row[0]))
+            except Exception as exc:  # noqa: BLE001
+                if not _concurrent_update(exc):
+                    raise
+                continue  # someone else is claiming this shard
+            if _affected_rows(job) == 1:
+                return Lease(scope, int(row[0]), num_shards, owner, row[1])
+        return None
+
+    def renew(self, lease: Lease, ttl: float) -> bool:
+        from .bq_io import _affected_rows
+
+        job = self._query(f"""
+            UPDATE `{self.ref}`
+            SET expires_at = TIMESTAMP_ADD(CURRENT_TIMESTAMP(), INTERVAL @ttl SECOND)
+            WHERE scope = @scope AND num_shards = @n AND shard = @shard AND owner = @owner
+              AND expires_at >= CURRENT_TIMESTAMP()
+        """, ttl=int(ttl), scope=lease.scope, n=lease.num_shards, shard=lease.shard, owner=lease.owner)
+        return _affected_rows(job) == 1
+
+    def release(self, lease: Lease, cursor: Optional[str]) -> None:
+        try:
+            self._query(f"""
+                UPDATE `{self.ref}`
+                SET owner = NULL, expires_at = TIMESTAMP_SECONDS(0), cursor = @cursor,
+                    released_at = CURRENT_TIMESTAMP()
+                WHERE scope = @scope AND num_shards = @n AND shard = @shard AND owner = @owner
+            """, cursor=cursor, scope=lease.scope, n=lease.num_shards, shard=lease.shard, owner=lease.owner)
+        except Exception as exc:  # noqa: BLE001
+            # Why: the lease then simply expires; the next holder resumes from the older cursor.
+            if not _concurrent_update(exc):
+                raise
+
+
+class LeaseKeeper:
+    """
+    Holds one lease: renews it every ttl/3 on a background thread, and
+    releases it (saving the cursor) on exit. The lease counts as lost once a
+    renewal is refused, or once no renewal has succeeded for `ttl - margin`
+    seconds (store outage, hung call). `check()` raises LeaseLost then; call
+    it before every write or commit so the holder never writes over another owner.
+    """
+
+    def __init__(self, store: Any, lease: Lease, ttl: float, margin: Optional[float] = None) -> None:
+        self.store = store
+        self.lease = lease
+        self.ttl = ttl
+        # Why: stop while the stored lease is still ours, not at the instant it expires.
+        self.margin = ttl / 6 if margin is None else margin
+        self.cursor = lease.cursor
+        self.lost = threading.Event()
+        self._last_ok = time.monotonic()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._renew, name="lease-renew", daemon=True)
+
+    def _expired(self) -> bool:
+        return time.monotonic() - self._last_ok >= self.ttl - self.margin
+
+    def _renew(self) -> None:
+        while not self._done.wait(self.ttl / 3):
+            # Why: the stored expiry counts from when the renewal ran, so time it from the send.
+            sent = time.monotonic()
+            try:
+                ok = self.store.renew(self.lease, self.ttl)
+            except Exception:  # noqa: BLE001 - a transient failure is retried next tick...
+                if self._expired():  # ...until the lease may have run out
+                    self.lost.set()
+                    return
+                continue
+            if not ok:
+                self.lost.set()
+                return
+            self._last_ok = sent
+
+    def check(self) -> None:
+        if self.lost.is_set() or self._expired():
+            self.lost.set()
+            raise LeaseLost(f"lease on shard {self.lease.shard}/{self.lease.num_shards} lost")
+
+    def __enter__(self) -> "LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._done.set()
+        self._thread.join(timeout=5.0)
+        if not self.lost.is_set():
+            self.store.release(self.lease, self.cursor)
+
+
+def lease_store(backend: str, path: str, project_id: str = "", dataset_id: str = "",
+                table_id: str = "", location: Optional[str] = None) -> Any:
+    """'bigquery' -> BigQueryLeaseStore shared by all instances; anything else -> SQLite at `path`."""
+    if backend == "bigquery":
+        return BigQueryLeaseStore(project_id, dataset_id, table_id, location)
+    return SQLiteLeaseStore(path)
+
+
+__all__: List[str] = [
+    "Lease", "LeaseKeeper", "LeaseLost", "SQLiteLeaseStore", "BigQueryLeaseStore", "lease_store", "new_owner",
+]
@@ -0,0 +1,219 @@
+# file: src/venue_enricher/metrics.py
+"""
+In-process metrics rendered in the Prometheus text format.
+Why: token spend, model latency, BigQuery job time and hit rates per run
+without adding a metrics client dependency. One process-wide REGISTRY;
+`snapshot()` / `delta()` give per-run numbers for the /enrich response.
+"""
+from __future__ import annotations
+import os
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0)
+
+
+def _labels(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _fmt(name: str, key: LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return name
+    body = ",".join(f'{k}="{v}"' for k, v in pairs)
+    return f"{name}{{{body}}}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = name
+        self.help = help_text
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, n: float = 1.0, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + n
+
+    def samples(self) -> List[Tuple[str, float]]:
+        with self._lock:
+            return [(_fmt(self.name, k), v) for k, v in sorted(self.values.items())]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        return lines + [f"{s} {v:g}" for s, v in self.samples()]
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values: Dict[LabelKey, List[float]] = {}  # bucket counts..., +Inf, sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = _labels(labels)
+        with self._lock:
+            row = self.values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += 1
+            row[-1] += value
+
+    def samples(self) -> List[Tuple[str, float]]:
+        out: List[Tuple[str, float]] = []
+        with self._lock:
+            for key, row in sorted(self.values.items()):
+                for bound, n in zip(self.buckets, row):
+                    out.append((_fmt(f"{self.name}_bucket", key, [("le", f"{bound:g}")]), n))
+                out.append((_fmt(f"{self.name}_bucket", key, [("le", "+Inf")]), row[-2]))
+                out.append((_fmt(f"{self.name}_count", key), row[-2]))
+                out.append((_fmt(f"{self.name}_sum", key), row[-1]))
+        return out
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        return lines + [f"{s} {v:g}" for s, v in self.samples()]
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, object] = {}
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text))  # type: ignore[return-value]
+
+    def histogram(self, name: str, help_text: str) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())  # type: ignore[attr-defined]
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, float]:
+        out: Dict[str, float] = {}
+        for metric in self.metrics.values():
+            out.update(metric.samples())  # type: ignore[attr-defined]
+        return out
+
+
+REGISTRY = Registry()
+
+MODEL_TOKENS = REGISTRY.counter("venue_model_tokens_total", "Tokens reported by the API (usage).")
+MODEL_COST = REGISTRY.counter("venue_model_cost_usd_total", "Estimated spend from MODEL_PRICES.")
+MODEL_REQUESTS = REGISTRY.counter("venue_model_requests_total", "Chat completions by outcome.")
+MODEL_LATENCY = REGISTRY.histogram("venue_model_request_seconds", "Chat completion latency.")
+PROMPT_CHARS = REGISTRY.counter(
+    "venue_prompt_chars_total", "User prompt characters per builder (full vs compact)."
+)
+BQ_SECONDS = REGISTRY.histogram("venue_bq_job_seconds", "BigQuery job duration by operation.")
+ROWS = REGISTRY.counter("venue_rows_total", "Unique venue keys by where the answer came from.")
+
+# USD per 1M tokens: "model:input:output,..."; override with MODEL_PRICES.
+DEFAULT_PRICES = "gpt-4o-mini:0.15:0.60,gpt-4o:2.50:10.00,gpt-4.1-mini:0.40:1.60,gpt-4.1:2.00:8.00"
+
+
+def parse_prices(spec: str) -> Dict[str, Tuple[float, float]]:
+    out: Dict[str, Tuple[float, float]] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, inp, outp = part.rsplit(":", 2)
+        out[model] = (float(inp), float(outp))
+    return out
+
+
+PRICES = parse_prices(os.getenv("MODEL_PRICES", DEFAULT_PRICES))
+
+
+def record_usage(model: str, prompt_tokens: int, completion_tokens: int, seconds: float) -> None:
+    MODEL_REQUESTS.inc(model=model, outcome="ok")
+    MODEL_LATENCY.observe(seconds, model=model)
+    MODEL_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    MODEL_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    price = PRICES.get(model)
+    if price is not None:
+        MODEL_COST.inc((prompt_tokens * price[0] + completion_tokens * price[1]) / 1e6, model=model)
+
+
+# Row source -> enrich_batch stats key.
+SOURCES = (
+    ("cache", "cache_hits"),
+    ("resolver", "resolver_hits"),
+    ("similar", "similar_hits"),
+    ("joined", "joined_in_flight"),
+    ("model", "model_keys"),
+    ("failed", "model_errors"),
+)
+
+
+def record_batch(stats: Dict[str, int]) -> None:
+    """Fold one enrich_batch stats dict into the row-source counter."""
+    for source, key in SOURCES:
+        if stats.get(key):
+            ROWS.inc(stats[key], source=source)
+
+
+def run_usage(stats: Dict[str, int], models: List[str]) -> Dict[str, object]:
+    """
+    Tokens, cost, requests and hit rates of one run, from its own enrich_batch stats
+    (`tier<i>_*` keys, tier i answered by models[i]).
+    Why: registry deltas also hold what concurrent runs spent in the meantime.
+    """
+    prompt = completion = 0
+    cost = 0.0
+    for i, model in enumerate(models):
+        p, c = stats.get(f"tier{i}_prompt_tokens", 0), stats.get(f"tier{i}_completion_tokens", 0)
+        prompt, completion = prompt + p, completion + c
+        price = PRICES.get(model)
+        if price is not None:
+            cost += (p * price[0] + c * price[1]) / 1e6
+    unique = sum(stats.get(key, 0) for source, key in SOURCES if source != "failed")
+    return {
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "cost_usd": round(cost, 6),
+        "model_requests": stats.get("model_requests", 0),
+        "hit_rate": {
+            source: round(stats.get(key, 0) / unique, 3) if unique else 0.0 for source, key in SOURCES
+        },
+    }
+
+
+def delta(before: Dict[str, float], after: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    after = REGISTRY.snapshot() if after is None else after
+    return {k: v - before.get(k, 0.0) for k, v in after.items() if v != before.get(k, 0.0)}
+
+
+def summarize(d: Dict[str, float]) -> Dict[str, object]:
+    """Per-run view of a delta(): tokens, cost, latency and hit rates."""
+    def total(prefix: str, **match: str) -> float:
+        want = [f'{k}="{v}"' for k, v in match.items()]
+        return sum(v for k, v in d.items() if k.startswith(prefix + "{") and all(w in k for w in want))
+
+    requests = total("venue_model_request_seconds_count")
+    # "failed" keys are also counted under "model", so they stay out of the denominator.
+    unique = sum(
+        v for k, v in d.items() if k.startswith("venue_rows_total{") and 'source="failed"' not in k
+    )
+    full = total("venue_prompt_chars_total", builder="full")
+    compact = total("venue_prompt_chars_total", builder="compact")
+    return {
+        "prompt_tokens": int(total("venue_model_tokens_total", kind="prompt")),
+        "completion_tokens": int(total("venue_model_tokens_total", kind="completion")),
+        "cost_usd": round(total("venue_model_cost_usd_total"), 6),
+        "model_requests": int(requests),
+        "model_avg_seconds": round(total("venue_model_request_seconds_sum") / requests, 3) if requests else 0.0,
+        "bq_seconds": round(total("venue_bq_job_seconds_sum"), 3),
+        "hit_rate": {
+            src: round(total("venue_rows_total", source=src) / unique, 3) if unique else 0.0
+            for src in ("cache", "resolver", "similar", "joined", "model", "failed")
+        },
+        "compact_prompt_saved_pct": round(100.0 * (1 - compact / full), 1) if full else 0.0,
+    }
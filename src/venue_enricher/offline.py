@@ -0,0 +1,361 @@
+# file: src/venue_enricher/offline.py
+"""
+Offline enrichment of a local table export (Parquet, CSV or JSONL).
+Why: reprocessing a whole table through /enrich costs a query per page and
+DML jobs per flush against live BigQuery. Here the export is read in chunks
+(Parquet memory-mapped), cache / gazetteer / heuristic stages run on every
+core in a process pool, only unresolved rows reach the model, and results
+go to one Parquet file that is applied with a single LOAD DATA + MERGE job.
+
+    python -m venue_enricher.offline export.parquet --out results.parquet \\
+        --merge-uri gs://bucket/results.parquet
+"""
+from __future__ import annotations
+import json
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterator, Optional, Tuple
+
+from .batch import VENUE_COLUMNS, ResultBatch, VenueBatch
+from .cache import EnrichmentCache, TieredCache
+from .dedup import group_by_key, is_solo
+from .enricher import _fallback_extract, _row_key
+from .resolver import PreResolver
+
+FORMATS = ("parquet", "csv", "jsonl")
+RESULT_COLUMNS = ("id", "city", "country")
+
+
+def detect_format(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip(".")
+    fmt = {"pq": "parquet", "json": "jsonl", "ndjson": "jsonl"}.get(ext, ext)
+    if fmt not in FORMATS:
+        raise ValueError(f"cannot tell the format of {path!r}; pass one of {FORMATS}")
+    return fmt
+
+
+def read_chunks(path: str, chunk_rows: int = 50000, fmt: Optional[str] = None) -> Iterator[VenueBatch]:
+    """
+    VenueBatches of at most `chunk_rows` rows from an export; columns other than
+    VENUE_COLUMNS are never read, missing ones are None.
+    """
+    fmt = fmt or detect_format(path)
+    if fmt == "jsonl":
+        page = VenueBatch()
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    page.append(json.loads(line))
+                    if len(page) >= chunk_rows:
+                        yield page
+                        page = VenueBatch()
+        if page:
+            yield page
+        return
+
+    import pyarrow as pa
+
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        # Why: pages are decoded straight from the mapping, without reading the file into memory.
+        pf = pq.ParquetFile(pa.memory_map(path))
+        present = [c for c in VENUE_COLUMNS if c in pf.schema_arrow.names]
+        batches = pf.iter_batches(batch_size=chunk_rows, columns=present)
+    else:
+        from pyarrow import csv
+
+        batches = csv.open_csv(
+            path,
+            read_options=csv.ReadOptions(block_size=16 << 20),
+            convert_options=csv.ConvertOptions(
+                column_types={c: pa.string() for c in VENUE_COLUMNS},
+                include_columns=list(VENUE_COLUMNS),
+                include_missing_columns=True,
+            ),
+        )
+    for rb in batches:
+        for start in range(0, rb.num_rows, chunk_rows):
+            part = rb.slice(start, chunk_rows)
+            # Why: numeric ids / phones in an export still reach the resolver as text.
+            yield VenueBatch.from_columns({
+                name: (col if col.type == pa.string() else col.cast(pa.string())).to_pylist()
+                for name, col in zip(part.schema.names, part.columns)
+            })
+
+
+# --- Process-pool stage ---
+
+_cache: Optional[EnrichmentCache] = None
+_resolver: Optional[PreResolver] = None
+_heuristic = False
+
+
+def _init_worker(cache_kwargs: Optional[Dict[str, Any]], min_confidence: Optional[float], heuristic: bool) -> None:
+    global _cache, _resolver, _heuristic
+    # Why: one SQLite connection per process; WAL lets every worker read while the parent writes.
+    _cache = EnrichmentCache(**cache_kwargs) if cache_kwargs else None
+    _resolver = PreResolver(min_confidence) if min_confidence is not None else None
+    _heuristic = heuristic
+
+
+def resolve_chunk(chunk: VenueBatch) -> Tuple[ResultBatch, VenueBatch, Dict[str, int]]:
+    """
+    Worker side: answer what the cache, the gazetteer resolver and (opt-in) the
+    address heuristic can. Returns (results, unresolved rows, counters).
+    """
+    from .gpt_client import normalize_country
+
+    groups = group_by_key(chunk, _row_key)
+    stats = {"rows": len(chunk), "unique": len(groups)}
+    results = ResultBatch()
+
+    def _answer(key: str, city: Optional[str], country: Optional[str]) -> None:
+        for row in groups.pop(key):
+            results.append(row.get("id"), city, country)
+
+    if _cache is not None:
+        hits = _cache.get_many([k for k in groups if not is_solo(k)])
+        stats["cache_hits"] = len(hits)
+        for key, hit in hits.items():
+            _answer(key, hit[0], hit[1])
+
+    if _resolver is not None and groups:
+        keys = list(groups)
+        resolved = _resolver.resolve_batch([groups[k][0] for k in keys])
+        stats["resolver_hits"] = sum(1 for r in resolved if r is not None)
+        for key, res in zip(keys, resolved):
+            if res is not None:
+                _answer(key, res.city, res.country)
+
+    if _heuristic and groups:
+        taken = 0
+        for key in list(groups):
+            first = groups[key][0]
+            city, country = _fallback_extract(first.get("name") or "", first.get("address") or "")
+            country = normalize_country(country or "")
+            # Why: a half answer is no better than leaving the row for the model.
+            if city and country:
+                _answer(key, city, country)
+                taken += 1
+        stats["heuristic_hits"] = taken
+
+    unresolved = VenueBatch(chunk.columns)
+    for group in groups.values():
+        for row in group:
+            unresolved.append(row)
+    stats["unresolved"] = len(unresolved)
+    return results, unresolved, stats
+
+
+# --- Output ---
+
+class ParquetSink:
+    """
+    {id, city, country} Parquet writer; thread-safe, buffers to `row_group_rows`.
+    The file is what BigQueryIO.merge_parquet loads.
+    """
+
+    def __init__(self, path: str, row_group_rows: int = 100000) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self.schema = pa.schema([
+            pa.field("id", pa.string(), nullable=False),
+            pa.field("city", pa.string()),
+            pa.field("country", pa.string()),
+        ])
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        self.row_group_rows = row_group_rows
+        self._buffer = ResultBatch()
+        self._lock = threading.Lock()
+        self.rows = 0
+
+    def write(self, results: ResultBatch) -> int:
+        with self._lock:
+            self._buffer.extend(results)
+            if len(self._buffer) >= self.row_group_rows:
+                self._flush()
+            self.rows += len(results)
+        return len(results)
+
+    def _flush(self) -> None:
+        if self._buffer:
+            buf, pa = self._buffer, self._pa
+            self._writer.write_batch(
+                pa.record_batch([pa.array(buf.ids), pa.array(buf.cities), pa.array(buf.countries)], schema=self.schema)
+            )
+            self._buffer = ResultBatch()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._writer.close()
+
+
+# --- Driver ---
+
+def run_offline(
+    path: str,
+    sink: ParquetSink,
+    enrich: Any,
+    fmt: Optional[str] = None,
+    chunk_rows: int = 50000,
+    batch_size: int = 200,
+    workers: int = 0,
+    pipeline_workers: int = 2,
+    cache_kwargs: Optional[Dict[str, Any]] = None,
+    min_confidence: Optional[float] = 0.85,
+    heuristic: bool = False,
+) -> Dict[str, Any]:
+    """
+    Chunks -> process pool (cache, resolver, heuristic) -> sink; unresolved rows
+    are regrouped into `batch_size` pages for `enrich` (a VenueBatch -> ResultBatch
+    callable, normally enrich_batch) on the usual reader/enricher/writer pipeline.
+    """
+    from .pipeline import run_pipeline
+
+    workers = workers or os.cpu_count() or 1
+    pool_stats: Dict[str, int] = {}
+    started = time.monotonic()
+    # Why: spawn, not fork; the parent may already run the engine's event-loop thread.
+    with ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(cache_kwargs, min_confidence, heuristic),
+    ) as pool:
+
+        def _pages() -> Iterator[VenueBatch]:
+            in_flight: Deque[Future] = deque()
+            todo: Optional[VenueBatch] = None
+
+            def _take(fut: Future) -> Iterator[VenueBatch]:
+                nonlocal todo
+                results, unresolved, stats = fut.result()
+                sink.write(results)
+                for k, v in stats.items():
+                    pool_stats[k] = pool_stats.get(k, 0) + v
+                if todo is None:
+                    todo = unresolved
+                else:
+                    todo.extend(unresolved)
+                while todo is not None and len(todo) >= batch_size:
+                    yield todo.slice(0, batch_size)
+                    todo = todo.slice(batch_size, len(todo)) or None
+
+            for chunk in read_chunks(path, chunk_rows, fmt):
+                in_flight.append(pool.submit(resolve_chunk, chunk))
+                # Why: bounds memory to a few chunks per worker however large the export.
+                while len(in_flight) >= 2 * workers:
+                    yield from _take(in_flight.popleft())
+            while in_flight:
+                yield from _take(in_flight.popleft())
+            if todo:
+                yield todo
+
+        pipeline = run_pipeline(
+            _pages(), enrich, sink.write, workers=pipeline_workers, flush_rows=batch_size, flush_seconds=1.0
+        )
+    sink.close()
+    seconds = time.monotonic() - started
+    return {
+        "rows": pool_stats.get("rows", 0),
+        "pool": pool_stats,
+        "model_rows": pipeline["fetched"],
+        "written": sink.rows,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(pool_stats.get("rows", 0) / seconds, 1) if seconds > 0 else 0.0,
+    }
+
+
+def main() -> None:  # pragma: no cover - operator entry point
+    import argparse
+
+    from .cascade import parse_tiers
+    from .config import Settings
+    from .enricher import enrich_batch
+
+    ap = argparse.ArgumentParser(description="Enrich a local Parquet/CSV/JSONL export offline")
+    ap.add_argument("input")
+    ap.add_argument("--out", required=True, help="Parquet file of id, city, country")
+    ap.add_argument("--format", choices=FORMATS, default=None, help="default: from the extension")
+    ap.add_argument("--chunk-rows", type=int, default=50000)
+    ap.add_argument("--workers", type=int, default=0, help="resolver processes (default: all cores)")
+    ap.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_SIZE", "200")))
+    ap.add_argument("--concurrency", type=int, default=int(os.getenv("CONCURRENCY", "8")))
+    ap.add_argument("--heuristic", action="store_true",
+                    help="accept the address heuristic when it yields both city and country")
+    ap.add_argument("--no-model", action="store_true", help="write only what the pool resolves")
+    ap.add_argument("--merge-uri", default="", help="gs:// URI: upload --out there and MERGE it")
+    ap.add_argument("--overwrite", action="store_true")
+    args = ap.parse_args()
+
+    model = os.environ.get("OPENAI_MODEL", "gpt-4o-mini")
+    tiers = parse_tiers(os.environ.get("MODEL_TIERS", ""), model)
+    style = os.environ.get("PROMPT_STYLE", "full")
+    version = os.environ.get("PROMPT_VERSION", Settings.prompt_version)
+    # Same namespace as the service, so answers are shared both ways.
+    cache_kwargs = {
+        "path": os.environ.get("CACHE_PATH", "/tmp/enrichment_cache.sqlite"),
+        "model": ">".join(t.model for t in tiers),
+        "prompt_version": version if style == "full" else f"{version}+{style}",
+        "ttl_seconds": float(os.environ.get("CACHE_TTL_SECONDS", "0")) or None,
+    }
+    cache = TieredCache(EnrichmentCache(**cache_kwargs), capacity=int(os.environ.get("LRU_CAPACITY", "10000")))
+    model_stats: Dict[str, int] = {}
+    stats_lock = threading.Lock()
+
+    def _enrich(rows: VenueBatch) -> ResultBatch:
+        if args.no_model:
+            return ResultBatch()
+        batch_stats: Dict[str, int] = {}
+        out = enrich_batch(
+            rows, model=model, concurrency=args.concurrency, cache=cache, stats=batch_stats,
+            pack_size=int(os.environ.get("PACK_SIZE", "1")), tiers=tiers,
+        )
+        with stats_lock:
+            for k, v in batch_stats.items():
+                model_stats[k] = model_stats.get(k, 0) + v
+        return out
+
+    use_resolver = os.environ.get("PRE_RESOLVER", "1") == "1"
+    out = run_offline(
+        args.input,
+        ParquetSink(args.out),
+        _enrich,
+        fmt=args.format,
+        chunk_rows=args.chunk_rows,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        pipeline_workers=int(os.environ.get("PIPELINE_WORKERS", "2")),
+        cache_kwargs=cache_kwargs,
+        min_confidence=float(os.environ.get("RESOLVER_MIN_CONFIDENCE", "0.85")) if use_resolver else None,
+        heuristic=args.heuristic,
+    )
+    cache.flush()
+    out["model"] = model_stats
+    if args.merge_uri:
+        from .bq_io import BigQueryIO
+        from .cache import GCSTier
+
+        GCSTier(args.merge_uri).push(args.out)
+        bq = BigQueryIO(
+            os.environ.get("PROJECT_ID", ""),
+            os.environ.get("DATASET_ID", ""),
+            os.environ.get("TABLE_ID", ""),
+            location=os.environ.get("BQ_LOCATION"),
+        )
+        out["updated"] = bq.merge_parquet(args.merge_uri, overwrite=args.overwrite)
+        out["bq_jobs"] = bq.pop_timings()
+    print(json.dumps({"event": "offline_done", **out}))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
@@ -0,0 +1,162 @@
+# file: src/venue_enricher/pipeline.py
+from __future__ import annotations
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# A page (VenueBatch or list of row dicts) in, a ResultBatch (or list) out; only len/extend are used.
+Rows = Any
+
+_DONE = object()
+
+
+class _Stop(Exception):
+    pass
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> None:
+    # Why: a bounded put must not hang forever once another stage has failed.
+    while True:
+        if stop.is_set():
+            raise _Stop()
+        try:
+            q.put(item, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+def run_pipeline(
+    pages: Iterable[Rows],
+    enrich: Callable[[Rows], Rows],
+    write: Callable[[Rows], int],
+    workers: int = 2,
+    queue_size: int = 2,
+    flush_rows: int = 1000,
+    flush_seconds: float = 10.0,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """
+    reader -> [bounded queue] -> enricher pool -> [bounded queue] -> writer.
+    Why: BigQuery reads, model calls and writes overlap, so throughput tracks
+    the slowest stage instead of the sum of all three. The reader prefetches
+    up to `queue_size` pages; the writer flushes on `flush_rows` or `flush_seconds`.
+    The writer runs on the calling thread; the first stage error is re-raised.
+    """
+    workers = max(1, workers)
+    in_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size))
+    out_q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, queue_size) + workers)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+    lock = threading.Lock()
+    stats: Dict[str, Any] = {"fetched": 0, "enriched": 0, "written": 0, "flushes": 0, "pages": 0}
+    started = time.monotonic()
+
+    def _fail(exc: BaseException) -> None:
+        with lock:
+            errors.append(exc)
+        stop.set()
+
+    def _reader() -> None:
+        try:
+            for page in pages:
+                if not page:
+                    continue
+                with lock:
+                    stats["fetched"] += len(page)
+                    stats["pages"] += 1
+                _put(in_q, page, stop)
+        except _Stop:
+            return
+        except BaseException as exc:  # noqa: BLE001
+            _fail(exc)
+        finally:
+            for _ in range(workers):
+                try:
+                    _put(in_q, _DONE, stop)
+                except _Stop:
+                    break
+
+    def _enricher() -> None:
+        try:
+            while True:
+                try:
+                    page = in_q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return
+                    continue
+                if page is _DONE:
+                    return
+                out = enrich(page)
+                with lock:
+                    stats["enriched"] += len(out)
+                _put(out_q, out, stop)
+        except _Stop:
+            return
+        except BaseException as exc:  # noqa: BLE001
+            _fail(exc)
+        finally:
+            try:
+                _put(out_q, _DONE, stop)
+            except _Stop:
+                pass
+
+    threads = [threading.Thread(target=_reader, name="pipeline-reader", daemon=True)]
+    threads += [
+        threading.Thread(target=_enricher, name=f"pipeline-enrich-{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+
+    buffer: Optional[Rows] = None
+    last_flush = time.monotonic()
+
+    def _flush() -> None:
+        nonlocal buffer, last_flush
+        if buffer:
+            affected = write(buffer)
+            with lock:
+                stats["written"] += affected
+                stats["flushes"] += 1
+            buffer = None
+            if on_progress is not None:
+                on_progress(dict(stats))
+        last_flush = time.monotonic()
+
+    finished = 0
+    try:
+        while finished < workers and not stop.is_set():
+            timeout = max(0.05, flush_seconds - (time.monotonic() - last_flush))
+            try:
+                item = out_q.get(timeout=timeout)
+            except queue.Empty:
+                _flush()
+                continue
+            if item is _DONE:
+                finished += 1
+                continue
+            # Why: the first result batch becomes the buffer; later ones append to it.
+            if buffer is None:
+                buffer = item
+            else:
+                buffer.extend(item)
+            if len(buffer) >= flush_rows or time.monotonic() - last_flush >= flush_seconds:
+                _flush()
+        if not errors:
+            _flush()
+    except BaseException as exc:  # noqa: BLE001
+        _fail(exc)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join(timeout=5.0)
+
+    if errors:
+        raise errors[0]
+    elapsed = time.monotonic() - started
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_sec"] = round(stats["enriched"] / elapsed, 2) if elapsed > 0 else 0.0
+    return stats
@@ -1,6 +1,8 @@
 # file: src/venue_enricher/prompts.py
 from __future__ import annotations
-from typing import Dict, Any
+import json
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
 
 SYSTEM_PROMPT = (
     "You extract a venue's physical city and country from noisy metadata. "
@@ -27,6 +29,7 @@ def build_user_prompt(payload: Dict[str, Any]) -> str:
     parts = [
         f"id: {payload.get('id','')}",
         f"name: {payload.get('name','')}",
+        f"address: {payload.get('address','')}",
         f"alt_name: {payload.get('alt_name','')}",
         f"website_url: {payload.get('website_url','')}",
         f"domain: {payload.get('domain','')}",
@@ -38,3 +41,147 @@ def build_user_prompt(payload: Dict[str, Any]) -> str:
         f"notes: {payload.get('notes','')}",
     ]
     return "\n".join(parts)
+
+
+# Every venue field the prompt builders send besides the id.
+PROMPT_FIELDS = (
+    "name", "address", "alt_name", "website_url", "domain", "linkedin_url",
+    "phone", "ticket_vendor", "ticket_vendor_source", "notes",
+)
+
+
+def _url_parts(value: str) -> Tuple[str, str]:
+    parts = urlsplit(value if "//" in value else f"//{value}")
+    host = (parts.hostname or "").lower()
+    return (host[4:] if host.startswith("www.") else host), parts.path.strip("/")
+
+
+def build_compact_user_prompt(payload: Dict[str, Any], with_id: bool = False) -> str:
+    """
+    Same signals as build_user_prompt, fewer tokens: empty fields are dropped,
+    website/domain collapse to one host and LinkedIn to its path.
+    Why: most rows fill 3-4 of the ten fields; labels of empty ones are pure cost.
+    """
+    lines: List[str] = [f"id: {payload.get('id', '')}"] if with_id else []
+    website = ""
+    for field in PROMPT_FIELDS:
+        value = str(payload.get(field) or "").strip()
+        if not value:
+            continue
+        if field == "website_url":
+            website = value = _url_parts(value)[0]
+            field = "website"
+        elif field == "domain":
+            value = _url_parts(value)[0]
+            if value == website:
+                continue
+        elif field == "linkedin_url":
+            value = _url_parts(value)[1] or value
+            field = "linkedin"
+        if value:
+            lines.append(f"{field}: {value}")
+    return "\n".join(lines)
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for English/Latin text; good enough for budgeting."""
+    return (len(text) + 3) // 4
+
+
+def prompt_savings(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Estimated user-prompt tokens of the full vs compact builder over `rows`."""
+    full = compact = 0
+    for row in rows:
+        full += estimate_tokens(build_user_prompt(row))
+        compact += estimate_tokens(build_compact_user_prompt(row))
+    return {
+        "full_tokens": full,
+        "compact_tokens": compact,
+        "saved_pct": round(100.0 * (1 - compact / full), 1) if full else 0.0,
+    }
+
+
+PACKED_SYSTEM_PROMPT = (
+    SYSTEM_PROMPT
+    + " You receive several venues separated by '---'. Return one item per venue, "
+    "echoing its id exactly."
+)
+
+_ITEM = {
+    "type": "object",
+    "properties": {
+        "id": {"type": "string"},
+        **JSON_SCHEMA["schema"]["properties"],
+    },
+    "required": ["id", *JSON_SCHEMA["schema"]["required"]],
+    "additionalProperties": False,
+}
+
+PACKED_JSON_SCHEMA = {
+    "name": "location_list_schema",
+    "schema": {
+        "type": "object",
+        "properties": {"items": {"type": "array", "items": _ITEM}},
+        "required": ["items"],
+        "additionalProperties": False,
+    },
+}
+
+
+def build_packed_user_prompt(
+    payloads: Iterable[Tuple[str, Dict[str, Any]]], compact: bool = False
+) -> str:
+    """One block per (item_id, payload). Why: item ids are short and unique per request."""
+    if compact:
+        blocks = (
+            build_compact_user_prompt({**payload, "id": item_id}, with_id=True)
+            for item_id, payload in payloads
+        )
+    else:
+        blocks = (build_user_prompt({**payload, "id": item_id}) for item_id, payload in payloads)
+    return "\n---\n".join(blocks)
+
+
+def validate_item(data: Any) -> Optional[Dict[str, Any]]:
+    """Return a clean {city, country, confidence, evidence} dict or None if malformed."""
+    if not isinstance(data, dict):
+        return None
+    city, country = data.get("city"), data.get("country")
+    if not isinstance(city, str) or not isinstance(country, str):
+        return None
+    try:
+        confidence = float(data.get("confidence") or 0.0)
+    except (TypeError, ValueError):
+        return None
+    if not 0.0 <= confidence <= 1.0:
+        return None
+    evidence = data.get("evidence") or ""
+    return {
+        "city": city.strip(),
+        "country": country.strip(),
+        "confidence": confidence,
+        "evidence": evidence.strip() if isinstance(evidence, str) else "",
+    }
+
+
+def parse_packed(content: str, expected: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Valid items keyed by item id. Missing, duplicated, unknown or malformed
+    items are left out so the caller can re-queue them individually.
+    """
+    try:
+        items = json.loads(content or "{}").get("items")
+    except (ValueError, AttributeError):
+        return {}
+    if not isinstance(items, list):
+        return {}
+    wanted = set(expected)
+    seen: Dict[str, int] = {}
+    out: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        item_id = str(item.get("id", "")) if isinstance(item, dict) else ""
+        seen[item_id] = seen.get(item_id, 0) + 1
+        clean = validate_item(item)
+        if item_id in wanted and clean is not None:
+            out[item_id] = clean
+    return {k: v for k, v in out.items() if seen[k] == 1}
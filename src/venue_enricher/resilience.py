@@ -0,0 +1,300 @@
+# file: src/venue_enricher/resilience.py
+"""
+Shared failure handling for model calls (async engine and sync GPTClient):
+jittered retries that honor Retry-After, a circuit breaker, and hedged
+duplicates for tail-latency calls. Per-row deadlines are applied by callers.
+Why: transient 5xx/timeouts are retried briefly instead of degrading rows,
+and a failing API is paused instead of hammered.
+"""
+from __future__ import annotations
+import asyncio
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_STATUS = {408, 409, 429}
+_TRANSIENT_NAMES = {"APIConnectionError", "APITimeoutError", "InternalServerError"}
+
+
+def parse_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse OpenAI reset/retry values: '1.5', '20ms', '6m0s', '1s'."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total, found = 0.0, False
+    for num, unit in re.findall(r"([\d.]+)(ms|s|m|h)", value):
+        found = True
+        total += float(num) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+    return total if found else None
+
+
+def status_of(exc: BaseException) -> Optional[int]:
+    return getattr(exc, "status_code", None)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    ms = parse_seconds(headers.get("retry-after-ms"))
+    if ms is not None:
+        return ms / 1000.0
+    return parse_seconds(headers.get("retry-after"))
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_of(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    return isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)) or (
+        type(exc).__name__ in _TRANSIENT_NAMES
+    )
+
+
+class CircuitOpen(RuntimeError):
+    """Raised by the sync path while the breaker is open (the async path waits)."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive transient failures and blocks
+    calls for `reset_seconds`. After that, one failure re-opens it; one success closes it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 30.0) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._open_until = 0.0
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def remaining(self) -> float:
+        """Seconds until calls may proceed; 0 when closed or half-open."""
+        return max(0.0, self._open_until - time.monotonic())
+
+    @property
+    def state(self) -> str:
+        if self.remaining() > 0:
+            return "open"
+        return "half_open" if self._failures >= self.failure_threshold else "closed"
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold and self.remaining() <= 0:
+                self._open_until = time.monotonic() + self.reset_seconds
+                self.opened += 1
+
+    def check(self) -> None:
+        left = self.remaining()
+        if left > 0:
+            raise CircuitOpen(f"model circuit open for {left:.1f}s")
+
+    async def wait_async(self) -> None:
+        while True:
+            left = self.remaining()
+            if left <= 0:
+                return
+            await asyncio.sleep(left)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies; decides when to hedge."""
+
+    def __init__(
+        self,
+        quantile: float = 0.95,
+        min_delay: float = 1.0,
+        window: int = 200,
+        min_samples: int = 20,
+        max_ratio: float = 0.1,
+    ) -> None:
+        self.quantile = quantile
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedged = 0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_after(self) -> Optional[float]:
+        """Delay before a duplicate is sent, or None (too few samples / hedge budget spent)."""
+        with self._lock:
+            self.calls += 1
+            if len(self._samples) < self.min_samples or self.hedged > self.max_ratio * self.calls:
+                return None
+            ordered = sorted(self._samples)
+            q = ordered[min(len(ordered) - 1, int(self.quantile * len(ordered)))]
+            return max(self.min_delay, q)
+
+    def count_hedge(self) -> None:
+        with self._lock:
+            self.hedged += 1
+
+
+class Resilience:
+    """
+    Retry + breaker + hedging around one logical call. `make` builds a fresh
+    attempt (coroutine or callable) each time, including any rate limiting.
+    Only transient failures (429, 408, 409, 5xx, timeouts) are retried; 429s
+    go to `on_throttle` instead of the breaker because they are quota, not health.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        breaker: Optional[CircuitBreaker] = None,
+        latency: Optional[LatencyTracker] = None,
+        hedge: bool = True,
+    ) -> None:
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.latency = latency or LatencyTracker()
+        self.hedge = hedge
+        self.retries = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+
+    def delay(self, attempt: int, exc: BaseException) -> float:
+        """Retry-After when the server sends one, else full-jitter exponential backoff."""
+        hinted = retry_after(exc)
+        if hinted is not None:
+            return hinted
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    def _failed(self, exc: BaseException, on_throttle: Optional[Callable[[Optional[float]], None]]) -> None:
+        if status_of(exc) == 429:
+            if on_throttle is not None:
+                on_throttle(retry_after(exc))
+        elif is_retryable(exc):
+            self.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "retries": self.retries,
+            "hedged": self.latency.hedged,
+            "breaker_state": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+        }
+
+    # -- async ---------------------------------------------------------------
+
+    async def call_async(
+        self,
+        make: Callable[[], Awaitable[T]],
+        on_throttle: Optional[Callable[[Optional[float]], None]] = None,
+    ) -> T:
+        for attempt in range(self.attempts):
+            await self.breaker.wait_async()
+            try:
+                result = await self._hedged_async(make)
+            except Exception as exc:
+                self._failed(exc, on_throttle)
+                if not is_retryable(exc) or attempt == self.attempts - 1:
+                    raise
+                self.retries += 1
+                await asyncio.sleep(self.delay(attempt, exc))
+                continue
+            self.breaker.record_success()
+            return result
+        raise RuntimeError("unreachable")
+
+    async def _timed_async(self, make: Callable[[], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        result = await make()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    async def _hedged_async(self, make: Callable[[], Awaitable[T]]) -> T:
+        after = self.latency.hedge_after() if self.hedge else None
+        tasks = {asyncio.ensure_future(self._timed_async(make))}
+        try:
+            if after is not None:
+                done, _ = await asyncio.wait(tasks, timeout=after)
+                if not done:
+                    # Why: the slow tail is usually one stuck request, not the venue.
+                    self.latency.count_hedge()
+                    tasks.add(asyncio.ensure_future(self._timed_async(make)))
+            error: Optional[BaseException] = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for t in done:
+                    if t.exception() is None:
+                        return t.result()
+                    error = t.exception()
+            assert error is not None
+            raise error
+        finally:
+            for t in tasks:
+                t.cancel()
+
+    # -- sync ----------------------------------------------------------------
+
+    def call(
+        self,
+        make: Callable[[], T],
+        on_throttle: Optional[Callable[[Optional[float]], None]] = None,
+    ) -> T:
+        for attempt in range(self.attempts):
+            # Why: a sync caller holds a thread; fail fast and let it re-queue the row.
+            self.breaker.check()
+            try:
+                result = self._hedged(make)
+            except Exception as exc:
+                self._failed(exc, on_throttle)
+                if not is_retryable(exc) or attempt == self.attempts - 1:
+                    raise
+                self.retries += 1
+                time.sleep(self.delay(attempt, exc))
+                continue
+            self.breaker.record_success()
+            return result
+        raise RuntimeError("unreachable")
+
+    def _timed(self, make: Callable[[], T]) -> T:
+        started = time.monotonic()
+        result = make()
+        self.latency.observe(time.monotonic() - started)
+        return result
+
+    def _hedged(self, make: Callable[[], T]) -> T:
+        after = self.latency.hedge_after() if self.hedge else None
+        if after is None:
+            return self._timed(make)
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        futs = {self._pool.submit(self._timed, make)}
+        done, _ = wait(futs, timeout=after)
+        if not done:
+            self.latency.count_hedge()
+            futs.add(self._pool.submit(self._timed, make))
+        error: Optional[BaseException] = None
+        while futs:
+            done, futs = wait(futs, return_when=FIRST_COMPLETED)
+            for f in done:
+                if f.exception() is None:
+                    # The loser finishes in the background; sync calls cannot be cancelled.
+                    return f.result()
+                error = f.exception()
+        assert error is not None
+        raise error
@@ -0,0 +1,144 @@
+# file: src/venue_enricher/resolver.py
+from __future__ import annotations
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+from urllib.parse import urlsplit
+
+from . import gazetteer as gz
+
+# Signal weights toward a country; confidence is the winner's total minus
+# half of what the other candidates collected.
+W_ADDRESS = 0.7
+W_CITY = 0.3
+W_TLD = 0.2
+W_PHONE = 0.2
+
+_DIGITS = re.compile(r"\D+")
+
+
+class Resolution(NamedTuple):
+    city: str
+    country: str
+    confidence: float
+    evidence: str
+
+
+def _tld(url: str) -> Optional[str]:
+    url = (url or "").strip().lower()
+    if not url:
+        return None
+    host = urlsplit(url if "//" in url else f"//{url}").hostname or ""
+    if "." not in host:
+        return None
+    tld = host.rsplit(".", 1)[-1]  # generic TLDs (.com, .org) carry no country
+    return tld if tld in gz.COUNTRY_BY_TLD else None
+
+
+def _dial(phone: str) -> frozenset:
+    phone = (phone or "").strip()
+    if phone.startswith("+"):
+        digits = _DIGITS.sub("", phone)
+    elif phone.startswith("00"):
+        digits = _DIGITS.sub("", phone)[2:]
+    else:
+        return frozenset()  # national format carries no country
+    return gz.countries_for_dial(digits)
+
+
+def _address_parts(address: str) -> List[str]:
+    return [gz.norm(p) for p in (address or "").split(",") if gz.norm(p)]
+
+
+def _spans(part: str, max_words: int = 4) -> List[str]:
+    """Word n-grams of an address part, longest first (skips postcodes/numbers)."""
+    words = part.split()
+    return [
+        " ".join(words[i : i + n])
+        for n in range(min(max_words, len(words)), 0, -1)
+        for i in range(len(words) - n + 1)
+    ]
+
+
+def _find_country(part: str) -> Optional[str]:
+    for span in _spans(part):
+        iso = gz.COUNTRY_BY_ALIAS.get(span)
+        if iso:
+            return iso
+    return None
+
+
+class PreResolver:
+    """
+    Rules + gazetteer resolver run before any model call.
+    Rows resolve only with a gazetteer city and a country at or above
+    `min_confidence`; everything else is left for the model.
+    """
+
+    def __init__(self, min_confidence: float = 0.85) -> None:
+        self.min_confidence = min_confidence
+
+    def resolve_batch(self, rows: Sequence[Dict[str, Any]]) -> List[Optional[Resolution]]:
+        """
+        Column-wise over the batch: each signal is extracted for all rows in one
+        pass, then combined per row. Returns one Resolution or None per row.
+        """
+        parts_col = [_address_parts(r.get("address") or "") for r in rows]
+        tail_col = [_find_country(p[-1]) if p else None for p in parts_col]
+        tld_col = [
+            gz.COUNTRY_BY_TLD.get(_tld(r.get("domain") or "") or _tld(r.get("website_url") or "") or "")
+            for r in rows
+        ]
+        dial_col = [_dial(r.get("phone") or "") for r in rows]
+        return [
+            self._combine(parts, tail, tld, dial)
+            for parts, tail, tld, dial in zip(parts_col, tail_col, tld_col, dial_col)
+        ]
+
+    def _combine(
+        self, parts: List[str], tail: Optional[str], tld: Optional[str], dial: frozenset
+    ) -> Optional[Resolution]:
+        votes: Dict[str, float] = {}
+        evidence: List[str] = []
+        if tail:
+            votes[tail] = votes.get(tail, 0.0) + W_ADDRESS
+            evidence.append("address country")
+        if tld:
+            votes[tld] = votes.get(tld, 0.0) + W_TLD
+            evidence.append("ccTLD")
+        if len(dial) == 1:
+            (iso,) = dial
+            votes[iso] = votes.get(iso, 0.0) + W_PHONE
+            evidence.append("dialing code")
+
+        # City: rightmost address part containing a known city name (postcodes
+        # and street words around it are ignored), preferring the leading country.
+        lead = max(votes, key=votes.get) if votes else None
+        city_key, city_iso = None, None
+        for part in reversed(parts[:-1] if tail else parts):
+            for key in _spans(part):
+                isos = gz.CITIES_BY_ALIAS.get(key)
+                if not isos:
+                    continue
+                if lead in isos:
+                    city_key, city_iso = key, lead
+                elif len(isos) == 1:
+                    city_key, city_iso = key, next(iter(isos))
+                break
+            if city_key is not None:
+                break
+        if city_key is None:
+            return None
+        votes[city_iso] = votes.get(city_iso, 0.0) + W_CITY
+        evidence.append("gazetteer city")
+
+        best = max(votes, key=votes.get)
+        others = sum(v for k, v in votes.items() if k != best)
+        confidence = round(min(1.0, votes[best] - 0.5 * others), 3)
+        if best != city_iso or confidence < self.min_confidence:
+            return None
+        return Resolution(
+            city=gz.CITY_NAME[(city_key, city_iso)],
+            country=gz.COUNTRY_NAME[best],
+            confidence=confidence,
+            evidence="resolver: " + ", ".join(evidence),
+        )
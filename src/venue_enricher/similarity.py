@@ -0,0 +1,277 @@
+# file: src/venue_enricher/similarity.py
+"""
+Near-duplicate index over venues already answered by the model.
+Why: "The O2 Arena", "O2 Arena London" and "o2 arena - tickets" miss the exact-key
+cache but are one venue; a MinHash match that agrees on domain or phone, and
+whose place names agree, reuses the stored city/country without a model call.
+Place names stay in the signature, and domains shared by venues in several
+cities (chains, ticketing sites) are not evidence: "O2 Academy Glasgow" must
+never inherit "O2 Academy Birmingham"'s answer.
+
+Layout under `root`: `signatures.u32` (raw uint32 rows, memory-mapped, append-only)
+and `index.sqlite` (LSH band postings + per-venue domain/phone/answer).
+Opening an index reads nothing up front, so it loads in constant time.
+"""
+from __future__ import annotations
+import os
+import re
+import sqlite3
+import threading
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from . import gazetteer as gz
+
+_PRIME = (1 << 31) - 1
+# Bumped when signatures or stored fields change meaning; older indexes are cleared on open.
+INDEX_VERSION = 2
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+_DIGITS = re.compile(r"\D+")
+
+# Words that vary between listings of the same venue without changing it.
+NOISE_WORDS = frozenset(
+    "the a an of at and tickets ticket official venue events event box office home "
+    "page site website live presents info online".split()
+)
+
+
+class Match(NamedTuple):
+    city: str
+    country: str
+    similarity: float
+
+
+def normalize_name(name: str) -> str:
+    """
+    Lowercase, strip punctuation and noise words.
+    Why: place names are kept; they are what tells branches of a chain apart.
+    """
+    words = _NON_ALNUM.sub(" ", (name or "").lower()).split()
+    kept = [w for w in words if w not in NOISE_WORDS]
+    return " ".join(kept or words)
+
+
+def _words(*values: Any) -> List[str]:
+    return _NON_ALNUM.sub(" ", " ".join(str(v or "") for v in values).lower()).split()
+
+
+def _place_text(row: Dict[str, Any]) -> str:
+    """Name, address and city of a row as one padded, normalized string."""
+    return f" {' '.join(_words(row.get('name'), row.get('address'), row.get('city')))} "
+
+
+def _named_cities(text: str) -> Set[str]:
+    """Canonical (lowercased) gazetteer cities whose aliases appear in `text`."""
+    words = text.split()
+    out: Set[str] = set()
+    for n in (3, 2, 1):
+        for i in range(len(words) - n + 1):
+            alias = " ".join(words[i : i + n])
+            for iso in gz.CITIES_BY_ALIAS.get(alias, ()):
+                out.add(gz.CITY_NAME[(alias, iso)].lower())
+    return out
+
+
+def _domain(row: Dict[str, Any]) -> str:
+    raw = (row.get("domain") or row.get("website_url") or "").strip().lower()
+    if not raw:
+        return ""
+    host = urlsplit(raw if "//" in raw else f"//{raw}").hostname or ""
+    return host[4:] if host.startswith("www.") else host
+
+
+def _phone(row: Dict[str, Any]) -> str:
+    # Why: the national significant number survives +44/0044/0 prefix variants.
+    digits = _DIGITS.sub("", row.get("phone") or "")
+    return digits[-9:] if len(digits) >= 7 else ""
+
+
+class SimilarityIndex:
+    """
+    MinHash LSH over character 3-grams of the normalized name.
+    `num_perm` hashes split into `bands` bands; a candidate must share one band
+    and reach `threshold` estimated Jaccard similarity.
+    """
+
+    def __init__(
+        self,
+        root: str = "/tmp/similar_index",
+        num_perm: int = 64,
+        bands: int = 16,
+        threshold: float = 0.6,
+        seed: int = 7,
+        max_domain_cities: int = 1,
+    ) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.max_domain_cities = max_domain_cities
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+        self._b = rng.randint(0, _PRIME, size=(num_perm, 1)).astype(np.uint64)
+
+        os.makedirs(root, exist_ok=True)
+        self._sig_path = os.path.join(root, "signatures.u32")
+        self.conn = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS venues (
+                    idx INTEGER PRIMARY KEY,
+                    domain TEXT,
+                    phone TEXT,
+                    city TEXT,
+                    country TEXT
+                );
+                CREATE TABLE IF NOT EXISTS bands (
+                    band INTEGER NOT NULL,
+                    hash INTEGER NOT NULL,
+                    idx INTEGER NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS bands_lookup ON bands(band, hash);
+                CREATE INDEX IF NOT EXISTS venues_domain ON venues(domain);
+            """)
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+                # Why: signatures built with the old normalization would never match new ones.
+                self.conn.execute("DELETE FROM bands")
+                self.conn.execute("DELETE FROM venues")
+                self.conn.execute(f"PRAGMA user_version={INDEX_VERSION}")
+        self._sigs: Optional[np.ndarray] = None
+        # Why: a crash between appending a signature and committing its row leaves a tail.
+        self._size = self._count()
+        with open(self._sig_path, "ab") as fh:
+            fh.truncate(self._size * self.num_perm * 4)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM venues").fetchone()[0]
+
+    def signature(self, name: str) -> Optional[np.ndarray]:
+        text = normalize_name(name)
+        if not text:
+            return None
+        padded = f" {text} "
+        shingles = {padded[i : i + 3] for i in range(max(1, len(padded) - 2))}
+        h = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles)
+        )
+        return ((self._a * h[None, :] + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _band_hashes(self, sig: np.ndarray) -> List[int]:
+        rows = sig.reshape(self.bands, self.rows_per_band)
+        # SQLite integers are signed 64-bit; crc32 fits comfortably.
+        return [zlib.crc32(r.tobytes()) for r in rows]
+
+    def _matrix(self) -> np.ndarray:
+        if self._sigs is None or len(self._sigs) < self._size:
+            self._sigs = np.memmap(self._sig_path, dtype=np.uint32, mode="r").reshape(-1, self.num_perm)
+        return self._sigs
+
+    def lookup_many(self, rows: Sequence[Dict[str, Any]]) -> List[Optional[Match]]:
+        """
+        Best stored answer per row, or None. A candidate needs a matching phone,
+        or a matching domain that only venues in one city use, and its city must
+        agree with the row's place names (see _agrees).
+        """
+        out: List[Optional[Match]] = []
+        with self._lock:
+            if not self._size:
+                return [None] * len(rows)
+            matrix = self._matrix()
+            for row in rows:
+                out.append(self._lookup(row, matrix))
+        return out
+
+    def _lookup(self, row: Dict[str, Any], matrix: np.ndarray) -> Optional[Match]:
+        domain, phone = _domain(row), _phone(row)
+        if not domain and not phone:
+            return None
+        sig = self.signature(row.get("name") or "")
+        if sig is None:
+            return None
+        cands = set()
+        for band, h in enumerate(self._band_hashes(sig)):
+            cur = self.conn.execute("SELECT idx FROM bands WHERE band=? AND hash=?", (band, h))
+            cands.update(i for (i,) in cur.fetchall())
+        if not cands:
+            return None
+        idx = np.fromiter(sorted(cands), dtype=np.int64, count=len(cands))
+        sims = (matrix[idx] == sig).mean(axis=1)
+        best: Optional[Match] = None
+        place = _place_text(row)
+        for i in np.argsort(-sims):
+            sim = float(sims[i])
+            if sim < self.threshold:
+                break
+            v_domain, v_phone, city, country = self.conn.execute(
+                "SELECT domain, phone, city, country FROM venues WHERE idx=?", (int(idx[i]),)
+            ).fetchone()
+            by_phone = bool(phone and phone == v_phone)
+            by_domain = bool(domain and domain == v_domain) and not self._shared_domain(domain)
+            if (by_phone or by_domain) and self._agrees(place, city, by_phone):
+                best = Match(city, country, round(sim, 3))
+                break
+        return best
+
+    def _shared_domain(self, domain: str) -> bool:
+        """Chains and ticketing sites: one domain, stored venues in several cities."""
+        (cities,) = self.conn.execute(
+            "SELECT COUNT(DISTINCT LOWER(city)) FROM venues WHERE domain=?", (domain,)
+        ).fetchone()
+        return cities > self.max_domain_cities
+
+    @staticmethod
+    def _agrees(place: str, city: str, by_phone: bool) -> bool:
+        """
+        The stored city must appear in the row's name/address/city (directly or
+        as a gazetteer alias). A row that names no known city at all may still
+        match, but only on phone.
+        """
+        if f" {' '.join(_words(city))} " in place:
+            return True
+        named = _named_cities(place)
+        if named:
+            return (city or "").lower() in named
+        return by_phone
+
+    def add_many(self, items: Sequence[Tuple[Dict[str, Any], str, str]]) -> int:
+        """Index (row, city, country) answers; rows without name or domain/phone are skipped."""
+        added = 0
+        with self._lock:
+            try:
+                with open(self._sig_path, "ab") as fh, self.conn:
+                    for row, city, country in items:
+                        domain, phone = _domain(row), _phone(row)
+                        sig = self.signature(row.get("name") or "")
+                        if sig is None or not (domain or phone) or not (city and country):
+                            continue
+                        idx = self._size
+                        fh.write(sig.tobytes())
+                        self.conn.execute(
+                            "INSERT INTO venues(idx,domain,phone,city,country) VALUES (?,?,?,?,?)",
+                            (idx, domain, phone, city, country),
+                        )
+                        self.conn.executemany(
+                            "INSERT INTO bands(band,hash,idx) VALUES (?,?,?)",
+                            [(b, h, idx) for b, h in enumerate(self._band_hashes(sig))],
+                        )
+                        self._size += 1
+                        added += 1
+                    # Why: signatures hit disk before their rows commit, never after.
+                    fh.flush()
+            except BaseException:
+                # Rolled back: drop the signatures appended for the uncommitted rows.
+                self._size = self._count()
+                with open(self._sig_path, "ab") as fh:
+                    fh.truncate(self._size * self.num_perm * 4)
+                raise
+        return added
@@ -0,0 +1,6 @@
+# file: tests/conftest.py
+from __future__ import annotations
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -0,0 +1,514 @@
+# file: tests/fakes.py
+"""
+Local stand-ins for external services, for tests and offline runs.
+Why: exercise the real code paths without a GCP project or a paid API key.
+"""
+from __future__ import annotations
+import asyncio
+import datetime as dt
+import itertools
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from venue_enricher import metrics
+from venue_enricher.batch import PageSize, VenueBatch, page_limit
+from venue_enricher.bq_io import PENDING_FILTER, UNNEST_MAX_ROWS, BigQueryIO, _clean_updates
+from venue_enricher.enricher import _fallback_extract
+
+Resolver = Callable[[Dict[str, Any]], Tuple[str, str, float]]
+
+
+class RecordingBigQueryClient:
+    """
+    bigquery.Client stand-in that runs nothing and records every call.
+    Why: checks the SQL, parameters and job sequence BigQueryIO really sends.
+    Query jobs report `affected` DML rows; `results` maps a SQL fragment to result rows.
+    """
+
+    def __init__(self, affected: int = 0, results: Optional[Dict[str, List[Any]]] = None) -> None:
+        self.affected = affected
+        self.results = results or {}
+        self.calls: List[Tuple[str, Any]] = []
+
+    @property
+    def queries(self) -> List[Tuple[str, Any]]:
+        return [args for op, args in self.calls if op == "query"]
+
+    def query(self, sql: str, job_config: Any = None, location: Optional[str] = None) -> SimpleNamespace:
+        self.calls.append(("query", (sql, job_config)))
+        rows = next((r for frag, r in self.results.items() if frag in sql), [])
+        return SimpleNamespace(result=lambda **_: rows, num_dml_affected_rows=self.affected)
+
+    def create_table(self, table: Any, exists_ok: bool = False) -> Any:
+        self.calls.append(("create_table", table))
+        return table
+
+    def delete_table(self, table: Any, not_found_ok: bool = False) -> None:
+        self.calls.append(("delete_table", table))
+
+    def load_table_from_file(self, fh: Any, destination: str, job_config: Any = None,
+                             location: Optional[str] = None) -> SimpleNamespace:
+        self.calls.append(("load", (destination, fh.read(), job_config)))
+        return SimpleNamespace(result=lambda **_: None)
+
+    def insert_rows_json(self, table: str, rows: List[Dict[str, Any]]) -> List[Any]:
+        self.calls.append(("insert", (table, list(rows))))
+        return []
+
+
+def heuristic_resolver(body: Dict[str, Any]) -> Tuple[str, str, float]:
+    """Answer a chat request from its user prompt with the heuristic extractor."""
+    fields: Dict[str, str] = {}
+    for line in body["messages"][-1]["content"].splitlines():
+        k, _, v = line.partition(":")
+        fields[k.strip()] = v.strip()
+    city, country = _fallback_extract(fields.get("name", ""), fields.get("address", ""))
+    return city or "", country or "", 0.5 if city and country else 0.0
+
+
+class FakeBatchClient:
+    """
+    Minimal OpenAI Batch API: files.create/content, batches.create/retrieve.
+    Batches complete after `polls_to_complete` retrieve calls. A resolver that raises
+    turns that request into a per-row error line.
+    """
+
+    def __init__(
+        self,
+        resolver: Resolver = heuristic_resolver,
+        polls_to_complete: int = 1,
+        root: Optional[str] = None,
+    ) -> None:
+        self.resolver = resolver
+        self.polls_to_complete = polls_to_complete
+        self.root = root or tempfile.mkdtemp(prefix="fake_batch_")
+        self._ids = itertools.count(1)
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self.files = SimpleNamespace(create=self._files_create, content=self._files_content)
+        self.batches = SimpleNamespace(create=self._batches_create, retrieve=self._batches_retrieve)
+
+    def _path(self, file_id: str) -> str:
+        return os.path.join(self.root, f"{file_id}.jsonl")
+
+    def _files_create(self, file: Any, purpose: str) -> SimpleNamespace:
+        file_id = f"file-{next(self._ids)}"
+        with open(self._path(file_id), "wb") as out:
+            out.write(file.read())
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def _files_content(self, file_id: str) -> SimpleNamespace:
+        with open(self._path(file_id), encoding="utf-8") as fh:
+            return SimpleNamespace(text=fh.read())
+
+    def _batches_create(self, input_file_id: str, endpoint: str, completion_window: str) -> SimpleNamespace:
+        batch_id = f"batch-{next(self._ids)}"
+        self._batches[batch_id] = {"input": input_file_id, "polls": 0, "output": None}
+        return SimpleNamespace(id=batch_id, status="validating", output_file_id=None)
+
+    def _batches_retrieve(self, batch_id: str) -> SimpleNamespace:
+        b = self._batches[batch_id]
+        b["polls"] += 1
+        if b["polls"] < self.polls_to_complete:
+            return SimpleNamespace(id=batch_id, status="in_progress", output_file_id=None)
+        if b["output"] is None:
+            b["output"] = self._run(b["input"])
+        return SimpleNamespace(id=batch_id, status="completed", output_file_id=b["output"])
+
+    def _run(self, input_file_id: str) -> str:
+        output_id = f"file-{next(self._ids)}"
+        with open(self._path(input_file_id), encoding="utf-8") as src, open(
+            self._path(output_id), "w", encoding="utf-8"
+        ) as dst:
+            for line in src:
+                req = json.loads(line)
+                try:
+                    city, country, conf = self.resolver(req["body"])
+                except Exception as exc:
+                    dst.write(json.dumps({
+                        "custom_id": req["custom_id"],
+                        "response": None,
+                        "error": {"code": "server_error", "message": str(exc)},
+                    }) + "\n")
+                    continue
+                content = json.dumps(
+                    {"city": city, "country": country, "confidence": conf, "evidence": "fake"}
+                )
+                dst.write(json.dumps({
+                    "custom_id": req["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"content": content}}]},
+                    },
+                }) + "\n")
+        return output_id
+
+
+def pending_predicate(row: Dict[str, Any]) -> bool:
+    return row.get("enrichment_status") == "OK" and (
+        row.get("city") is None or row.get("country") is None
+    )
+
+
+class _ArrowPage:
+    def __init__(self, data: Dict[str, List[Any]]) -> None:
+        self._data = data
+
+    def to_arrow(self) -> "_ArrowPage":
+        return self
+
+    def to_pydict(self) -> Dict[str, List[Any]]:
+        return self._data
+
+
+class FakeReadClient:
+    """
+    Storage Read API stand-in serving column-oriented pages from in-memory rows.
+    `predicate` plays the pushed-down row_restriction; sessions are recorded
+    so tests can assert what was pushed down.
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict[str, Any]],
+        predicate: Callable[[Dict[str, Any]], bool] = pending_predicate,
+        page_size: int = 1024,
+    ) -> None:
+        self.rows = rows
+        self.predicate = predicate
+        self.page_size = page_size
+        self.sessions: List[Dict[str, Any]] = []
+
+    def create_read_session(self, parent: str, read_session: Dict[str, Any], max_stream_count: int = 1) -> SimpleNamespace:
+        self.sessions.append(read_session)
+        return SimpleNamespace(streams=[SimpleNamespace(name="stream-0")], request=read_session)
+
+    def read_rows(self, name: str) -> SimpleNamespace:
+        return SimpleNamespace(rows=lambda session: SimpleNamespace(pages=self._pages(session)))
+
+    def _pages(self, session: SimpleNamespace) -> Iterator[_ArrowPage]:
+        fields = session.request["read_options"]["selected_fields"]
+        restricted = bool(session.request["read_options"]["row_restriction"])
+        batch: List[Dict[str, Any]] = []
+        for row in self.rows:
+            if restricted and not self.predicate(row):
+                continue
+            batch.append(row)
+            if len(batch) >= self.page_size:
+                yield _ArrowPage({f: [r.get(f) for r in batch] for f in fields})
+                batch = []
+        if batch:
+            yield _ArrowPage({f: [r.get(f) for r in batch] for f in fields})
+
+
+class FakeAPIError(Exception):
+    """Shaped like openai.APIStatusError: status_code + response.headers."""
+
+    def __init__(self, status_code: int, retry_after_ms: Optional[int] = None) -> None:
+        super().__init__(f"fake API error {status_code}")
+        self.status_code = status_code
+        headers = {"retry-after-ms": str(retry_after_ms)} if retry_after_ms is not None else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeAsyncOpenAI:
+    """
+    AsyncOpenAI stand-in for `chat.completions.with_raw_response.create`.
+    Latency is lognormal around `latency_ms` (spread `sigma`); a `rate_429`
+    share of calls fail with 429 + Retry-After; usage counts ~4 chars per token.
+    Packed (multi-venue) requests are answered item by item.
+    """
+
+    def __init__(
+        self,
+        resolver: Resolver = heuristic_resolver,
+        latency_ms: float = 400.0,
+        sigma: float = 0.5,
+        rate_429: float = 0.0,
+        retry_after_ms: int = 200,
+        completion_tokens: int = 30,
+        seed: int = 0,
+    ) -> None:
+        self.resolver = resolver
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.rate_429 = rate_429
+        self.retry_after_ms = retry_after_ms
+        self.completion_tokens = completion_tokens
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.throttled = 0
+        self.latencies: List[float] = []
+        raw = SimpleNamespace(create=self._create)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(with_raw_response=raw))
+
+    async def _create(self, **body: Any) -> SimpleNamespace:
+        self.calls += 1
+        delay = self._rng.lognormvariate(0.0, self.sigma) * self.latency_ms / 1000.0
+        if self._rng.random() < self.rate_429:
+            self.throttled += 1
+            await asyncio.sleep(min(delay, 0.05))
+            raise FakeAPIError(429, self.retry_after_ms)
+        await asyncio.sleep(delay)
+        self.latencies.append(delay)
+
+        user = body["messages"][-1]["content"]
+        schema = (body.get("response_format") or {}).get("json_schema") or {}
+        if schema.get("name") == "location_list_schema":
+            items = []
+            for block in user.split("\n---\n"):
+                item_id = block.split("\n", 1)[0].partition(":")[2].strip()
+                city, country, conf = self.resolver({"messages": [{"content": block}]})
+                items.append({"id": item_id, "city": city, "country": country,
+                              "confidence": conf, "evidence": "fake"})
+            content = json.dumps({"items": items})
+        else:
+            city, country, conf = self.resolver(body)
+            content = json.dumps(
+                {"city": city, "country": country, "confidence": conf, "evidence": "fake"}
+            )
+        prompt_tokens = sum(len(m["content"]) for m in body["messages"]) // 4
+        usage = SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=self.completion_tokens,
+            total_tokens=prompt_tokens + self.completion_tokens,
+        )
+        resp = SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))], usage=usage
+        )
+        return SimpleNamespace(headers={}, parse=lambda: resp)
+
+
+class SQLiteBigQueryIO:
+    """
+    BigQueryIO stand-in backed by SQLite, with the same read/write shapes:
+    keyset + hash-shard fetch, UPDATE ... FROM (rows) for small writes, temp
+    table + load + matched-only merge for large ones, changelog + watermark.
+    `job_seconds` adds a fixed per-job latency to mimic BigQuery job overhead.
+    `last_updated` is the change column; `load` stamps it like an ingest would.
+    """
+
+    COLUMNS = ("id", "name", "address", "alt_name", "website_url", "domain",
+               "linkedin_url", "phone", "city", "country")
+
+    def __init__(self, path: str = ":memory:", job_seconds: float = 0.0,
+                 change_column: Optional[str] = "last_updated") -> None:
+        self.job_seconds = job_seconds
+        self.change_column = change_column
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.create_function("FINGERPRINT", 1, lambda s: zlib.crc32(str(s).encode("utf-8")))
+        self._lock = threading.Lock()
+        self._timings: List[Tuple[str, float]] = []
+        self._mark = ""
+        with self._lock, self.conn:
+            self.conn.executescript("""
+                CREATE TABLE IF NOT EXISTS venues (
+                    id TEXT PRIMARY KEY, name TEXT, address TEXT, alt_name TEXT,
+                    website_url TEXT, domain TEXT, linkedin_url TEXT, phone TEXT,
+                    city TEXT, country TEXT, enrichment_status TEXT, last_updated TEXT
+                );
+                CREATE TABLE IF NOT EXISTS changelog (id TEXT, city TEXT, country TEXT, staged_at TEXT);
+                CREATE TABLE IF NOT EXISTS watermark (kind TEXT, value TEXT, recorded_at TEXT);
+            """)
+
+    def load(self, rows: List[Dict[str, Any]]) -> None:
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO venues({','.join(self.COLUMNS)},enrichment_status,last_updated) "
+                f"VALUES ({','.join('?' * (len(self.COLUMNS) + 2))})",
+                [
+                    tuple(r.get(c) for c in self.COLUMNS)
+                    + (r.get("enrichment_status", "OK"), _ts(dt.datetime.now(dt.timezone.utc)))
+                    for r in rows
+                ],
+            )
+
+    def _job(self, op: str, sql: str, params: Any = (), many: bool = False) -> Any:
+        t0 = time.monotonic()
+        if self.job_seconds:
+            time.sleep(self.job_seconds)
+        with self._lock, self.conn:
+            cur = self.conn.executemany(sql, params) if many else self.conn.execute(sql, params)
+            out = cur.fetchall() if cur.description else cur.rowcount
+        elapsed = time.monotonic() - t0
+        metrics.BQ_SECONDS.observe(elapsed, op=op)
+        self._timings.append((op, elapsed))
+        return out
+
+    def pop_timings(self) -> Dict[str, Dict[str, float]]:
+        timings, self._timings = self._timings, []
+        out: Dict[str, Dict[str, float]] = {}
+        for op, secs in timings:
+            agg = out.setdefault(op, {"count": 0, "seconds": 0.0})
+            agg["count"] += 1
+            agg["seconds"] = round(agg["seconds"] + secs, 3)
+        return out
+
+    def _pending_where(
+        self, overwrite: bool, after_id: Optional[str] = None, shard: Optional[int] = None,
+        num_shards: Optional[int] = None, changed_since: Optional[dt.datetime] = None,
+    ) -> Tuple[str, List[Any]]:
+        clauses = ["1" if overwrite else f"({PENDING_FILTER})"]
+        params: List[Any] = []
+        if after_id:
+            clauses.append("id > ?")
+            params.append(after_id)
+        if num_shards and num_shards > 1:
+            clauses.append("FINGERPRINT(id) % ? = ?")
+            params += [num_shards, shard or 0]
+        if changed_since is not None and self.change_column:
+            clauses.append(f"{self.change_column} > ?")
+            params.append(_ts(changed_since))
+        return " AND ".join(clauses), params
+
+    def fetch_rows(
+        self,
+        limit: int,
+        overwrite: bool = False,
+        after_id: Optional[str] = None,
+        shard: Optional[int] = None,
+        num_shards: Optional[int] = None,
+        changed_since: Optional[dt.datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        rows = self._fetch(limit, overwrite, after_id, shard, num_shards, changed_since)
+        return [dict(zip(self.COLUMNS, r)) for r in rows]
+
+    def _fetch(self, limit: int, overwrite: bool, after_id: Optional[str], shard: Optional[int],
+               num_shards: Optional[int], changed_since: Optional[dt.datetime]) -> List[Tuple[Any, ...]]:
+        where, params = self._pending_where(overwrite, after_id, shard, num_shards, changed_since)
+        return self._job(
+            "fetch",
+            f"SELECT {','.join(self.COLUMNS)} FROM venues WHERE {where} ORDER BY id LIMIT ?",
+            (*params, limit),
+        )
+
+    def iter_rows(self, limit: Optional[int] = None, overwrite: bool = False, page_size: int = 1000,
+                  after_id: Optional[str] = None, shard: Optional[int] = None,
+                  num_shards: Optional[int] = None,
+                  changed_since: Optional[dt.datetime] = None) -> Iterator[Dict[str, Any]]:
+        yield from self.fetch_rows(limit or -1, overwrite, after_id, shard, num_shards, changed_since)
+
+    def iter_pages(self, limit: Optional[int] = None, overwrite: bool = False, page_size: PageSize = 200,
+                   after_id: Optional[str] = None, shard: Optional[int] = None,
+                   num_shards: Optional[int] = None,
+                   changed_since: Optional[dt.datetime] = None) -> Iterator[VenueBatch]:
+        rows = self._fetch(limit or -1, overwrite, after_id, shard, num_shards, changed_since)
+        i = 0
+        while i < len(rows):
+            size = page_limit(page_size)
+            page = VenueBatch(self.COLUMNS)
+            for r in rows[i : i + size]:
+                page.append_values(r)
+            i += size
+            yield page
+
+    def stream_pages(self, limit: Optional[int] = None, overwrite: bool = False,
+                     page_size: PageSize = 200, changed_since: Optional[dt.datetime] = None,
+                     **_: Any) -> Iterator[VenueBatch]:
+        return self.iter_pages(limit=limit, overwrite=overwrite, page_size=page_size, changed_since=changed_since)
+
+    def _update_from(self, op: str, source: str, overwrite: bool, params: Any = ()) -> int:
+        return self._job(op, f"""
+            UPDATE venues AS T SET
+              city    = IFNULL(NULLIF(S.city, ''), T.city),
+              country = IFNULL(NULLIF(S.country, ''), T.country),
+              last_updated = CURRENT_TIMESTAMP
+            FROM {source} AS S
+            WHERE T.id = S.id AND {BigQueryIO._matched_condition(overwrite)}
+        """, params)
+
+    def update_locations(self, updates: Iterable[Any], overwrite: bool, strategy: str = "auto") -> int:
+        rows = _clean_updates(updates)
+        if not rows:
+            return 0
+        if strategy == "auto":
+            strategy = "unnest" if len(rows) <= UNNEST_MAX_ROWS else "merge"
+        if strategy == "unnest":
+            values = ",".join("(?,?,?)" for _ in rows)
+            params = [v for r in rows for v in r]
+            return self._update_from(
+                "update_unnest", f"(SELECT column1 AS id, column2 AS city, column3 AS country FROM (VALUES {values}))",
+                overwrite, params,
+            )
+        tmp = f"_tmp_enrich_{next(_TMP_IDS)}"
+        self._job("create_temp", f"CREATE TABLE {tmp} (id TEXT PRIMARY KEY, city TEXT, country TEXT)")
+        try:
+            # Why: decode the real load-job payload so its encoding is exercised too.
+            payload = [json.loads(line) for line in rows.to_ndjson()]
+            self._job("load", f"INSERT OR REPLACE INTO {tmp} VALUES (?,?,?)",
+                      [(p["id"], p["city"], p["country"]) for p in payload], many=True)
+            return self._update_from("merge", tmp, overwrite)
+        finally:
+            self._job("delete_temp", f"DROP TABLE IF EXISTS {tmp}")
+
+    def merge_parquet(self, uri: str, overwrite: bool = False) -> int:
+        """`uri` is a local Parquet path here; same temp table + MERGE shape as the real script."""
+        import pyarrow.parquet as pq
+
+        data = pq.read_table(uri, columns=["id", "city", "country"]).to_pydict()
+        tmp = f"_tmp_enrich_{next(_TMP_IDS)}"
+        self._job("create_temp", f"CREATE TABLE {tmp} (id TEXT PRIMARY KEY, city TEXT, country TEXT)")
+        try:
+            self._job("load", f"INSERT OR REPLACE INTO {tmp} VALUES (?,?,?)",
+                      list(zip(data["id"], data["city"], data["country"])), many=True)
+            return self._update_from("merge_parquet", tmp, overwrite)
+        finally:
+            self._job("delete_temp", f"DROP TABLE IF EXISTS {tmp}")
+
+    def append_staged(self, updates: Iterable[Any]) -> int:
+        rows = _clean_updates(updates)
+        now = dt.datetime.now(dt.timezone.utc).isoformat()
+        self._job("append", "INSERT INTO changelog VALUES (?,?,?,?)",
+                  [(r["id"], r["city"], r["country"], r["staged_at"]) for r in rows.rows(staged_at=now)], many=True)
+        return len(rows)
+
+    def apply_staged(self) -> int:
+        return self.merge_staged()[0]
+
+    def merge_staged(self, watch: Iterable[str] = ()) -> Tuple[int, Set[str]]:
+        until = dt.datetime.now(dt.timezone.utc).isoformat()
+        source = (
+            "(SELECT id, city, country FROM (SELECT *, ROW_NUMBER() OVER "
+            "(PARTITION BY id ORDER BY staged_at DESC) AS rn FROM changelog "
+            "WHERE staged_at > ?) WHERE rn = 1)"
+        )
+        ids = sorted(set(watch))
+        watched: Set[str] = set()
+        if ids:
+            rows = self._job("watch_staged", f"""
+                SELECT S.id FROM {source} AS S JOIN venues AS T ON T.id = S.id
+                WHERE S.id IN ({",".join("?" * len(ids))}) AND {BigQueryIO._matched_condition(False)}
+            """, (self._mark, *ids))
+            watched = {r[0] for r in rows}
+        affected = self._update_from("apply_staged", source, False, (self._mark,))
+        self._mark = until
+        return affected, watched
+
+    def read_watermark(self, kind: str) -> Optional[dt.datetime]:
+        value = self._job("read_watermark", "SELECT MAX(value) FROM watermark WHERE kind = ?", (kind,))[0][0]
+        return dt.datetime.fromisoformat(value) if value else None
+
+    def write_watermark(self, kind: str, value: dt.datetime) -> None:
+        self._job("write_watermark", "INSERT INTO watermark VALUES (?,?,?)",
+                  (kind, value.isoformat(), dt.datetime.now(dt.timezone.utc).isoformat()))
+
+    def count_pending(self, changed_since: Optional[dt.datetime] = None, empty_only: bool = False) -> int:
+        where, params = self._pending_where(False, changed_since=changed_since)
+        if empty_only:
+            where += " AND city IS NULL AND country IS NULL"
+        return int(self._job("count_pending", f"SELECT COUNT(*) FROM venues WHERE {where}", params)[0][0])
+
+
+def _ts(value: dt.datetime) -> str:
+    """UTC in SQLite's CURRENT_TIMESTAMP format, so stamps and bounds compare as text."""
+    return value.astimezone(dt.timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+_TMP_IDS = itertools.count(1)
@@ -0,0 +1,32 @@
+# file: tests/test_app_backfill.py
+from __future__ import annotations
+import threading
+
+from service import app as A
+
+
+def test_overlapping_backfill_ticks_are_skipped(monkeypatch):
+    entered, release = threading.Event(), threading.Event()
+    built = []
+
+    class SlowBackfill:
+        def __init__(self, *args, **kwargs):
+            built.append(self)
+
+        def step(self, limit=None, overwrite=False):
+            entered.set()
+            release.wait(5)
+            return {"updated": 0, "submitted": 0}
+
+    monkeypatch.setattr("openai.OpenAI", lambda **kwargs: None)
+    monkeypatch.setattr(A, "Backfill", SlowBackfill)
+    monkeypatch.setattr(A, "BackfillState", lambda path: None)
+    monkeypatch.setattr(A, "bq", None, raising=False)
+    monkeypatch.setattr(A, "_backfill", None)
+    first = threading.Thread(target=A.backfill_step, kwargs={"limit": None, "overwrite": False})
+    first.start()
+    assert entered.wait(5)
+    assert A.backfill_step(limit=None, overwrite=False)["skipped"]
+    release.set()
+    first.join(5)
+    assert len(built) == 1
@@ -0,0 +1,62 @@
+# file: tests/test_app_lifespan.py
+from __future__ import annotations
+import asyncio
+import threading
+import time
+
+from service import app as A
+from venue_enricher.cache import RemoteTier
+
+
+class SlowTier(RemoteTier):
+    def __init__(self) -> None:
+        self.pulled = threading.Event()
+
+    def pull(self, dest: str) -> bool:
+        time.sleep(0.5)
+        self.pulled.set()
+        return False
+
+    def push(self, src: str) -> None:
+        pass
+
+
+def test_startup_does_not_wait_for_the_cache_pull(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(A, "JOBS_DB", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(A, "WARMUP", False)
+    tier = SlowTier()
+    real_build = A._build
+
+    def build(io=None):
+        real_build(io)
+        A.cache_remote = tier
+
+    monkeypatch.setattr(A, "_build", build)
+
+    async def serve():
+        started = time.monotonic()
+        async with A.app.router.lifespan_context(A.app):
+            ready = time.monotonic() - started
+            pulled_at_ready = tier.pulled.is_set()
+        return ready, pulled_at_ready
+
+    ready, pulled_at_ready = asyncio.run(serve())
+    assert ready < 0.4 and not pulled_at_ready
+    assert tier.pulled.wait(2.0)
+
+
+class HungTier(SlowTier):
+    def pull(self, dest: str) -> bool:
+        time.sleep(5)
+        return False
+
+
+def test_a_hung_cache_pull_times_out_and_is_logged(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(A, "CACHE_SYNC_TIMEOUT", 0.2)
+    monkeypatch.setattr(A, "cache_remote", HungTier())
+    monkeypatch.setattr(A, "cache", A.TieredCache(A.EnrichmentCache(str(tmp_path / "c.sqlite"))))
+    started = time.monotonic()
+    A._load_cache()
+    assert time.monotonic() - started < 1.0
+    assert "cache_pull_failed" in capsys.readouterr().out
@@ -0,0 +1,122 @@
+# file: tests/test_app_run.py
+from __future__ import annotations
+import threading
+import time
+
+import pytest
+
+from fakes import FakeAsyncOpenAI, SQLiteBigQueryIO
+from service import app as A
+from venue_enricher import enricher, metrics
+from venue_enricher.async_engine import AsyncEngine, TokenBucket
+from venue_enricher.batch import ResultBatch
+from venue_enricher.cascade import Tier
+
+
+def _paris(body):
+    return "Paris", "France", 0.9
+
+
+def _build_app(tmp_path, monkeypatch, resolver=_paris):
+    monkeypatch.setattr(A, "CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(A, "JOBS_DB", str(tmp_path / "jobs.sqlite"))
+    monkeypatch.setattr(A, "PRE_RESOLVER", False)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    client = FakeAsyncOpenAI(resolver=resolver, latency_ms=1, sigma=0.0)
+    monkeypatch.setattr(
+        enricher, "_ENGINE", AsyncEngine(client, TokenBucket(rpm=100000, tpm=10**8), deadline=5.0)
+    )
+    io = SQLiteBigQueryIO(str(tmp_path / "bq.sqlite"))
+    io.load([{"id": f"v{i}", "name": f"Venue {i}", "address": ""} for i in range(6)])
+    A._build(io)
+    return io
+
+
+@pytest.fixture
+def stream_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "WRITE_MODE", "stream")
+    yield _build_app(tmp_path, monkeypatch)
+    A.jobs.stop()
+
+
+def test_stream_run_reports_only_its_own_rows(stream_app):
+    io = stream_app
+    # Another writer staged a row this run never read; the run's MERGE applies them too.
+    other = ResultBatch()
+    other.append("x-other", "Lyon", "France")
+    io.load([{"id": "x-other", "name": "Elsewhere", "address": ""}])
+    io.append_staged(other)
+    out = A._run(limit=6, overwrite=False, verbose=False, start=None)
+    assert out["pipeline"]["staged"] == 6
+    assert out["pipeline"]["written"] == 6
+    assert io.count_pending() == 0
+
+
+def test_newest_staged_value_wins(stream_app):
+    io = stream_app
+    old, new = ResultBatch(), ResultBatch()
+    old.append("v0", "Paris", "France")
+    new.append("v0", "Lyon", "France")
+    io.append_staged(old)
+    io.append_staged(new)
+    assert io.merge_staged(["v0"]) == (1, {"v0"})
+    # Re-applying the same window leaves the newer value in place.
+    io._mark = ""
+    assert io.merge_staged(["v0"]) == (0, set())
+    assert io.conn.execute("SELECT city FROM venues WHERE id='v0'").fetchone()[0] == "Lyon"
+
+
+def test_run_usage_excludes_concurrent_spend(tmp_path, monkeypatch):
+    def busy_neighbour(body):
+        # Another run in the process pays for a million prompt tokens meanwhile.
+        metrics.record_usage("gpt-4o-mini", 10**6, 0, 0.1)
+        return _paris(body)
+
+    monkeypatch.setattr(A, "MODEL_TIERS", [Tier("gpt-4o-mini")])
+    _build_app(tmp_path, monkeypatch, resolver=busy_neighbour)
+    try:
+        out = A._run(limit=6, overwrite=False, verbose=False, start=None)
+    finally:
+        A.jobs.stop()
+    usage = out["usage"]
+    assert usage["prompt_tokens"] == out["tiers"][0]["tokens"] - usage["completion_tokens"] > 0
+    assert usage["cost_usd"] < 0.01
+    assert usage["hit_rate"]["model"] == 1.0
+
+
+def _job(limit):
+    return {"params": {"limit": limit}, "cursor": None, "counters": {}}
+
+
+def test_job_waits_for_an_enrich_run_on_the_same_slice(tmp_path, monkeypatch):
+    io = _build_app(tmp_path, monkeypatch)
+    monkeypatch.setattr(A, "JOB_WAIT_SECONDS", 0.05)
+    key = (False, 0, 1, False)
+    assert A._claim_cursor(key)
+    checkpoints = []
+    worker = threading.Thread(target=A._run_job, args=(_job(100), lambda *a, **k: checkpoints.append(a)))
+    worker.start()
+    try:
+        time.sleep(0.3)
+        assert checkpoints == [] and io.count_pending() == 6
+    finally:
+        A._free_cursor(key)
+    worker.join(5)
+    assert not worker.is_alive() and io.count_pending() == 0
+    A.jobs.stop()
+
+
+def test_job_takes_lease_shards_like_enrich(tmp_path, monkeypatch):
+    monkeypatch.setattr(A, "LEASE_SHARDS", 2)
+    monkeypatch.setattr(A, "LEASE_BACKEND", "sqlite")
+    monkeypatch.setattr(A, "LEASE_DB", str(tmp_path / "leases.sqlite"))
+    monkeypatch.setattr(A, "JOB_CHUNK_ROWS", 2)
+    io = _build_app(tmp_path, monkeypatch)
+    try:
+        job = _job(100)
+        A._run_job(job, lambda *a, **k: None)
+    finally:
+        A.jobs.stop()
+    assert io.count_pending() == 0 and job["counters"]["written"] == 6
+    held = A.leases.conn.execute("SELECT COUNT(*) FROM leases WHERE owner IS NOT NULL").fetchone()[0]
+    assert held == 0
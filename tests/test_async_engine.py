@@ -0,0 +1,89 @@
+# file: tests/test_async_engine.py
+from __future__ import annotations
+import asyncio
+import time
+
+from fakes import FakeAsyncOpenAI
+from venue_enricher.async_engine import AsyncEngine, TokenBucket
+
+
+def _pack_unusable(body):
+    """Packed items come back invalid (confidence out of range); singles are fine."""
+    if len(body["messages"]) == 1:
+        return "Paris", "France", 7.0
+    return "Paris", "France", 0.9
+
+
+def test_pack_and_singles_share_one_deadline():
+    client = FakeAsyncOpenAI(resolver=_pack_unusable, latency_ms=300, sigma=0.0)
+    engine = AsyncEngine(client, TokenBucket(rpm=100000, tpm=10**8), deadline=0.4)
+    sem = asyncio.run_coroutine_threadsafe(_sem(), engine.loop).result()
+    started = time.monotonic()
+    (future,) = engine.resolve([("a", {"name": "A"}), ("b", {"name": "B"})], "m", sem, pack_size=2)
+    out = future.result(timeout=5)
+    # The re-ask only got what the packed call left of the 0.4s budget, not a fresh 0.4s.
+    assert time.monotonic() - started < 0.55
+    assert all(isinstance(v, asyncio.TimeoutError) for v in out.values())
+
+
+def test_singles_answer_within_the_remaining_budget():
+    client = FakeAsyncOpenAI(resolver=_pack_unusable, latency_ms=100, sigma=0.0)
+    engine = AsyncEngine(client, TokenBucket(rpm=100000, tpm=10**8), deadline=1.0)
+    sem = asyncio.run_coroutine_threadsafe(_sem(), engine.loop).result()
+    (future,) = engine.resolve([("a", {"name": "A"}), ("b", {"name": "B"})], "m", sem, pack_size=2)
+    out = future.result(timeout=5)
+    assert {k: (v.city, v.country) for k, v in out.items()} == {"a": ("Paris", "France"), "b": ("Paris", "France")}
+
+
+async def _sem() -> asyncio.Semaphore:
+    return asyncio.Semaphore(8)
+
+
+def test_bucket_allows_a_burst_then_asks_to_wait():
+    bucket = TokenBucket(rpm=60, tpm=10**6)
+    # Ten seconds of a 60 RPM budget: ten requests pass at once, the eleventh waits ~1s.
+    assert all(bucket.try_acquire(10) == 0.0 for _ in range(10))
+    assert 0.9 < bucket.try_acquire(10) <= 1.0
+
+
+def test_bucket_paces_tokens_and_lets_oversized_requests_through():
+    bucket = TokenBucket(rpm=10**6, tpm=600)  # burst of 100 tokens
+    assert bucket.try_acquire(80) == 0.0
+    assert bucket.try_acquire(80) > 0
+    fresh = TokenBucket(rpm=10**6, tpm=600)
+    assert fresh.try_acquire(10**6) == 0.0  # larger than the burst: capped, not refused forever
+
+
+def test_settle_charges_the_estimate_error():
+    bucket = TokenBucket(rpm=10**6, tpm=600)
+    assert bucket.try_acquire(10) == 0.0
+    bucket.settle(estimated=10, actual=100)  # the whole burst was spent
+    assert bucket.try_acquire(10) > 0
+
+
+def test_throttle_pauses_and_cuts_then_headers_recover():
+    bucket = TokenBucket(rpm=1000, tpm=10**6)
+    bucket.throttle(retry_after=0.5)
+    assert 0.4 < bucket.try_acquire(1) <= 0.5
+    assert bucket.rpm == 750 and bucket.throttled == 1
+    bucket.observe({})
+    assert bucket.rpm == 770
+
+
+def test_observe_adopts_tighter_server_limits():
+    bucket = TokenBucket(rpm=1000, tpm=10**6)
+    bucket.observe({"x-ratelimit-limit-requests": "100", "x-ratelimit-remaining-requests": "0"})
+    assert bucket.max_rpm == 100 and bucket.rpm == 100
+    assert bucket.try_acquire(1) > 0
+
+
+def test_engine_answers_every_key_of_a_batch():
+    client = FakeAsyncOpenAI(resolver=lambda body: ("Paris", "France", 0.9), latency_ms=1, sigma=0.0)
+    engine = AsyncEngine(client, TokenBucket(rpm=100000, tpm=10**8), deadline=5.0)
+    sem = asyncio.run_coroutine_threadsafe(_sem(), engine.loop).result()
+    items = [(f"k{i}", {"name": f"V{i}"}) for i in range(5)]
+    out = {}
+    for future in engine.resolve(items, "m", sem):
+        out.update(future.result(timeout=5))
+    assert sorted(out) == [f"k{i}" for i in range(5)] and client.calls == 5
+    assert all(a.tokens == a.prompt_tokens + a.completion_tokens > 0 for a in out.values())
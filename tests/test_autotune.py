@@ -0,0 +1,99 @@
+# file: tests/test_autotune.py
+from __future__ import annotations
+
+import pytest
+
+from venue_enricher import autotune
+from venue_enricher.autotune import AutoTuner, Knob
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = _Clock()
+    monkeypatch.setattr(autotune.time, "monotonic", c)
+    return c
+
+
+def _tuner(**kw):
+    opts = dict(min_window_seconds=1.0, min_window_requests=1)
+    opts.update(kw)
+    return AutoTuner(Knob(8, 1, 64), Knob(100, 10, 1000), **opts)
+
+
+def _stats(rows=100, requests=10, errors=0, keys=100):
+    return {"rows": rows, "model_requests": requests, "model_errors": errors, "model_keys": keys}
+
+
+def test_knob_clamps_to_bounds():
+    knob = Knob(500, 0, 64)
+    assert (knob.lo, knob.hi, knob.value) == (1, 64, 64)
+    assert knob.set(0.2) == 1
+    assert knob.set(10.6) == 11
+
+
+def test_no_decision_before_the_window_closes(clock):
+    tuner = _tuner(min_window_requests=20)
+    clock.now = 0.5
+    assert tuner.observe(_stats(), 0.5) is None
+    clock.now = 1.5
+    assert tuner.observe(_stats(requests=5), 0.5) is None  # 15 requests < 20
+    assert tuner.observe(_stats(requests=5), 0.5)["action"] == "increase"
+
+
+def test_additive_increase_then_revert_when_throughput_drops(clock):
+    tuner = _tuner()
+    clock.now = 1.0
+    first = tuner.observe(_stats(rows=100), 1.0)
+    assert first["action"] == "increase" and first["concurrency"] == 12
+    clock.now = 2.0
+    second = tuner.observe(_stats(rows=50), 1.0)
+    assert second["action"] == "revert" and second["concurrency"] == 8
+
+
+def test_multiplicative_backoff_on_errors_and_throttles(clock):
+    tuner = _tuner()
+    clock.now = 1.0
+    decision = tuner.observe(_stats(), 1.0, throttled_total=3)
+    assert decision["action"] == "increase"  # the first throttle count is only a baseline
+    clock.now = 2.0
+    decision = tuner.observe(_stats(errors=1), 1.0, throttled_total=4)
+    assert decision["action"] == "backoff"
+    assert decision["error_rate"] == 0.2
+    assert (decision["concurrency"], decision["batch_size"]) == (8, 70)
+
+
+def test_batch_size_follows_keys_per_batch_and_slow_batches(clock):
+    tuner = _tuner()
+    clock.now = 1.0
+    grow = tuner.observe(_stats(keys=2), 1.0)
+    assert grow["batch_size"] == 125  # 2 keys per batch < 12 slots
+    clock.now = 2.0
+    shrink = tuner.observe(_stats(rows=500), 30.0)
+    assert shrink["batch_size"] == 88  # slower than target_seconds
+
+
+def test_hold_when_nothing_reached_the_model(clock):
+    tuner = _tuner()
+    clock.now = 1.0
+    decision = tuner.observe(_stats(requests=0, keys=0), 0.1)
+    assert decision["action"] == "hold"
+    assert (decision["concurrency"], decision["batch_size"]) == (8, 100)
+
+
+def test_report_lists_bounds_and_recent_decisions(clock):
+    tuner = _tuner()
+    for i in range(3):
+        clock.now = i + 1.0
+        tuner.observe(_stats(rows=100 * (i + 1)), 1.0)
+    report = tuner.report(last=2)
+    assert report["concurrency"] == tuner.concurrency
+    assert report["bounds"] == {"concurrency": [1, 64], "batch_size": [10, 1000]}
+    assert len(report["decisions"]) == 2
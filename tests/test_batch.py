@@ -0,0 +1,93 @@
+# file: tests/test_batch.py
+from __future__ import annotations
+import json
+import sys
+
+import pytest
+
+from venue_enricher.batch import VENUE_COLUMNS, ResultBatch, VenueBatch, page_limit
+
+
+def _rows():
+    return [
+        {"id": "v1", "name": "Olympia", "city": "Paris", "country": "France"},
+        {"id": "v2", "name": "Paradiso", "city": None, "country": "Netherlands"},
+        {"id": "v3", "name": "Razzmatazz"},
+    ]
+
+
+def test_page_limit_accepts_fixed_or_callable_sizes():
+    assert page_limit(50) == 50
+    assert page_limit(lambda: 20) == 20
+    assert page_limit(0) == 1
+
+
+def test_venue_batch_from_rows_stores_columns():
+    batch = VenueBatch.from_rows(_rows())
+    assert len(batch) == 3 and batch
+    assert batch.columns == VENUE_COLUMNS
+    assert batch.column("id") == ["v1", "v2", "v3"]
+    assert batch.column("address") == [None, None, None]
+    assert not VenueBatch()
+
+
+def test_venue_row_reads_like_a_dict():
+    batch = VenueBatch.from_rows(_rows())
+    row = batch[1]
+    assert row["name"] == "Paradiso"
+    assert row.get("country") == "Netherlands"
+    assert row.get("missing", "x") == "x"
+    assert row.to_dict()["id"] == "v2"
+    assert batch[-1]["id"] == "v3"
+    assert [r["id"] for r in batch] == ["v1", "v2", "v3"]
+    with pytest.raises(IndexError):
+        batch[3]
+
+
+def test_venue_batch_interns_place_names():
+    city = "".join(["Par", "is"])
+    batch = VenueBatch.from_columns({"id": ["a"], "city": [city]})
+    assert batch.column("city")[0] is sys.intern("Paris")
+    assert batch.column("name") == [None]
+
+
+def test_venue_batch_append_values_slice_and_extend():
+    batch = VenueBatch(("id", "city"))
+    batch.append_values(("a", "Paris"))
+    batch.append_values(("b", "Lyon"))
+    batch.append_values(("c", "Nice"))
+    head = batch.slice(0, 2)
+    assert head.column("id") == ["a", "b"]
+    head.extend(batch.slice(2, 3))
+    assert head.column("city") == ["Paris", "Lyon", "Nice"]
+    assert batch.column("id") == ["a", "b", "c"]
+
+
+def test_result_batch_normalizes_updates():
+    updates = [
+        {"id": "v1", "city": " Paris ", "country": "France"},
+        {"id": "", "city": "Lyon", "country": "France"},
+        {"id": 7, "city": None, "country": "Spain"},
+    ]
+    out = ResultBatch.from_updates(updates)
+    assert list(out) == [("v1", "Paris", "France"), ("7", "", "Spain")]
+    assert ResultBatch.from_updates(out) is out
+    assert not ResultBatch()
+
+
+def test_result_batch_rows_and_ndjson():
+    out = ResultBatch()
+    out.append("v1", "Zürich", "Switzerland")
+    out.append("v2", 'Say "Hi"', None)
+    more = ResultBatch()
+    more.append("v3", "Bern", "Switzerland")
+    out.extend(more)
+    assert len(out) == 3
+    rows = list(out.rows(run_id="r1"))
+    assert rows[0] == {"id": "v1", "city": "Zürich", "country": "Switzerland", "run_id": "r1"}
+    lines = out.to_ndjson().getvalue().decode("utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"id": "v1", "city": "Zürich", "country": "Switzerland"},
+        {"id": "v2", "city": 'Say "Hi"', "country": ""},
+        {"id": "v3", "city": "Bern", "country": "Switzerland"},
+    ]
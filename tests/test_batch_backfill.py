@@ -0,0 +1,94 @@
+# file: tests/test_batch_backfill.py
+from __future__ import annotations
+import os
+import tempfile
+
+import pytest
+
+from fakes import FakeBatchClient, SQLiteBigQueryIO
+from venue_enricher.batch_backfill import Backfill, BackfillState
+
+
+def _rows(n):
+    return [{"id": f"v{i:03d}", "name": f"Venue {i}", "address": "1 Rue X"} for i in range(n)]
+
+
+def _paris(body):
+    return "Paris", "France", 0.9
+
+
+def _backfill(tmp_path, client, n=10, **kw):
+    io = SQLiteBigQueryIO(str(tmp_path / "bq.sqlite"))
+    io.load(_rows(n))
+    state = BackfillState(str(tmp_path / "state.sqlite"))
+    return io, state, Backfill(io, client, state, model="m", **kw)
+
+
+def test_submit_pages_by_cursor_and_wraps(tmp_path):
+    io, state, bf = _backfill(tmp_path, FakeBatchClient(polls_to_complete=99), rows_per_file=3, max_open_jobs=2)
+    assert bf.submit() == 6
+    assert state.cursor("pending") == "v005"
+    # Room frees up only when jobs finish; the next scan starts after the cursor.
+    starts = []
+    scan = io.iter_rows
+    io.iter_rows = lambda **kw: starts.append(kw["after_id"]) or scan(**kw)
+    state.conn.execute("UPDATE jobs SET status='applied'")
+    assert bf.submit() == 4
+    assert starts == ["v005"]
+    assert state.cursor("pending") is None
+
+
+def test_errored_rows_are_released_and_resubmitted(tmp_path):
+    def flaky(body):
+        if "Venue 3" in body["messages"][-1]["content"]:
+            raise RuntimeError("boom")
+        return _paris(body)
+
+    io, state, bf = _backfill(tmp_path, FakeBatchClient(resolver=flaky), n=5)
+    assert bf.step()["submitted"] == 5
+    out = bf.step()
+    assert out["updated"] == 4
+    assert io.count_pending() == 1
+    # The errored row lost its mark, so the same tick submitted it again.
+    assert out["submitted"] == 1
+    assert state.is_submitted("v003")
+
+
+def test_cancelling_batches_are_polled_to_a_final_state(tmp_path):
+    io, state, bf = _backfill(tmp_path, FakeBatchClient(resolver=_paris), n=3)
+    bf.submit()
+    job = state.jobs("validating")[0]
+    state.set_batch(job["input_file_id"], job["batch_id"], "cancelling")
+    bf.poll()
+    assert state.jobs("cancelling") == []
+    assert bf.apply() == 3
+
+
+def test_temp_file_removed_when_upload_fails(tmp_path, monkeypatch):
+    client = FakeBatchClient(root=str(tmp_path))
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+    os.makedirs(tempfile.tempdir)
+
+    def refuse(file, purpose):
+        raise ConnectionError("upload failed")
+
+    client.files.create = refuse
+    _, _, bf = _backfill(tmp_path, client, n=3)
+    with pytest.raises(ConnectionError):
+        bf.submit()
+    assert os.listdir(tempfile.tempdir) == []
+
+
+def test_partial_answers_are_released(tmp_path):
+    def no_country(body):
+        if "Venue 2" in body["messages"][-1]["content"]:
+            return "Paris", "", 0.6
+        return _paris(body)
+
+    io, state, bf = _backfill(tmp_path, FakeBatchClient(resolver=no_country), n=4)
+    bf.submit()
+    bf.poll()
+    bf.apply()
+    # The city landed but the row is still pending, so it must not stay marked.
+    assert io.count_pending() == 1
+    assert not state.is_submitted("v002") and state.is_submitted("v001")
@@ -0,0 +1,140 @@
+# file: tests/test_bq_io.py
+"""BigQueryIO's real SQL and parameters, run against a client that records jobs."""
+from __future__ import annotations
+import json
+
+import pytest
+
+from fakes import RecordingBigQueryClient
+from venue_enricher import io_bigquery
+from venue_enricher.batch import ResultBatch
+from venue_enricher.bq_io import _IOS, UNNEST_MAX_ROWS, BigQueryIO
+
+
+def _io(client, **kw):
+    return BigQueryIO("p", "d", "venues", client=client, **kw)
+
+
+def _params(job_config):
+    return {p.name: p for p in job_config.query_parameters}
+
+
+def _struct_rows(param):
+    rows = param.to_api_repr()["parameterValue"]["arrayValues"]
+    return [{k: v.get("value") for k, v in r["structValues"].items()} for r in rows]
+
+
+def _updates(n=2):
+    out = ResultBatch()
+    for i in range(n):
+        out.append(f"v{i}", "Paris" if i % 2 == 0 else "", "France")
+    return out
+
+
+def test_legacy_update_assigns_values_as_given(monkeypatch):
+    client = RecordingBigQueryClient(affected=2)
+    monkeypatch.setitem(_IOS, ("p", "d", "venues", None), _io(client))
+    updates = [{"id": 1, "city": "Paris", "country": None}, {"id": "v2", "city": "", "country": "France"}]
+    assert io_bigquery.update_locations("p", "d", "venues", updates) == 2
+    sql, config = client.queries[0]
+    assert "T.city = R.city" in sql and "T.last_updated = CURRENT_TIMESTAMP()" in sql
+    assert "IFNULL" not in sql and "IS DISTINCT FROM" not in sql
+    assert _struct_rows(_params(config)["rows"]) == [
+        {"id": "1", "city": "Paris", "country": None},
+        {"id": "v2", "city": "", "country": "France"},
+    ]
+
+
+def test_touch_column_is_opt_in():
+    client = RecordingBigQueryClient()
+    _io(client).update_locations(_updates(), overwrite=False)
+    assert "CURRENT_TIMESTAMP" not in client.queries[0][0]
+    _io(client, touch_column="last_updated").update_locations(_updates(), overwrite=False)
+    assert "last_updated = CURRENT_TIMESTAMP()" in client.queries[1][0]
+
+
+def test_unnest_update_is_one_guarded_job():
+    client = RecordingBigQueryClient(affected=1)
+    assert _io(client).update_locations(_updates(), overwrite=False) == 1
+    assert [op for op, _ in client.calls] == ["query"]
+    sql, config = client.queries[0]
+    assert "UPDATE `p.d.venues` T" in sql and "FROM UNNEST(@rows) AS S" in sql
+    assert "city    = IFNULL(NULLIF(S.city, ''), T.city)" in sql
+    assert "T.city   IS DISTINCT FROM S.city" in sql
+    assert _struct_rows(_params(config)["rows"]) == [
+        {"id": "v0", "city": "Paris", "country": "France"},
+        {"id": "v1", "city": "", "country": "France"},
+    ]
+    _io(client).update_locations(_updates(), overwrite=True)
+    assert "WHERE T.id = S.id AND TRUE" in client.queries[1][0]
+
+
+def test_large_writes_load_a_temp_table_and_merge():
+    client = RecordingBigQueryClient(affected=UNNEST_MAX_ROWS + 1)
+    assert _io(client).update_locations(_updates(UNNEST_MAX_ROWS + 1), overwrite=False) == UNNEST_MAX_ROWS + 1
+    ops = [op for op, _ in client.calls]
+    assert ops == ["create_table", "load", "query", "delete_table"]
+    table = client.calls[0][1]
+    tmp = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    assert table.table_id.startswith("_tmp_enrich_")
+    destination, payload, load_config = client.calls[1][1]
+    assert destination == tmp and load_config.write_disposition == "WRITE_TRUNCATE"
+    lines = [json.loads(line) for line in payload.decode("utf-8").splitlines()]
+    assert len(lines) == UNNEST_MAX_ROWS + 1 and lines[1] == {"id": "v1", "city": "", "country": "France"}
+    sql, _ = client.queries[0]
+    assert f"MERGE `p.d.venues` T\n            USING `{tmp}` S" in sql
+    assert "WHEN MATCHED AND" in sql and "IS DISTINCT FROM" in sql
+    assert client.calls[3][1] == tmp
+
+
+def test_temp_table_is_dropped_when_the_merge_fails():
+    class FailingMerge(RecordingBigQueryClient):
+        def query(self, sql, job_config=None, location=None):
+            raise RuntimeError("merge failed")
+
+    client = FailingMerge()
+    with pytest.raises(RuntimeError):
+        _io(client).update_locations(_updates(UNNEST_MAX_ROWS + 1), overwrite=False, strategy="merge")
+    assert [op for op, _ in client.calls] == ["create_table", "load", "delete_table"]
+
+
+def test_changelog_is_appended_then_merged_from_the_watermark():
+    client = RecordingBigQueryClient(
+        results={"MAX(value)": [(None,)], "@@row_count": [{"affected": 2, "watched": ["v1"]}]}
+    )
+    io = _io(client)
+    assert io.append_staged(_updates()) == 2
+    created = [t for op, t in client.calls if op == "create_table"]
+    assert [t.table_id for t in created] == ["venues_enrich_changelog", "venues_enrich_watermark"]
+    assert created[0].time_partitioning.field == "staged_at"
+    table, rows = next(args for op, args in client.calls if op == "insert")
+    assert table == "p.d.venues_enrich_changelog"
+    assert [r["id"] for r in rows] == ["v0", "v1"] and all(r["staged_at"] for r in rows)
+
+    assert io.merge_staged(["v1", "v0"]) == (2, {"v1"})
+    sql, config = client.queries[-1]
+    assert "FROM `p.d.venues_enrich_changelog`" in sql and "USING _enrich_staged S" in sql
+    assert "QUALIFY ROW_NUMBER() OVER (PARTITION BY id ORDER BY staged_at DESC) = 1" in sql
+    # No upper bound: an id's newest staged value always wins over older overlap rows.
+    assert "@until" not in sql
+    params = _params(config)
+    assert params["since"].value.year == 1970 and params["watch"].values == ["v0", "v1"]
+    mark = next(args for op, args in reversed(client.calls) if op == "insert")
+    assert mark[0] == "p.d.venues_enrich_watermark" and mark[1][0]["kind"] == "changelog"
+    until = mark[1][0]["value"]
+
+    # The next apply starts from the mark it just wrote, without reading it back.
+    reads = len([q for q in client.queries if "MAX(value)" in q[0]])
+    assert io.apply_staged() == 2
+    assert len([q for q in client.queries if "MAX(value)" in q[0]]) == reads
+    assert _params(client.queries[-1][1])["since"].value.isoformat() == until
+
+
+def test_parquet_merge_is_one_script_job():
+    client = RecordingBigQueryClient(results={"LOAD DATA": [{"affected": 7}]})
+    assert _io(client).merge_parquet("gs://bucket/results.parquet") == 7
+    sql, _ = client.queries[0]
+    assert "FROM FILES (format = 'PARQUET', uris = ['gs://bucket/results.parquet'])" in sql
+    assert "USING _enrich_results S" in sql
+    with pytest.raises(ValueError):
+        _io(client).merge_parquet("/local/file.parquet")
@@ -0,0 +1,72 @@
+# file: tests/test_cache.py
+from __future__ import annotations
+import time
+
+from venue_enricher.cache import EnrichmentCache, LRUCache, TieredCache, remote_tier
+
+VALUE = ("Paris", "France", 0.9, "address")
+
+
+def test_lru_entries_expire():
+    lru = LRUCache(10, ttl_seconds=60)
+    lru.put("fresh", VALUE)
+    lru.put("old", VALUE, created_at=time.time() - 120)
+    assert lru.get("fresh") == VALUE
+    assert lru.get("old") is None and lru.expired == 1 and len(lru) == 1
+
+
+def test_tiered_cache_keeps_store_age(tmp_path):
+    store = EnrichmentCache(str(tmp_path / "c.sqlite"), ttl_seconds=60)
+    store.put("k", *VALUE)
+    store.conn.execute("UPDATE cache_v2 SET created_at = created_at - 50")
+    store.flush()
+    cache = TieredCache(store)
+    assert cache.get_many(["k"]) == {"k": VALUE}
+    # Promoted with the store's created_at, so it expires with it, not a full TTL later.
+    _, created_at = cache.lru._data["k"]
+    assert abs(created_at - (time.time() - 50)) < 5
+
+
+def test_eviction_runs_during_writes(tmp_path):
+    store = EnrichmentCache(str(tmp_path / "c.sqlite"), max_rows=5, commit_every=1, evict_interval=0)
+    for i in range(20):
+        store.put(f"k{i}", *VALUE)
+    (rows,) = store.conn.execute("SELECT COUNT(*) FROM cache_v2").fetchone()
+    assert rows <= 6
+
+
+def test_fingerprint_keeps_non_latin_names_apart():
+    fp = EnrichmentCache.fingerprint
+    tokyo, moscow = fp({"name": "東京ドーム"}), fp({"name": "Москва Арена"})
+    assert tokyo and moscow and tokyo != moscow
+    assert fp({"name": "ＭＯＳＣＯＷ  Arena!"}) == fp({"name": "moscow arena"})  # NFKC + casefold
+
+
+def test_fingerprint_covers_every_prompt_field():
+    fp = EnrichmentCache.fingerprint
+    a = fp({"name": "The Grand", "domain": "grand-paris.fr"})
+    b = fp({"name": "The Grand", "domain": "grandhotel.co.uk"})
+    assert a != b
+    assert fp({"name": "The Grand", "domain": "grand-paris.fr", "id": "x"}) == a
+
+
+def test_blank_rows_have_no_key():
+    assert EnrichmentCache.fingerprint({"id": "v1", "name": "", "address": None}) is None
+    assert EnrichmentCache.fingerprint({"name": " -- "}) is None
+
+
+def test_gcs_tier_bounds_every_transfer(monkeypatch):
+    calls = []
+
+    class Blob:
+        def download_to_filename(self, dest, timeout=None):
+            calls.append(("download", timeout))
+
+        def upload_from_filename(self, src, timeout=None):
+            calls.append(("upload", timeout))
+
+    tier = remote_tier("gs://bucket/cache.sqlite", timeout=7.5)
+    monkeypatch.setattr(tier, "_blob", lambda: Blob())
+    assert tier.pull("/dev/null") is True
+    tier.push("/dev/null")
+    assert calls == [("download", 7.5), ("upload", 7.5)]
@@ -0,0 +1,39 @@
+# file: tests/test_cascade.py
+from __future__ import annotations
+
+from venue_enricher.async_engine import Answer
+from venue_enricher.cascade import Tier, parse_tiers, tier_report
+
+
+def test_parse_tiers_reads_threshold_and_budget():
+    assert parse_tiers("gpt-4o-mini:0.8, gpt-4o:0:2000", "x") == [
+        Tier("gpt-4o-mini", 0.8), Tier("gpt-4o", 0.0, 2000)
+    ]
+    assert parse_tiers("solo", "x") == [Tier("solo")]
+
+
+def test_empty_spec_is_the_default_model():
+    assert parse_tiers("", "gpt-4o-mini") == [Tier("gpt-4o-mini")]
+    assert parse_tiers(" , ", "gpt-4o-mini") == [Tier("gpt-4o-mini")]
+
+
+def test_tier_accepts_only_complete_confident_answers():
+    tier = Tier("m", threshold=0.7)
+    assert tier.accepts(Answer("Paris", "France", 0.7))
+    assert not tier.accepts(Answer("Paris", "France", 0.69))
+    assert not tier.accepts(Answer("Paris", "", 0.99))
+
+
+def test_budget_zero_is_unlimited():
+    assert Tier("m").has_room(10**9)
+    assert Tier("m", budget=2).has_room(1) and not Tier("m", budget=2).has_room(2)
+
+
+def test_tier_report_reads_per_tier_stats():
+    stats = {"tier0_keys": 4, "tier0_accepted": 3, "tier0_requests": 2, "tier0_ms": 300,
+             "tier0_tokens": 900, "tier1_keys": 1, "tier1_errors": 1}
+    cheap, strong = tier_report([Tier("cheap", 0.8), Tier("strong")], stats)
+    assert cheap == {"model": "cheap", "keys": 4, "accepted": 3, "errors": 0,
+                     "requests": 2, "tokens": 900, "avg_latency_ms": 150.0}
+    assert strong["errors"] == 1 and strong["avg_latency_ms"] == 0.0
+    assert tier_report([Tier("m")], None)[0]["keys"] == 0
@@ -0,0 +1,19 @@
+# file: tests/test_dedup.py
+from __future__ import annotations
+
+from venue_enricher.dedup import group_by_key, is_solo
+from venue_enricher.enricher import _row_key
+
+
+def test_blank_and_non_latin_rows_are_never_grouped():
+    rows = [
+        {"id": "a", "name": "東京ドーム"},
+        {"id": "b", "name": "Москва Арена"},
+        {"id": "c", "name": ""},
+        {"id": "d", "name": "", "address": ""},
+        {"id": "e", "name": "東京ドーム"},
+    ]
+    groups = group_by_key(rows, _row_key)
+    ids = sorted([r["id"] for r in g] for g in groups.values())
+    assert ids == [["a", "e"], ["b"], ["c"], ["d"]]
+    assert sum(is_solo(k) for k in groups) == 2
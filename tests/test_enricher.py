@@ -0,0 +1,143 @@
+# file: tests/test_enricher.py
+from __future__ import annotations
+import threading
+
+import pytest
+
+from fakes import FakeAsyncOpenAI
+from venue_enricher import enricher
+from venue_enricher.async_engine import AsyncEngine, TokenBucket
+from venue_enricher.cascade import Tier
+from venue_enricher.dedup import InFlight
+
+
+def _field(body, name):
+    for line in body["messages"][-1]["content"].splitlines():
+        key, _, value = line.partition(":")
+        if key.strip() == name:
+            return value.strip()
+    return ""
+
+
+def _answers(body):
+    """Cheap tier is unsure about "Hard" venues; the strong tier knows them."""
+    name = _field(body, "name")
+    if name.startswith("Hard") and body.get("model") == "cheap":
+        return "Paris", "", 0.4
+    return "Paris", "France", 0.9
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    client = FakeAsyncOpenAI(resolver=_answers, latency_ms=5, sigma=0.0)
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+    monkeypatch.setattr(
+        enricher, "_ENGINE", AsyncEngine(client, TokenBucket(rpm=100000, tpm=10**8), deadline=5.0)
+    )
+    return client
+
+
+def _row(rid, name="Olympia", address="28 Bd des Capucines"):
+    return {"id": rid, "name": name, "address": address}
+
+
+def _by_id(results):
+    return {rid: (city, country) for rid, city, country in results}
+
+
+def test_duplicates_cost_one_call(fake):
+    rows = [_row("a"), _row("b"), _row("c"), _row("d", name="Bataclan")]
+    stats = {}
+    out = _by_id(enricher.enrich_batch(rows, "cheap", in_flight=InFlight(), stats=stats))
+    assert set(out) == {"a", "b", "c", "d"}
+    assert stats["unique"] == 2 and stats["model_keys"] == 2
+    assert fake.calls == 2
+
+
+def test_joined_key_takes_the_owner_answer(fake):
+    in_flight = InFlight()
+    key = enricher._row_key(_row("x"))
+    fut, owner = in_flight.claim(key)  # another batch owns the key
+    assert owner
+    out = {}
+    t = threading.Thread(target=lambda: out.update(
+        _by_id(enricher.enrich_batch([_row("a")], "cheap", in_flight=in_flight, join_timeout=5.0))
+    ))
+    t.start()
+    in_flight.resolve(key, ("Paris", "France", True))
+    t.join(5.0)
+    assert out == {"a": ("Paris", "France")}
+    assert fake.calls == 0
+
+
+def test_joined_key_stays_pending_when_owner_fails(fake):
+    in_flight = InFlight()
+    key = enricher._row_key(_row("x"))
+    in_flight.claim(key)  # another batch owns the key, and its call fails
+    stats = {}
+    threading.Timer(0.1, in_flight.fail, (key, RuntimeError("owner failed"))).start()
+    out = enricher.enrich_batch([_row("a")], "cheap", in_flight=in_flight, stats=stats, join_timeout=5.0)
+    assert len(out) == 0
+    assert stats["joined_in_flight"] == 1 and stats["model_errors"] == 1
+
+
+def test_joined_wait_is_bounded(fake):
+    in_flight = InFlight()
+    in_flight.claim(enricher._row_key(_row("x")))  # never settled
+    stats = {}
+    out = enricher.enrich_batch([_row("a")], "cheap", in_flight=in_flight, stats=stats, join_timeout=0.1)
+    assert len(out) == 0 and stats["join_timeouts"] == 1
+
+
+def test_owned_keys_are_failed_when_the_batch_raises(fake):
+    class BrokenCache:
+        def get_many(self, keys):
+            return {}
+
+        def put(self, key, value):
+            raise OSError("disk full")
+
+    in_flight = InFlight()
+    key = enricher._row_key(_row("a"))
+    with pytest.raises(OSError):
+        enricher.enrich_batch([_row("a")], "cheap", cache=BrokenCache(), in_flight=in_flight)
+    fut, owner = in_flight.claim(key)
+    assert owner  # the claim was released, so later batches are not stuck joining it
+
+
+def test_weak_answers_escalate_to_the_next_tier(fake):
+    rows = [_row("easy", name="Olympia"), _row("hard", name="Hard Rock Live")]
+    stats = {}
+    tiers = [Tier("cheap", threshold=0.8), Tier("strong")]
+    out = _by_id(enricher.enrich_batch(rows, "cheap", in_flight=None, stats=stats, tiers=tiers))
+    assert out == {"easy": ("Paris", "France"), "hard": ("Paris", "France")}
+    assert stats["tier0_keys"] == 2 and stats["tier0_accepted"] == 1
+    assert stats["tier1_keys"] == 1 and stats["tier1_accepted"] == 1
+
+
+def test_escalation_budget_keeps_the_best_answer(fake):
+    rows = [_row("h1", name="Hard One"), _row("h2", name="Hard Two")]
+    stats = {}
+    tiers = [Tier("cheap", threshold=0.8), Tier("strong", budget=1)]
+    out = _by_id(enricher.enrich_batch(rows, "cheap", in_flight=None, stats=stats, tiers=tiers))
+    assert stats["tier1_keys"] == 1
+    assert sorted(out.values()) == [("Paris", ""), ("Paris", "France")]
+
+
+def test_keyless_rows_are_never_shared_across_batches(fake):
+    in_flight = InFlight()
+    blank = {"id": "a", "name": "", "address": ""}
+    in_flight.claim("solo:0")  # whatever another batch holds, a blank row must not join it
+    stats = {}
+    out = _by_id(enricher.enrich_batch([blank, dict(blank, id="b")], "cheap", in_flight=in_flight, stats=stats))
+    assert set(out) == {"a", "b"}
+    assert stats["unique"] == 2 and stats["joined_in_flight"] == 0
+    assert fake.calls == 2
+    assert list(in_flight._pending) == ["solo:0"]
+
+
+def test_non_latin_venues_get_their_own_answers(fake):
+    rows = [_row("a", name="東京ドーム", address=""), _row("b", name="Москва Арена", address="")]
+    stats = {}
+    enricher.enrich_batch(rows, "cheap", in_flight=InFlight(), stats=stats)
+    assert stats["unique"] == 2 and fake.calls == 2
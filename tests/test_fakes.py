@@ -0,0 +1,69 @@
+# file: tests/test_fakes.py
+"""
+SQLiteBigQueryIO keeps the write guards the benchmarks rely on. Production SQL is
+checked in test_bq_io.py.
+"""
+from __future__ import annotations
+
+import pytest
+
+from fakes import SQLiteBigQueryIO
+from venue_enricher.batch import ResultBatch
+from venue_enricher.bq_io import UNNEST_MAX_ROWS
+
+
+def _io(tmp_path, n=4):
+    io = SQLiteBigQueryIO(str(tmp_path / "bq.sqlite"))
+    rows = [{"id": f"v{i}", "name": f"Venue {i}"} for i in range(n)]
+    rows[0].update(city="Lyon", country="France")  # already enriched
+    rows[1].update(city="Nice")  # half enriched
+    io.load(rows)
+    return io
+
+
+def _located(io):
+    return {r[0]: (r[1], r[2]) for r in io.conn.execute("SELECT id, city, country FROM venues ORDER BY id")}
+
+
+def _updates():
+    out = ResultBatch()
+    out.append("v0", "Lyon", "France")
+    out.append("v1", "", "France")
+    out.append("v2", "Berlin", "Germany")
+    out.append("v3", "", "")
+    return out
+
+
+@pytest.mark.parametrize("strategy", ["unnest", "merge"])
+def test_write_paths_share_the_merge_guards(tmp_path, strategy):
+    io = _io(tmp_path)
+    assert io.update_locations(_updates(), overwrite=False, strategy=strategy) == 2
+    assert _located(io) == {
+        "v0": ("Lyon", "France"),  # an unchanged answer is not a write
+        "v1": ("Nice", "France"),  # blanks never clobber a stored value
+        "v2": ("Berlin", "Germany"),
+        "v3": (None, None),  # an empty answer is not written
+    }
+    ops = set(io.pop_timings())
+    assert ("update_unnest" in ops) == (strategy == "unnest")
+    assert ("merge" in ops) == (strategy == "merge")
+
+
+@pytest.mark.parametrize("strategy", ["unnest", "merge"])
+def test_overwrite_rewrites_matching_rows(tmp_path, strategy):
+    io = _io(tmp_path)
+    assert io.update_locations(_updates(), overwrite=True, strategy=strategy) == 4
+    assert _located(io)["v1"] == ("Nice", "France")  # still no blank clobbering
+
+
+def test_auto_switches_to_merge_above_the_unnest_limit(tmp_path):
+    io = _io(tmp_path, n=UNNEST_MAX_ROWS + 2)
+    big = ResultBatch()
+    for i in range(1, UNNEST_MAX_ROWS + 2):
+        big.append(f"v{i}", "Paris", "France")
+    assert io.update_locations(big, overwrite=False) == UNNEST_MAX_ROWS + 1
+    assert "merge" in io.pop_timings()
+    small = ResultBatch()
+    small.append("v0", "Paris", "France")
+    io.update_locations(small, overwrite=True)
+    assert "update_unnest" in io.pop_timings()
@@ -0,0 +1,49 @@
+# file: tests/test_gpt_client.py
+from __future__ import annotations
+from types import SimpleNamespace
+
+import pytest
+
+from venue_enricher.gpt_client import GPTClient
+from venue_enricher.prompts import PACKED_SYSTEM_PROMPT
+from venue_enricher.resilience import Resilience
+
+
+def _client(content):
+    reply = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+    gpt = GPTClient.__new__(GPTClient)
+    gpt.client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **_: reply))
+    )
+    gpt.model, gpt.max_tokens, gpt.prompt_version = "m", 64, "v1"
+    gpt.resilience = Resilience()
+    return gpt
+
+
+ROW = {"id": "v1", "name": "Olympia", "address": "28 Bd des Capucines, Paris"}
+
+
+def test_valid_answer_is_normalized():
+    out = _client('{"city": " Paris ", "country": "france", "confidence": 0.9, "evidence": "addr"}').extract(ROW)
+    assert (out.city, out.country, out.confidence) == ("Paris", "France", 0.9)
+
+
+@pytest.mark.parametrize("content", ["", "not json", '{"city": 3}', '{"city": "Paris", "country": "FR", "confidence": 7}'])
+def test_malformed_answer_raises_instead_of_blank(content):
+    with pytest.raises(ValueError):
+        _client(content).extract(ROW)
+
+
+def test_one_failed_fallback_does_not_discard_the_pack():
+    good = '{"city": "Paris", "country": "France", "confidence": 0.9, "evidence": "addr"}'
+    packed = '{"items": [{"id": "0", "city": "Lyon", "country": "France", "confidence": 0.8, "evidence": "addr"}]}'
+
+    def create(**body):
+        system, user = body["messages"][0]["content"], body["messages"][-1]["content"]
+        content = packed if system == PACKED_SYSTEM_PROMPT else "oops" if "Broken" in user else good
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    gpt = _client("")
+    gpt.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    out = gpt.extract_many([ROW, {"id": "v2", "name": "Broken"}, {"id": "v3", "name": "Fine"}])
+    assert out[0].city == "Lyon" and out[1] is None and out[2].city == "Paris"
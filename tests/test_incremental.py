@@ -0,0 +1,43 @@
+# file: tests/test_incremental.py
+from __future__ import annotations
+import time
+
+from fakes import SQLiteBigQueryIO
+from venue_enricher.batch import ResultBatch
+from venue_enricher.incremental import PendingCounter
+
+
+def _rows(start, n):
+    return [{"id": f"v{i}", "name": f"Venue {i}", "address": ""} for i in range(start, start + n)]
+
+
+def _tick():
+    # The fake stamps change times at one-second resolution.
+    time.sleep(1.1)
+
+
+def test_pending_counter_does_not_recount_partial_writes(tmp_path):
+    io = SQLiteBigQueryIO(str(tmp_path / "bq.sqlite"))
+    io.load(_rows(0, 10))
+    counter = PendingCounter(io, max_age=3600)
+    assert counter.exact()["pending"] == 10
+    _tick()
+
+    # A partial answer bumps last_updated but leaves the row pending: no change.
+    partial = ResultBatch()
+    partial.append("v1", "Paris", "")
+    assert io.update_locations(partial, overwrite=False) == 1
+    counter.written(0)
+    io.load(_rows(10, 2))
+    _tick()
+    assert counter.get()["pending"] == 12 == io.count_pending()
+
+    # Completing that row (touched again) and another one: both leave the set.
+    done = ResultBatch()
+    done.append("v1", "Paris", "France")
+    done.append("v2", "Lyon", "France")
+    assert io.update_locations(done, overwrite=False) == 2
+    counter.written(2)
+    _tick()
+    view = counter.get()
+    assert view["approximate"] and view["pending"] == 10 == io.count_pending()
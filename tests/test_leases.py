@@ -0,0 +1,108 @@
+# file: tests/test_leases.py
+from __future__ import annotations
+import time
+
+import pytest
+from google.api_core.exceptions import BadRequest
+
+from fakes import RecordingBigQueryClient
+from venue_enricher.leases import BigQueryLeaseStore, LeaseKeeper, LeaseLost, SQLiteLeaseStore
+
+
+def test_expired_lease_is_taken_over_with_its_cursor(tmp_path):
+    store = SQLiteLeaseStore(str(tmp_path / "leases.sqlite"))
+    first = store.acquire("pending", 1, "a", ttl=60)
+    store.release(first, "v10")
+
+    stalled = store.acquire("pending", 1, "b", ttl=0.2)
+    assert stalled.cursor == "v10"
+    assert store.acquire("pending", 1, "c", ttl=60) is None  # still held
+    time.sleep(0.3)
+
+    taken = store.acquire("pending", 1, "c", ttl=60)
+    assert (taken.shard, taken.cursor) == (0, "v10")
+    # The stalled holder can neither renew nor release the new owner's lease.
+    assert store.renew(stalled, 60) is False
+    store.release(stalled, "v99")
+    assert store.acquire("pending", 1, "d", ttl=60) is None
+
+
+def test_keeper_reports_loss_once_renewals_stop(tmp_path):
+    store = SQLiteLeaseStore(str(tmp_path / "leases.sqlite"))
+    lease = store.acquire("pending", 2, "a", ttl=0.3)
+    keeper = LeaseKeeper(store, lease, ttl=0.3)  # not entered: no renewals run
+    keeper.check()
+    time.sleep(0.3)
+    with pytest.raises(LeaseLost):
+        keeper.check()
+
+
+def test_keeper_renews_and_releases(tmp_path):
+    store = SQLiteLeaseStore(str(tmp_path / "leases.sqlite"))
+    lease = store.acquire("pending", 1, "a", ttl=0.3)
+    with LeaseKeeper(store, lease, ttl=0.3) as keeper:
+        time.sleep(0.5)
+        keeper.check()
+        keeper.cursor = "v5"
+    again = store.acquire("pending", 1, "b", ttl=60)
+    assert again.cursor == "v5"
+
+
+class ConflictingClient(RecordingBigQueryClient):
+    """Fails DML whose SQL contains `conflict_on` with BigQuery's concurrent-update error."""
+
+    def __init__(self, conflict_on, **kw):
+        super().__init__(**kw)
+        self.conflict_on = conflict_on
+
+    def query(self, sql, job_config=None, location=None):
+        if self.conflict_on and self.conflict_on in sql:
+            self.calls.append(("conflict", sql))
+            raise BadRequest("Could not serialize access to table due to concurrent update")
+        return super().query(sql, job_config, location)
+
+
+def _bq_store(client):
+    return BigQueryLeaseStore("p", "d", "venues", client=client)
+
+
+def _merges(client):
+    return [sql for sql, _ in client.queries if "MERGE" in sql]
+
+
+def test_bigquery_store_seeds_shard_rows_once():
+    client = RecordingBigQueryClient(affected=1, results={"COUNT(*)": [(0,)], "SELECT shard": [(2, "v9")]})
+    store = _bq_store(client)
+    lease = store.acquire("pending", 4, "a", ttl=60)
+    assert (lease.shard, lease.cursor) == (2, "v9")
+    store.acquire("pending", 4, "b", ttl=60)
+    assert len(_merges(client)) == 1
+    assert len([sql for sql, _ in client.queries if "CREATE TABLE" in sql]) == 1
+
+
+def test_bigquery_store_skips_seeding_when_rows_exist():
+    client = RecordingBigQueryClient(affected=1, results={"COUNT(*)": [(4,)], "SELECT shard": [(0, None)]})
+    _bq_store(client).acquire("pending", 4, "a", ttl=60)
+    assert _merges(client) == []
+
+
+def test_concurrent_seeding_counts_as_not_acquired():
+    client = ConflictingClient("MERGE", affected=1, results={"COUNT(*)": [(0,)], "SELECT shard": [(0, None)]})
+    store = _bq_store(client)
+    assert store.acquire("pending", 4, "a", ttl=60) is None
+    client.conflict_on = None  # the other instance finished; the next acquire seeds and claims
+    assert store.acquire("pending", 4, "a", ttl=60).shard == 0
+
+
+def test_conflicting_claim_moves_on_and_other_errors_surface():
+    client = ConflictingClient("SET owner = @owner", affected=1,
+                               results={"COUNT(*)": [(2,)], "SELECT shard": [(0, None), (1, None)]})
+    assert _bq_store(client).acquire("pending", 2, "a", ttl=60) is None
+    assert len([op for op, _ in client.calls if op == "conflict"]) == 2
+
+    class Broken(RecordingBigQueryClient):
+        def query(self, sql, job_config=None, location=None):
+            raise BadRequest("Syntax error")
+
+    with pytest.raises(BadRequest):
+        _bq_store(Broken()).acquire("pending", 2, "a", ttl=60)
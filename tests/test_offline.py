@@ -0,0 +1,122 @@
+# file: tests/test_offline.py
+from __future__ import annotations
+import json
+
+import pytest
+
+from venue_enricher import offline
+from venue_enricher.batch import ResultBatch, VenueBatch
+from venue_enricher.cache import EnrichmentCache
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+ROWS = [
+    {"id": "v1", "name": "Olympia", "address": "28 Bd des Capucines, 75009 Paris, France"},
+    {"id": "v2", "name": "Olympia", "address": "28 Bd des Capucines, 75009 Paris, France"},
+    {"id": "v3", "name": "Paradiso", "address": "Weteringschans 6, Amsterdam, Netherlands"},
+    {"id": "v4", "name": "Mystery Club", "address": "Unit 4"},
+]
+
+
+def _write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows), encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def workers(monkeypatch):
+    """Install worker globals in this process, as _init_worker does in the pool."""
+
+    def _install(cache_kwargs=None, min_confidence=None, heuristic=False):
+        monkeypatch.setattr(offline, "_cache", None)
+        monkeypatch.setattr(offline, "_resolver", None)
+        monkeypatch.setattr(offline, "_heuristic", False)
+        offline._init_worker(cache_kwargs, min_confidence, heuristic)
+
+    return _install
+
+
+def test_detect_format_from_extension():
+    assert offline.detect_format("a/export.PARQUET") == "parquet"
+    assert offline.detect_format("x.ndjson") == "jsonl"
+    assert offline.detect_format("x.csv") == "csv"
+    with pytest.raises(ValueError):
+        offline.detect_format("x.xlsx")
+
+
+def test_read_chunks_jsonl_splits_pages(tmp_path):
+    path = _write_jsonl(tmp_path / "in.jsonl", ROWS + [{"id": "v5", "extra": 1}])
+    pages = list(offline.read_chunks(path, chunk_rows=2))
+    assert [len(p) for p in pages] == [2, 2, 1]
+    assert pages[2][0].to_dict()["name"] is None and "extra" not in pages[2][0].keys()
+
+
+def test_read_chunks_parquet_and_csv_read_ids_as_text(tmp_path):
+    table = pa.table({"id": [1, 2, 3], "name": ["a", "b", "c"], "ignored": [0, 0, 0]})
+    pq.write_table(table, tmp_path / "in.parquet")
+    pages = list(offline.read_chunks(str(tmp_path / "in.parquet"), chunk_rows=2))
+    assert [p.column("id") for p in pages] == [["1", "2"], ["3"]]
+    assert pages[0].column("address") == [None, None]
+
+    (tmp_path / "in.csv").write_text("id,name,phone\n7,Olympia,0033\n", encoding="utf-8")
+    (page,) = offline.read_chunks(str(tmp_path / "in.csv"))
+    assert page[0]["id"] == "7" and page[0]["phone"] == "0033" and page[0]["country"] is None
+
+
+def test_resolve_chunk_uses_cache_then_resolver(tmp_path, workers):
+    cache_kwargs = {"path": str(tmp_path / "cache.sqlite"), "model": "m", "prompt_version": "v1"}
+    cache = EnrichmentCache(**cache_kwargs)
+    cache.put(EnrichmentCache.fingerprint(ROWS[2]), "Amsterdam", "Netherlands", 0.9, "cached")
+    cache.flush()
+    workers(cache_kwargs, min_confidence=0.85)
+
+    results, unresolved, stats = offline.resolve_chunk(VenueBatch.from_rows(ROWS))
+    assert sorted(results) == [
+        ("v1", "Paris", "France"), ("v2", "Paris", "France"), ("v3", "Amsterdam", "Netherlands"),
+    ]
+    assert [r["id"] for r in unresolved] == ["v4"]
+    assert stats == {"rows": 4, "unique": 3, "cache_hits": 1, "resolver_hits": 1, "unresolved": 1}
+
+
+def test_resolve_chunk_heuristic_needs_city_and_country(workers):
+    workers(heuristic=True)
+    rows = [
+        {"id": "a", "name": "Club", "address": "Main St, Springfield, Usa"},
+        {"id": "b", "name": "Club", "address": "Springfield"},
+    ]
+    results, unresolved, stats = offline.resolve_chunk(VenueBatch.from_rows(rows))
+    assert [rid for rid, _, _ in results] == ["a"]
+    assert [r["id"] for r in unresolved] == ["b"]
+    assert stats["heuristic_hits"] == 1
+
+
+def test_parquet_sink_buffers_row_groups(tmp_path):
+    sink = offline.ParquetSink(str(tmp_path / "out" / "results.parquet"), row_group_rows=2)
+    for rid in ("a", "b", "c"):
+        part = ResultBatch()
+        part.append(rid, "Paris", "France")
+        sink.write(part)
+    sink.close()
+    pf = pq.ParquetFile(str(tmp_path / "out" / "results.parquet"))
+    assert pf.metadata.num_row_groups == 2 and sink.rows == 3
+    assert pf.read().column("id").to_pylist() == ["a", "b", "c"]
+
+
+def test_run_offline_sends_only_unresolved_rows_to_the_model(tmp_path):
+    path = _write_jsonl(tmp_path / "in.jsonl", ROWS)
+    seen = []
+
+    def _enrich(rows):
+        seen.extend(r["id"] for r in rows)
+        out = ResultBatch()
+        for r in rows:
+            out.append(r["id"], "Nowhere", "Atlantis")
+        return out
+
+    sink = offline.ParquetSink(str(tmp_path / "results.parquet"))
+    out = offline.run_offline(path, sink, _enrich, chunk_rows=2, batch_size=10, workers=1)
+    assert seen == ["v4"]
+    assert out["rows"] == 4 and out["written"] == 4 and out["model_rows"] == 1
+    table = pq.read_table(str(tmp_path / "results.parquet"))
+    assert sorted(table.column("id").to_pylist()) == ["v1", "v2", "v3", "v4"]
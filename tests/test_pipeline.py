@@ -0,0 +1,96 @@
+# file: tests/test_pipeline.py
+from __future__ import annotations
+import threading
+import time
+
+import pytest
+
+from venue_enricher.pipeline import run_pipeline
+
+
+def _pages(n_pages, size=3):
+    return [[{"id": f"p{p}r{r}"} for r in range(size)] for p in range(n_pages)]
+
+
+def _enrich(page):
+    return [(row["id"], "Paris", "France") for row in page]
+
+
+def test_every_row_is_written_once_in_flushes():
+    written = []
+
+    def write(rows):
+        written.append(list(rows))
+        return len(rows)
+
+    stats = run_pipeline(_pages(5), _enrich, write, workers=3, flush_rows=6)
+    ids = sorted(rid for batch in written for rid, _, _ in batch)
+    assert ids == sorted(f"p{p}r{r}" for p in range(5) for r in range(3))
+    assert stats["fetched"] == stats["enriched"] == stats["written"] == 15
+    assert stats["pages"] == 5 and stats["flushes"] == len(written) <= 3
+    assert all(len(b) >= 6 for b in written[:-1])
+
+
+def test_stages_overlap():
+    def slow_pages():
+        for page in _pages(4):
+            time.sleep(0.1)
+            yield page
+
+    def slow_enrich(page):
+        time.sleep(0.1)
+        return _enrich(page)
+
+    def slow_write(rows):
+        time.sleep(0.1)
+        return len(rows)
+
+    started = time.monotonic()
+    run_pipeline(slow_pages(), slow_enrich, slow_write, workers=2, flush_rows=3)
+    # Run back to back, 4 pages x 3 stages x 0.1s would take 1.2s.
+    assert time.monotonic() - started < 0.9
+
+
+def test_progress_is_reported_after_each_flush():
+    seen = []
+    run_pipeline(_pages(3), _enrich, len, flush_rows=3, on_progress=seen.append)
+    assert [p["written"] for p in seen] == [3, 6, 9]
+
+
+def test_slow_trickle_still_flushes_on_time():
+    flushed = threading.Event()
+
+    def pages():
+        yield _pages(1)[0]
+        assert flushed.wait(2.0)  # the first rows land before the source ends
+
+    def write(rows):
+        flushed.set()
+        return len(rows)
+
+    assert run_pipeline(pages(), _enrich, write, flush_rows=1000, flush_seconds=0.1)["written"] == 3
+
+
+@pytest.mark.parametrize("stage", ["read", "enrich", "write"])
+def test_first_stage_error_is_raised_and_threads_stop(stage):
+    def pages():
+        for i, page in enumerate(_pages(50)):
+            if stage == "read" and i == 2:
+                raise RuntimeError("read failed")
+            yield page
+
+    def enrich(page):
+        if stage == "enrich":
+            raise RuntimeError("enrich failed")
+        return _enrich(page)
+
+    def write(rows):
+        if stage == "write":
+            raise RuntimeError("write failed")
+        return len(rows)
+
+    before = threading.active_count()
+    with pytest.raises(RuntimeError, match=f"{stage} failed"):
+        run_pipeline(pages(), enrich, write, workers=2, flush_rows=3)
+    time.sleep(0.3)
+    assert threading.active_count() <= before
@@ -0,0 +1,63 @@
+# file: tests/test_prompts.py
+from __future__ import annotations
+import json
+
+from venue_enricher.prompts import (
+    build_compact_user_prompt,
+    build_packed_user_prompt,
+    build_user_prompt,
+    parse_packed,
+    validate_item,
+)
+
+ROW = {
+    "id": "bq-123",
+    "name": "Olympia",
+    "address": "28 Bd des Capucines, Paris",
+    "website_url": "https://www.olympiahall.com/agenda",
+    "domain": "olympiahall.com",
+    "linkedin_url": "https://www.linkedin.com/company/olympia-hall/",
+}
+
+
+def _item(item_id, city="Paris", **kw):
+    return {"id": item_id, "city": city, "country": "France", "confidence": 0.9, "evidence": "addr", **kw}
+
+
+def test_packed_prompt_uses_item_ids_not_row_ids():
+    text = build_packed_user_prompt([("0", ROW), ("1", {"name": "Bataclan"})])
+    blocks = text.split("\n---\n")
+    assert len(blocks) == 2
+    assert blocks[0].startswith("id: 0\n") and "bq-123" not in text
+    assert blocks[1].startswith("id: 1\n") and "name: Bataclan" in blocks[1]
+
+
+def test_compact_packed_prompt_keeps_ids_and_drops_empty_fields():
+    text = build_packed_user_prompt([("0", ROW)], compact=True)
+    assert text.splitlines()[0] == "id: 0"
+    assert "website: olympiahall.com" in text and "domain:" not in text
+    assert "linkedin: company/olympia-hall" in text and "phone:" not in text
+    assert len(text) < len(build_user_prompt(ROW))
+    assert build_compact_user_prompt(ROW) == text.split("\n", 1)[1]
+
+
+def test_parse_packed_keeps_valid_expected_items():
+    content = json.dumps({"items": [_item("0"), _item("1", city="Lyon")]})
+    out = parse_packed(content, ["0", "1"])
+    assert out == {"0": validate_item(_item("0")), "1": validate_item(_item("1", city="Lyon"))}
+
+
+def test_parse_packed_drops_bad_duplicate_and_unknown_items():
+    content = json.dumps({"items": [
+        _item("0"),
+        _item("1"), _item("1", city="Lyon"),  # duplicated: ambiguous, re-asked
+        _item("2", confidence=3),  # out of range
+        _item("9"),  # never asked
+        "junk",
+    ]})
+    assert set(parse_packed(content, ["0", "1", "2"])) == {"0"}
+
+
+def test_parse_packed_tolerates_garbage():
+    for content in ("", "not json", "[]", '{"items": 3}'):
+        assert parse_packed(content, ["0"]) == {}
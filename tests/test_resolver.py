@@ -0,0 +1,53 @@
+# file: tests/test_resolver.py
+from __future__ import annotations
+
+from venue_enricher import gazetteer as gz
+from venue_enricher.resolver import PreResolver
+
+
+def _one(row, min_confidence=0.85):
+    return PreResolver(min_confidence).resolve_batch([row])[0]
+
+
+def test_gazetteer_indexes_aliases_and_dialing_codes():
+    assert gz.COUNTRY_BY_ALIAS[gz.norm(" Deutschland. ")] == "DE"
+    assert gz.COUNTRY_BY_ALIAS["usa"] == "US" and "ca" not in gz.COUNTRY_BY_ALIAS
+    assert gz.CITY_NAME[("nyc", "US")] == "New York"
+    assert gz.countries_for_dial("33142") == {"FR"}
+    assert gz.countries_for_dial("14155550100") == {"US", "CA"}
+    assert gz.countries_for_dial("999") == frozenset()
+
+
+def test_address_with_city_and_country_resolves():
+    res = _one({"address": "28 Bd des Capucines, 75009 Paris, France"})
+    assert (res.city, res.country, res.confidence) == ("Paris", "France", 1.0)
+    assert "address country" in res.evidence and "gazetteer city" in res.evidence
+
+
+def test_city_alone_is_left_for_the_model():
+    assert _one({"address": "Paris"}) is None
+
+
+def test_cctld_and_phone_add_up_for_a_bare_city():
+    row = {"address": "1 Oxford St, London", "domain": "venue.co.uk", "phone": "+44 20 7946 0000"}
+    assert _one(row) is None  # 0.3 + 0.2 + 0.2 stays under the default bar
+    res = _one(row, min_confidence=0.6)
+    assert (res.city, res.country) == ("London", "United Kingdom")
+
+
+def test_conflicting_signals_do_not_resolve():
+    row = {"address": "Rue X, Paris, France", "domain": "venue.de", "phone": "+49 30 1234"}
+    assert _one(row) is None
+
+
+def test_shared_dialing_codes_and_generic_tlds_carry_no_vote():
+    row = {"address": "1 Main St, Boston", "website_url": "https://venue.com", "phone": "+1 617 555 0100"}
+    assert _one(row, min_confidence=0.0).evidence == "resolver: gazetteer city"
+
+
+def test_batch_keeps_row_order():
+    rows = [{"address": "Paris"}, {"address": "Via Roma 1, Milano, Italia"}, {}]
+    out = PreResolver().resolve_batch(rows)
+    assert out[0] is None and out[2] is None
+    # Local-language aliases map to the canonical names.
+    assert (out[1].city, out[1].country) == ("Milan", "Italy")
@@ -0,0 +1,52 @@
+# file: tests/test_similarity.py
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from venue_enricher.similarity import SimilarityIndex, normalize_name
+
+
+def _row(name, address="", domain="", phone=""):
+    return {"name": name, "address": address, "domain": domain, "phone": phone}
+
+
+@pytest.fixture
+def index(tmp_path):
+    return SimilarityIndex(str(tmp_path / "idx"))
+
+
+def test_place_names_stay_in_signature():
+    assert normalize_name("The O2 Academy Glasgow - Tickets") == "o2 academy glasgow"
+
+
+def test_chain_venues_in_different_cities_do_not_match(index):
+    index.add_many([
+        (_row("O2 Academy Birmingham", "16-18 Horsefair, Birmingham", "academymusicgroup.com"), "Birmingham", "United Kingdom"),
+    ])
+    assert index.lookup_many([_row("O2 Academy Glasgow", domain="academymusicgroup.com")]) == [None]
+
+
+def test_chain_domain_is_not_evidence(index):
+    index.add_many([
+        (_row("Hard Rock Cafe Paris", "14 Bd Montmartre, Paris", "hardrockcafe.com"), "Paris", "France"),
+        (_row("Hard Rock Cafe Rome", "Via Veneto 62, Rome", "hardrockcafe.com"), "Rome", "Italy"),
+    ])
+    # Shared by two cities: the domain alone no longer vouches for either.
+    assert index.lookup_many([_row("Hard Rock Cafe", domain="hardrockcafe.com")]) == [None]
+    assert index.lookup_many([_row("Hard Rock Cafe London", "London, UK", "hardrockcafe.com")]) == [None]
+
+
+def test_same_venue_variant_still_matches(index):
+    index.add_many([
+        (_row("O2 Academy Glasgow", "121 Eglinton St, Glasgow", "o2academyglasgow.co.uk"), "Glasgow", "United Kingdom"),
+    ])
+    (match,) = index.lookup_many([_row("The O2 Academy Glasgow tickets", "Glasgow G5 9NT", "o2academyglasgow.co.uk")])
+    assert match is not None and match.city == "Glasgow"
+
+
+def test_phone_match_without_place_names(index):
+    index.add_many([(_row("Blue Note Club", "", "", "+1 212 475 8592"), "New York", "United States")])
+    (match,) = index.lookup_many([_row("Blue Note Club", phone="(212) 475-8592")])
+    assert match is not None and match.city == "New York"
@@ -0,0 +1,59 @@
+# file: tests/test_storage_read.py
+"""BigQueryIO's Storage Read API reader, against a stand-in read client."""
+from __future__ import annotations
+import datetime as dt
+
+from fakes import FakeReadClient, RecordingBigQueryClient
+from venue_enricher.bq_io import PENDING_FILTER, BigQueryIO
+
+
+def _rows(n, done=()):
+    return [
+        {
+            "id": f"v{i:02d}", "name": f"Venue {i}", "address": "1 Rue X", "enrichment_status": "OK",
+            "city": "Paris" if i in done else None, "country": "France" if i in done else None,
+        }
+        for i in range(n)
+    ]
+
+
+def _io(**kw):
+    return BigQueryIO("p", "d", "venues", client=RecordingBigQueryClient(), **kw)
+
+
+def test_projection_and_pending_filter_are_pushed_down():
+    reader = FakeReadClient(_rows(5, done={1, 3}))
+    rows = list(_io().stream_pending(read_client=reader))
+    assert [r.id for r in rows] == ["v00", "v02", "v04"]
+    assert rows[0].get("name") == "Venue 0" and rows[0].get("missing", "-") == "-"
+    opts = reader.sessions[0]["read_options"]
+    assert opts["row_restriction"] == PENDING_FILTER
+    assert "enrichment_status" not in opts["selected_fields"]
+    assert reader.sessions[0]["table"] == "projects/p/datasets/d/tables/venues"
+
+
+def test_overwrite_reads_everything_and_limit_stops_early():
+    reader = FakeReadClient(_rows(10, done={0}), page_size=3)
+    rows = list(_io().stream_pending(limit=4, overwrite=True, read_client=reader))
+    assert [r.id for r in rows] == ["v00", "v01", "v02", "v03"]
+    assert reader.sessions[0]["read_options"]["row_restriction"] == ""
+
+
+def test_cursor_and_change_column_join_the_restriction():
+    since = dt.datetime(2026, 1, 2, tzinfo=dt.timezone.utc)
+    reader = FakeReadClient(_rows(2))
+    list(_io(change_column="last_updated").stream_pending(
+        after_id="v0'1", read_client=reader, changed_since=since
+    ))
+    restriction = reader.sessions[0]["read_options"]["row_restriction"]
+    assert restriction == (
+        f"(({PENDING_FILTER}) AND id > 'v0\\'1') AND last_updated > TIMESTAMP '{since.isoformat()}'"
+    )
+
+
+def test_stream_pages_batches_rows_by_page_size():
+    reader = FakeReadClient(_rows(7), page_size=2)
+    sizes = iter([3, 2, 10])
+    pages = list(_io().stream_pages(page_size=lambda: next(sizes), read_client=reader))
+    assert [len(p) for p in pages] == [3, 2, 2]
+    assert [r["id"] for p in pages for r in p] == [f"v{i:02d}" for i in range(7)]